@@ -0,0 +1,389 @@
+import asyncio
+import base64
+import hashlib
+import os
+import random
+import time
+from collections import OrderedDict
+
+try:
+    # orjson (opcjonalny) dekoduje duże strony kilka razy szybciej; bez niego działa biblioteka standardowa
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+import aiohttp
+
+from metryki import metryki
+from limiter import RequestScheduler, PRIORYTET_ZAMOWIENIA, PRIORYTET_KOMENDY, PRIORYTET_TRACKER
+
+# Adresy można podmienić na lokalny serwer testowy (stub)
+ALLEGRO_API_URL = os.environ.get("ALLEGRO_API_URL", "https://api.allegro.pl")
+ALLEGRO_AUTH_URL = os.environ.get("ALLEGRO_AUTH_URL", "https://allegro.pl/auth/oauth")
+ALLEGRO_MEDIA_TYPE = "application/vnd.allegro.public.v1+json"
+
+# Konfiguracja puli połączeń (można nadpisać zmiennymi środowiskowymi)
+HTTP_TIMEOUT = float(os.environ.get("ALLEGRO_HTTP_TIMEOUT", "20"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("ALLEGRO_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_LIMIT = int(os.environ.get("ALLEGRO_HTTP_LIMIT", "50"))
+HTTP_LIMIT_PER_HOST = int(os.environ.get("ALLEGRO_HTTP_LIMIT_PER_HOST", "20"))
+HTTP_KEEPALIVE = float(os.environ.get("ALLEGRO_HTTP_KEEPALIVE", "60"))
+HTTP_DNS_TTL = int(os.environ.get("ALLEGRO_HTTP_DNS_TTL", "600"))
+
+# Odświeżamy token z wyprzedzeniem (sekundy przed wygaśnięciem)
+TOKEN_MARGINES = int(os.environ.get("ALLEGRO_TOKEN_REFRESH_MARGIN", "600"))
+DEVICE_GRANT = "urn:ietf:params:oauth:grant-type:device_code"
+
+# Ponawianie po 429 / błędach serwera (wykładniczo + losowy jitter)
+PONOWIENIA_MAX = int(os.environ.get("ALLEGRO_MAX_RETRIES", "4"))
+PONOWIENIA_BAZA = float(os.environ.get("ALLEGRO_BACKOFF_BASE", "1.0"))
+PONOWIENIA_SUFIT = 60.0
+STATUSY_DO_PONOWIENIA = {429, 500, 502, 503, 504}
+
+# Zapytania warunkowe: ile ostatnich odpowiedzi (ETag / Last-Modified / skrót treści) pamiętamy na klienta
+WARUNKOWE_MAX = int(os.environ.get("ALLEGRO_CONDITIONAL_CACHE", "256"))
+
+# Domyślny priorytet dla rodzin endpointów (pierwszy segment ścieżki)
+PRIORYTETY_RODZIN = {
+    "order": PRIORYTET_ZAMOWIENIA,
+    "messaging": PRIORYTET_ZAMOWIENIA,
+    "offers": PRIORYTET_TRACKER,
+}
+
+
+def rodzina_endpointu(sciezka):
+    if "://" in sciezka:
+        sciezka = sciezka.split("://", 1)[1].split("/", 1)[-1]
+    return sciezka.lstrip("/").split("/", 1)[0].split("?", 1)[0] or "inne"
+
+
+def czas_ponowienia(proba, retry_after=None):
+    if retry_after:
+        try:
+            return min(PONOWIENIA_SUFIT, float(retry_after))
+        except ValueError:
+            pass
+    opoznienie = min(PONOWIENIA_SUFIT, PONOWIENIA_BAZA * (2 ** proba))
+    return opoznienie / 2 + random.uniform(0, opoznienie / 2)
+
+
+def klucz_params(params):
+    if not params:
+        return ()
+    pary = params.items() if isinstance(params, dict) else params
+    return tuple(sorted((str(k), str(v)) for k, v in pary))
+
+
+class AllegroResponse:
+    """
+    Wynik zapytania: status HTTP + zdekodowany JSON (albo surowy tekst).
+    `bez_zmian=True` oznacza, że zapytanie warunkowe zwróciło to samo co poprzednio
+    (304 albo identyczna treść) - `data` to wtedy poprzednio zdekodowany obiekt.
+    """
+    __slots__ = ("status", "data", "text", "headers", "bez_zmian")
+
+    def __init__(self, status, data=None, text="", headers=None, bez_zmian=False):
+        self.status = status
+        self.data = data
+        self.text = text
+        self.headers = headers or {}
+        self.bez_zmian = bez_zmian
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+
+class TokenManager:
+    """
+    Trzyma access/refresh token Allegro i sam go odświeża przed wygaśnięciem.
+    Równoczesne odświeżenia z kilku pętli są sklejane w jedno zapytanie.
+    """
+
+    def __init__(self, client, client_id=None, client_secret=None, redirect_uri=None,
+                 margines=TOKEN_MARGINES, on_change=None):
+        self.client = client
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.redirect_uri = redirect_uri
+        self.margines = margines
+        self.on_change = on_change  # np. zapis do bazy: on_change(self.to_dict())
+        self.access_token = None
+        self.refresh_token = None
+        self.expires_at = 0
+        self._odswiezanie = None
+
+    def to_dict(self):
+        return {"access_token": self.access_token, "refresh_token": self.refresh_token, "expires_at": self.expires_at}
+
+    def load(self, dane):
+        if not dane: return
+        self.access_token = dane.get("access_token")
+        self.refresh_token = dane.get("refresh_token")
+        self.expires_at = dane.get("expires_at") or 0
+
+    def clear(self):
+        self.access_token = self.refresh_token = None
+        self.expires_at = 0
+        if self.on_change: self.on_change(self.to_dict())
+
+    def _basic_auth(self):
+        auth_str = f"{self.client_id}:{self.client_secret}"
+        return {"Authorization": f"Basic {base64.b64encode(auth_str.encode()).decode()}"}
+
+    def _ustaw(self, dane):
+        self.access_token = dane["access_token"]
+        self.refresh_token = dane.get("refresh_token") or self.refresh_token
+        self.expires_at = time.time() + int(dane.get("expires_in", 43200))
+        if self.on_change: self.on_change(self.to_dict())
+
+    async def _zapytanie_o_token(self, dane):
+        resp = await self.client.post(f"{ALLEGRO_AUTH_URL}/token", headers=self._basic_auth(), data=dane, auth=False)
+        if resp.status == 200 and resp.data and "access_token" in resp.data:
+            self._ustaw(resp.data)
+        return resp
+
+    async def exchange_code(self, code):
+        dane = {"grant_type": "authorization_code", "code": code, "redirect_uri": self.redirect_uri}
+        resp = await self._zapytanie_o_token(dane)
+        return resp.data if resp.status == 200 else None
+
+    def wygasa_wkrotce(self):
+        return bool(self.expires_at) and time.time() > self.expires_at - self.margines
+
+    async def _odswiez(self):
+        if not self.refresh_token: return False
+        dane = {"grant_type": "refresh_token", "refresh_token": self.refresh_token, "redirect_uri": self.redirect_uri}
+        try:
+            resp = await self._zapytanie_o_token(dane)
+        except Exception as e:
+            metryki.inc("allegro_token_refresh_total", result="error")
+            print(f"⚠️ Błąd odświeżania tokena Allegro: {e}")
+            return False
+        metryki.inc("allegro_token_refresh_total", result="ok" if resp.status == 200 else resp.status)
+        if resp.status == 200:
+            print("🔑 Odświeżono token Allegro")
+            return True
+        print(f"❌ Nie udało się odświeżyć tokena Allegro: {resp.status}")
+        if resp.status in (400, 401):
+            # Refresh token unieważniony - bez ponownego logowania nic nie zrobimy
+            self.clear()
+        return False
+
+    async def refresh(self):
+        if self._odswiezanie is None:
+            self._odswiezanie = asyncio.ensure_future(self._odswiez())
+            self._odswiezanie.add_done_callback(lambda _: setattr(self, "_odswiezanie", None))
+        return await asyncio.shield(self._odswiezanie)
+
+    async def ensure_fresh(self):
+        if self.refresh_token and self.wygasa_wkrotce():
+            await self.refresh()
+
+    # --- DEVICE FLOW (logowanie bez przekierowania i kopiowania kodu) ---
+    async def start_device_flow(self):
+        resp = await self.client.post(f"{ALLEGRO_AUTH_URL}/device", headers=self._basic_auth(),
+                                      data={"client_id": self.client_id}, auth=False)
+        if resp.status == 200: return resp.data
+        return None
+
+    async def poll_device_flow(self, device_code, interwal=5, wygasa_za=3600):
+        koniec = time.time() + wygasa_za
+        while time.time() < koniec:
+            await asyncio.sleep(interwal)
+            resp = await self._zapytanie_o_token({"grant_type": DEVICE_GRANT, "device_code": device_code})
+            if resp.status == 200:
+                return True
+            blad = (resp.data or {}).get("error")
+            if blad == "slow_down":
+                interwal += 5
+            elif blad != "authorization_pending":
+                return False
+        return False
+
+
+class HttpPool:
+    """
+    Jedna, długo żyjąca sesja HTTP: pula połączeń + keep-alive + cache DNS, więc kolejne
+    pętle nie płacą za nowy handshake TCP/TLS przy każdym zapytaniu.
+    Przy wielu kontach Allegro wszystkie klienty dzielą tę samą pulę.
+    """
+
+    def __init__(self, timeout=HTTP_TIMEOUT, connect_timeout=HTTP_CONNECT_TIMEOUT, limit=HTTP_LIMIT,
+                 limit_per_host=HTTP_LIMIT_PER_HOST, keepalive=HTTP_KEEPALIVE, dns_ttl=HTTP_DNS_TTL):
+        self.timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=connect_timeout)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive = keepalive
+        self.dns_ttl = dns_ttl
+        self._session = None
+
+    @property
+    def session(self):
+        # Sesję tworzymy leniwie - musi powstać wewnątrz działającej pętli asyncio
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive,
+                ttl_dns_cache=self.dns_ttl,
+                use_dns_cache=True,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class AllegroClient:
+    """
+    Klient API Allegro dla jednego konta: token, kolejka zapytań z limitami i ponawianie.
+    Bez podanej `pula` tworzy własną pulę połączeń (i zamyka ją w `close`).
+    """
+
+    def __init__(self, base_url=ALLEGRO_API_URL, timeout=HTTP_TIMEOUT, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                 limit=HTTP_LIMIT, limit_per_host=HTTP_LIMIT_PER_HOST, keepalive=HTTP_KEEPALIVE, dns_ttl=HTTP_DNS_TTL,
+                 client_id=None, client_secret=None, redirect_uri=None, pula=None):
+        self.base_url = base_url.rstrip("/")
+        self._wlasna_pula = pula is None
+        self.pula = pula or HttpPool(timeout, connect_timeout, limit, limit_per_host, keepalive, dns_ttl)
+        self.tokens = TokenManager(self, client_id, client_secret, redirect_uri)
+        self.scheduler = RequestScheduler()
+        # (ścieżka, parametry) -> (skrót treści, ETag, Last-Modified, dane) ostatniej odpowiedzi 200
+        self._warunkowe = OrderedDict()
+
+    @property
+    def token(self):
+        return self.tokens.access_token
+
+    @token.setter
+    def token(self, wartosc):
+        self.tokens.access_token = wartosc
+
+    @property
+    def session(self):
+        return self.pula.session
+
+    async def close(self):
+        self.scheduler.close()
+        if self._wlasna_pula:
+            await self.pula.close()
+
+    def zapomnij_odpowiedzi(self):
+        """Kolejne zapytania warunkowe pobiorą i przetworzą pełne odpowiedzi (np. po zmianie ustawień)."""
+        self._warunkowe.clear()
+
+    def _url(self, sciezka):
+        if sciezka.startswith("http://") or sciezka.startswith("https://"):
+            return sciezka
+        return f"{self.base_url}/{sciezka.lstrip('/')}"
+
+    def _headers(self, token, extra=None, body=False):
+        headers = {"Accept": ALLEGRO_MEDIA_TYPE}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        if body:
+            headers["Content-Type"] = ALLEGRO_MEDIA_TYPE
+        if extra:
+            headers.update(extra)
+        return headers
+
+    async def request(self, method, sciezka, *, params=None, json=None, data=None, headers=None, auth=True,
+                      priorytet=None, warunkowo=False):
+        """
+        `warunkowo=True` (tylko GET): wysyłamy If-None-Match / If-Modified-Since z poprzedniej odpowiedzi,
+        a gdy serwer ich nie obsługuje, porównujemy skrót surowej treści. Niezmieniona odpowiedź
+        wraca jako `bez_zmian=True`, bez ponownego dekodowania JSON-a (dane są współdzielone - tylko do odczytu).
+        """
+        klucz = (sciezka, klucz_params(params)) if warunkowo and method == "GET" else None
+        if not auth:
+            return await self._wyslij(method, sciezka, params, json, data, headers, klucz)
+
+        rodzina = rodzina_endpointu(sciezka)
+        if priorytet is None:
+            priorytet = PRIORYTETY_RODZIN.get(rodzina, PRIORYTET_KOMENDY)
+
+        await self.tokens.ensure_fresh()
+        uzyty_token = self.token
+        resp = await self._wyslij_w_kolejce(rodzina, priorytet, method, sciezka, params, json, data,
+                                            self._headers(uzyty_token, headers, body=json is not None), klucz)
+        if resp.status == 401 and self.tokens.refresh_token:
+            # Jeśli ktoś inny już odświeżył token w międzyczasie, po prostu ponawiamy
+            if self.token == uzyty_token and not await self.tokens.refresh():
+                return resp
+            resp = await self._wyslij_w_kolejce(rodzina, priorytet, method, sciezka, params, json, data,
+                                                self._headers(self.token, headers, body=json is not None), klucz)
+        return resp
+
+    async def _wyslij_w_kolejce(self, rodzina, priorytet, method, sciezka, params, json, data, headers, klucz=None):
+        proba = 0
+        while True:
+            await self.scheduler.acquire(rodzina, priorytet)
+            resp = await self._wyslij(method, sciezka, params, json, data, headers, klucz)
+            if resp.status not in STATUSY_DO_PONOWIENIA or proba >= PONOWIENIA_MAX:
+                return resp
+            opoznienie = czas_ponowienia(proba, resp.headers.get("Retry-After"))
+            if resp.status == 429:
+                # Wstrzymujemy całą rodzinę, nie tylko to jedno zapytanie
+                self.scheduler.wstrzymaj(rodzina, opoznienie)
+            metryki.inc("allegro_retries_total", family=rodzina, status=resp.status)
+            print(f"⏳ Allegro {resp.status} na {rodzina}, ponawiam za {opoznienie:.1f}s")
+            await asyncio.sleep(opoznienie)
+            proba += 1
+
+    async def _wyslij(self, method, sciezka, params, json, data, headers, klucz=None):
+        rodzina = rodzina_endpointu(sciezka)
+        poprzednia = self._warunkowe.get(klucz) if klucz is not None else None
+        if poprzednia is not None:
+            headers = dict(headers or {})
+            if poprzednia[1]: headers["If-None-Match"] = poprzednia[1]
+            if poprzednia[2]: headers["If-Modified-Since"] = poprzednia[2]
+
+        with metryki.mierz("allegro_request", family=rodzina, method=method):
+            async with self.session.request(method, self._url(sciezka), params=params, json=json,
+                                            data=data, headers=headers) as resp:
+                surowe = await resp.read()
+                kodowanie = resp.charset or "utf-8"
+                etag, zmodyfikowano = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+        metryki.inc("allegro_responses_total", family=rodzina, status=resp.status)
+        naglowki = dict(resp.headers)
+
+        skrot = None
+        if klucz is not None:
+            if resp.status == 200:
+                skrot = hashlib.blake2b(surowe, digest_size=16).digest()
+            if poprzednia is not None and (resp.status == 304 or skrot == poprzednia[0]):
+                # Nic się nie zmieniło - oddajemy poprzednie dane bez dekodowania
+                self._warunkowe.move_to_end(klucz)
+                metryki.inc("allegro_unchanged_total", family=rodzina, via="etag" if resp.status == 304 else "hash")
+                return AllegroResponse(200, poprzednia[3], "", naglowki, bez_zmian=True)
+
+        # JSON dekodujemy prosto z bajtów; tekst odpowiedzi potrzebny jest tylko przy błędach i nie-JSON-ie
+        dane = None
+        json_ok = False
+        if surowe and "json" in naglowki.get("Content-Type", ""):
+            try:
+                dane = json_loads(surowe if kodowanie.lower().replace("-", "") == "utf8" else surowe.decode(kodowanie))
+                json_ok = True
+            except ValueError:
+                dane = None
+        tekst = "" if json_ok and resp.status < 400 else surowe.decode(kodowanie, errors="replace")
+
+        if skrot is not None:
+            self._warunkowe[klucz] = (skrot, etag, zmodyfikowano, dane)
+            self._warunkowe.move_to_end(klucz)
+            while len(self._warunkowe) > WARUNKOWE_MAX:
+                self._warunkowe.popitem(last=False)
+        return AllegroResponse(resp.status, dane, tekst, naglowki)
+
+    async def get(self, sciezka, **kwargs):
+        return await self.request("GET", sciezka, **kwargs)
+
+    async def post(self, sciezka, **kwargs):
+        return await self.request("POST", sciezka, **kwargs)
+
+    async def put(self, sciezka, **kwargs):
+        return await self.request("PUT", sciezka, **kwargs)
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEMAT = """
+CREATE TABLE IF NOT EXISTS stan (
+    klucz TEXT PRIMARY KEY,
+    wartosc TEXT
+);
+CREATE TABLE IF NOT EXISTS oferty (
+    offer_id TEXT PRIMARY KEY,
+    popularity INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS przetworzone (
+    rodzaj TEXT NOT NULL,
+    id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    PRIMARY KEY (rodzaj, id)
+);
+CREATE INDEX IF NOT EXISTS przetworzone_ts ON przetworzone (rodzaj, ts);
+CREATE TABLE IF NOT EXISTS gpsr (
+    klucz TEXT PRIMARY KEY,
+    produkt TEXT NOT NULL,
+    opis TEXT NOT NULL
+);
+"""
+
+
+class StateStore:
+    """
+    Trwały stan bota w SQLite (tryb WAL).
+    Odczyt robimy raz przy starcie, a zapisy trafiają do bufora w pamięci
+    i są zrzucane partiami w osobnym wątku, żeby nie blokować pętli asyncio.
+    """
+
+    def __init__(self, sciezka, interwal=1.0):
+        self.sciezka = sciezka
+        self.interwal = interwal
+        self._conn = sqlite3.connect(sciezka, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMAT)
+        self._conn.commit()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="baza")
+        self._zadanie = None
+        # Bufory zapisu - kolejne zapisy tego samego klucza nadpisują się w pamięci
+        self._stan = {}
+        self._oferty = {}
+        self._przetworzone = {}
+        self._gpsr = {}
+
+    # --- ODCZYT (przy starcie) ---
+    def get(self, klucz, domyslna=None):
+        wiersz = self._conn.execute("SELECT wartosc FROM stan WHERE klucz = ?", (klucz,)).fetchone()
+        if wiersz is None:
+            return domyslna
+        return json.loads(wiersz[0])
+
+    def oferty(self):
+        return {offer_id: ilosc for offer_id, ilosc in self._conn.execute("SELECT offer_id, popularity FROM oferty")}
+
+    def przetworzone(self, rodzaj, limit):
+        wiersze = self._conn.execute(
+            "SELECT id, ts FROM przetworzone WHERE rodzaj = ? ORDER BY ts DESC LIMIT ?", (rodzaj, limit)
+        ).fetchall()
+        return list(reversed(wiersze))
+
+    def _gpsr_dla(self, klucze):
+        wynik = {}
+        klucze = list(klucze)
+        # SQLite ma limit parametrów w jednym zapytaniu
+        for i in range(0, len(klucze), 500):
+            partia = klucze[i:i + 500]
+            znaki = ",".join("?" * len(partia))
+            for klucz, produkt, opis in self._conn.execute(
+                f"SELECT klucz, produkt, opis FROM gpsr WHERE klucz IN ({znaki})", partia
+            ):
+                wynik[klucz] = (produkt, opis)
+        return wynik
+
+    async def gpsr_dla(self, klucze):
+        """Gotowe opisy GPSR dla podanych kluczy (odczyt w wątku bazy)."""
+        await self.flush()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._gpsr_dla, klucze)
+
+    # --- ZAPIS (buforowany) ---
+    def set(self, klucz, wartosc):
+        self._stan[klucz] = json.dumps(wartosc)
+
+    def zapisz_oferte(self, offer_id, ilosc):
+        self._oferty[offer_id] = ilosc
+
+    def usun_oferte(self, offer_id):
+        self._oferty[offer_id] = None
+
+    def dodaj_przetworzone(self, rodzaj, id_, ts):
+        self._przetworzone[(rodzaj, str(id_))] = ts
+
+    def zapisz_gpsr(self, klucz, produkt, opis):
+        self._gpsr[klucz] = (produkt, opis)
+
+    def usun_stare_przetworzone(self, rodzaj, starsze_niz):
+        self._executor.submit(self._usun_stare, rodzaj, starsze_niz)
+
+    def _usun_stare(self, rodzaj, starsze_niz):
+        with self._conn:
+            self._conn.execute("DELETE FROM przetworzone WHERE rodzaj = ? AND ts < ?", (rodzaj, starsze_niz))
+
+    def _zapisz_partie(self, stan, oferty, przetworzone, gpsr):
+        with self._conn:
+            if stan:
+                self._conn.executemany(
+                    "INSERT INTO stan (klucz, wartosc) VALUES (?, ?) "
+                    "ON CONFLICT(klucz) DO UPDATE SET wartosc = excluded.wartosc",
+                    stan.items(),
+                )
+            do_zapisu = [(k, v) for k, v in oferty.items() if v is not None]
+            do_usuniecia = [(k,) for k, v in oferty.items() if v is None]
+            if do_zapisu:
+                self._conn.executemany(
+                    "INSERT INTO oferty (offer_id, popularity) VALUES (?, ?) "
+                    "ON CONFLICT(offer_id) DO UPDATE SET popularity = excluded.popularity",
+                    do_zapisu,
+                )
+            if do_usuniecia:
+                self._conn.executemany("DELETE FROM oferty WHERE offer_id = ?", do_usuniecia)
+            if przetworzone:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO przetworzone (rodzaj, id, ts) VALUES (?, ?, ?)",
+                    [(r, i, ts) for (r, i), ts in przetworzone.items()],
+                )
+            if gpsr:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO gpsr (klucz, produkt, opis) VALUES (?, ?, ?)",
+                    [(k, p, o) for k, (p, o) in gpsr.items()],
+                )
+
+    async def flush(self):
+        if not (self._stan or self._oferty or self._przetworzone or self._gpsr):
+            return
+        partia = (self._stan, self._oferty, self._przetworzone, self._gpsr)
+        self._stan, self._oferty, self._przetworzone, self._gpsr = {}, {}, {}, {}
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._zapisz_partie, *partia)
+
+    async def _petla(self):
+        while True:
+            await asyncio.sleep(self.interwal)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"⚠️ Błąd zapisu stanu: {e}")
+
+    def start(self):
+        if self._zadanie is None:
+            self._zadanie = asyncio.get_running_loop().create_task(self._petla())
+
+    async def close(self):
+        if self._zadanie is not None:
+            self._zadanie.cancel()
+            self._zadanie = None
+        await self.flush()
+        self._executor.shutdown(wait=True)
+        self._conn.close()
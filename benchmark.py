@@ -0,0 +1,316 @@
+"""
+Benchmark bota bez produkcyjnych API: pętle z main.py (monitor, responder, tracker) działają
+na lokalnym zamienniku Allegro (stub_allegro.py), a powiadomienia trafiają do udawanego kanału Discorda.
+
+Przykłady:
+    python benchmark.py --scenarios monitor --order-rate 50 --duration 30
+    python benchmark.py --scenarios tracker --offers 5000 --sale-rate 20 --latency 80 --rate-429 0.02
+    python benchmark.py --json wynik.json --max-p95 5 --min-rate 10   # kod wyjścia 1 przy regresji
+    python benchmark.py --scenarios monitor,responder --accounts 20   # 20 kont w jednym procesie
+
+Potrzebuje zależności bota (discord.py, anthropic, openai, aiohttp, numpy).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from stub_allegro import StubAllegro
+
+SCENARIUSZE = ("monitor", "responder", "tracker")
+
+
+def percentyl(wartosci, q):
+    if not wartosci:
+        return None
+    posortowane = sorted(wartosci)
+    return posortowane[min(len(posortowane) - 1, int(q * len(posortowane)))]
+
+
+class FakeMessage:
+    def __init__(self, channel):
+        self.channel = channel
+
+    async def edit(self, **kwargs):
+        return self
+
+
+class FakeChannel:
+    """Kanał Discorda, który tylko notuje wiadomości (z opcjonalnym sztucznym opóźnieniem wysyłki)."""
+
+    def __init__(self, kanal_id, na_wiadomosc, opoznienie=0.0):
+        self.id = kanal_id
+        self.na_wiadomosc = na_wiadomosc
+        self.opoznienie = opoznienie
+        self.wiadomosci = 0
+
+    async def send(self, content=None, embed=None, embeds=None, **kwargs):
+        if self.opoznienie:
+            await asyncio.sleep(self.opoznienie)
+        self.wiadomosci += 1
+        self.na_wiadomosc(content, embeds or ([embed] if embed is not None else []))
+        return FakeMessage(self)
+
+
+class Pomiar:
+    """Dopasowuje powiadomienia z udawanego Discorda do zdarzeń wygenerowanych w stubie."""
+
+    def __init__(self, stub):
+        self.stub = stub
+        self.opoznienia = {nazwa: [] for nazwa in SCENARIUSZE}
+        self.ostatnie = {nazwa: None for nazwa in SCENARIUSZE}
+
+    def _zapisz(self, scenariusz, powstanie):
+        teraz = time.time()
+        self.opoznienia[scenariusz].append(teraz - powstanie)
+        self.ostatnie[scenariusz] = teraz
+
+    def na_wiadomosc(self, content, embeds):
+        for embed in embeds:
+            stopka = embed.footer.text or ""
+            zamowienie = re.search(r"ID: (\S+) \|", stopka)
+            if zamowienie:
+                powstanie = self.stub.utworzone.pop(("zamowienie", zamowienie.group(1)), None)
+                if powstanie is not None:
+                    self._zapisz("monitor", powstanie)
+                continue
+
+            pola = {pole.name: pole.value for pole in embed.fields}
+            if "Klient" in pola:
+                powstanie = self.stub.utworzone.pop(("watek", pola["Klient"]), None)
+                if powstanie is not None:
+                    self._zapisz("responder", powstanie)
+                continue
+
+            tekst = " ".join([embed.description or ""] + list(pola.values()))
+            for oferta_id in set(re.findall(r"oferta/(\d+)", tekst)):
+                for powstanie in self.stub.sprzedaze.pop(oferta_id, []):
+                    self._zapisz("tracker", powstanie)
+
+
+def przygotuj_srodowisko(args, url, katalog):
+    # Moduły bota czytają konfigurację przy imporcie, więc ustawiamy ją przed `import main`
+    os.environ["ALLEGRO_API_URL"] = url
+    os.environ["ALLEGRO_AUTH_URL"] = f"{url}/auth/oauth"
+    os.environ["BOT_STATE_DB"] = os.path.join(katalog, "bench_stan.db")
+    os.environ["TRACKER_HISTORY_FILE"] = os.path.join(katalog, "bench_historia.npz")
+    os.environ["MONITOR_INTERVAL"] = str(args.monitor_interval)
+    os.environ["ALLEGRO_ORDER_EVENTS"] = "1" if args.events else "0"
+    os.environ.pop("AI_CACHE_FILE", None)
+    # Dodatkowe konta czytają ten sam stub - powiadomienia od każdego z nich liczą się raz, za to ruch rośnie N razy
+    os.environ["ALLEGRO_ACCOUNTS"] = json.dumps([
+        {"name": f"bench{i}", "orders_channel": 3 * i, "messages_channel": 3 * i + 1, "tracker_channel": 3 * i + 2}
+        for i in range(1, args.accounts)
+    ])
+    os.environ.setdefault("PERPLEXITY_API_KEY", "benchmark")
+    if args.notify_window is not None:
+        os.environ["NOTIFY_BATCH_WINDOW"] = str(args.notify_window)
+    if args.notify_interval is not None:
+        os.environ["NOTIFY_CHANNEL_INTERVAL"] = str(args.notify_interval)
+
+
+async def uruchom(args):
+    stub = StubAllegro(opoznienie=args.latency / 1000, rozrzut=args.jitter / 1000, proc_429=args.rate_429,
+                       retry_after=args.retry_after, strona_max=args.page_size, seed=args.seed, etag=not args.no_etag)
+    url = await stub.start()
+    katalog = tempfile.mkdtemp(prefix="bot_bench_")
+    przygotuj_srodowisko(args, url, katalog)
+
+    wyjscie = sys.stdout if args.verbose else open(os.devnull, "w")
+    with contextlib.redirect_stdout(wyjscie):
+        import main as bot
+
+        pomiar = Pomiar(stub)
+        kanaly = {}
+        bot.bot.get_channel = lambda kanal_id: kanaly.setdefault(
+            kanal_id, FakeChannel(kanal_id, pomiar.na_wiadomosc, args.discord_latency / 1000))
+        bot.baza.start()
+        for konto in bot.konta:
+            konto.allegro.token = "stub-token"
+
+        petle = []
+        generatory = []
+        if "monitor" in args.scenarios:
+            bot.allegro_monitor.change_interval(seconds=args.monitor_interval)
+            petle.append(bot.allegro_monitor)
+            generatory.append(stub.generuj("zamowienie", args.order_rate, args.duration))
+        if "responder" in args.scenarios:
+            for konto in bot.konta:
+                konto.responder_active = True
+                konto.tryb_testowy = False
+            bot.allegro_responder.change_interval(seconds=args.responder_interval)
+            petle.append(bot.allegro_responder)
+            generatory.append(stub.generuj("watek", args.thread_rate, args.duration))
+        if "tracker" in args.scenarios:
+            teraz = time.time()
+            bot.harmonogram_ofert.min_interwal = args.offer_interval
+            bot.harmonogram_ofert.max_interwal = args.offer_interval
+            for oferta_id in stub.dodaj_oferty(args.offers):
+                bot.sledzone_oferty[oferta_id] = 0
+                bot.harmonogram_ofert.dodaj(oferta_id, interwal=args.offer_interval, termin=teraz)
+            if args.budget:
+                bot.TRACKER_BUDZET = args.budget
+            bot.allegro_tracker.change_interval(seconds=args.tracker_interval)
+            petle.append(bot.allegro_tracker)
+            generatory.append(stub.generuj("sprzedaz", args.sale_rate, args.duration))
+
+        start = time.time()
+        for petla in petle:
+            petla.start()
+        if "monitor" in args.scenarios:
+            # Pierwszy przebieg monitora tylko ustawia znacznik (albo kursor dziennika zdarzeń) -
+            # zamówienia sprzed niego uznałby za stare, więc ruch generujemy dopiero po nim
+            if args.events:
+                gotowe = lambda: all(k.ostatnie_zdarzenie_id is not None for k in bot.konta)
+            else:
+                gotowe = lambda: all(k.ostatni_updated_at is not None for k in bot.konta)
+            while not gotowe() and time.time() - start < 30:
+                await asyncio.sleep(0.05)
+        wygenerowane = dict(zip([s for s in SCENARIUSZE if s in args.scenarios], await asyncio.gather(*generatory)))
+        koniec_ruchu = time.time()
+
+        # Czekamy, aż dotrze wszystko, co wygenerowano (albo minie limit)
+        while time.time() - koniec_ruchu < args.drain:
+            if all(len(pomiar.opoznienia[s]) >= wygenerowane[s] for s in wygenerowane if s != "tracker") \
+                    and ("tracker" not in wygenerowane or not stub.sprzedaze):
+                break
+            await asyncio.sleep(0.1)
+        czas = time.time() - start
+
+        # Dajemy pętlom dokończyć bieżący przebieg, zanim zamkniemy sesję HTTP
+        for petla in petle:
+            petla.stop()
+        limit = time.time() + 10
+        while any(petla.is_running() for petla in petle) and time.time() < limit:
+            await asyncio.sleep(0.05)
+        for petla in petle:
+            petla.cancel()
+        sprawdzenia = bot.metryki.suma_histogramow("allegro_request_seconds", family="offers").ile
+        ponowienia = sum(bot.metryki.liczniki("allegro_retries_total").values())
+        niezmienione = {}
+        for etykiety, n in bot.metryki.liczniki("allegro_unchanged_total").items():
+            sposob = dict(etykiety)["via"]
+            niezmienione[sposob] = niezmienione.get(sposob, 0) + n
+        await bot.magistrala.close()
+        await bot.powiadomienia.close()
+        for konto in bot.konta:
+            await konto.allegro.close()
+        await bot.pula_http.close()
+        await bot.baza.close()
+    await stub.close()
+    shutil.rmtree(katalog, ignore_errors=True)
+
+    raport = {
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        "elapsed_s": round(czas, 2),
+        "allegro": {
+            "requests": stub.zapytania,
+            "requests_per_s": round(stub.zapytania / czas, 1),
+            "injected_429": stub.odrzucone_429,
+            "retries": ponowienia,
+            "listing_requests": sprawdzenia,
+            "unchanged": niezmienione,
+        },
+        "discord": {"messages": sum(k.wiadomosci for k in kanaly.values())},
+        "memory_max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "scenarios": {},
+    }
+    for nazwa, ile in wygenerowane.items():
+        opoznienia = pomiar.opoznienia[nazwa]
+        okno = (pomiar.ostatnie[nazwa] or time.time()) - start
+        raport["scenarios"][nazwa] = {
+            "generated": ile,
+            "delivered": len(opoznienia),
+            "events_per_s": round(len(opoznienia) / okno, 2) if opoznienia else 0.0,
+            "latency_s": {
+                "p50": percentyl(opoznienia, 0.50),
+                "p95": percentyl(opoznienia, 0.95),
+                "p99": percentyl(opoznienia, 0.99),
+                "max": max(opoznienia) if opoznienia else None,
+            },
+        }
+    return raport
+
+
+def wypisz(raport):
+    a = raport["allegro"]
+    print(f"⏱️  Czas: {raport['elapsed_s']}s | pamięć (max RSS): {raport['memory_max_rss_mb']} MB")
+    print(f"🌐 Allegro: {a['requests']} zapytań ({a['requests_per_s']}/s) | 429: {a['injected_429']} | ponowienia: {a['retries']} | "
+          f"bez zmian: {', '.join(f'{k} {v}' for k, v in a['unchanged'].items()) or '0'}")
+    print(f"💬 Discord: {raport['discord']['messages']} wiadomości")
+    for nazwa, s in raport["scenarios"].items():
+        l = s["latency_s"]
+        fmt = lambda x: "-" if x is None else f"{x:.2f}s"
+        print(f"📊 {nazwa}: {s['delivered']}/{s['generated']} zdarzeń | {s['events_per_s']}/s | "
+              f"p50 {fmt(l['p50'])} p95 {fmt(l['p95'])} p99 {fmt(l['p99'])} max {fmt(l['max'])}")
+
+
+def regresje(raport, args):
+    bledy = []
+    for nazwa, s in raport["scenarios"].items():
+        if s["delivered"] < s["generated"]:
+            bledy.append(f"{nazwa}: dostarczono {s['delivered']}/{s['generated']}")
+        p95 = s["latency_s"]["p95"]
+        if args.max_p95 is not None and p95 is not None and p95 > args.max_p95:
+            bledy.append(f"{nazwa}: p95 {p95:.2f}s > {args.max_p95}s")
+        if args.min_rate is not None and s["events_per_s"] < args.min_rate:
+            bledy.append(f"{nazwa}: {s['events_per_s']}/s < {args.min_rate}/s")
+    return bledy
+
+
+def parsuj_argumenty(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark pętli bota na lokalnym zamienniku Allegro i Discorda.")
+    p.add_argument("--scenarios", default=",".join(SCENARIUSZE),
+                   type=lambda t: [s for s in t.split(",") if s in SCENARIUSZE], help="monitor,responder,tracker")
+    p.add_argument("--duration", type=float, default=20, help="ile sekund generujemy ruch")
+    p.add_argument("--drain", type=float, default=30, help="ile sekund czekamy na dostarczenie reszty")
+    p.add_argument("--order-rate", type=float, default=20, help="nowe zamówienia na sekundę")
+    p.add_argument("--thread-rate", type=float, default=5, help="nowe wątki wiadomości na sekundę")
+    p.add_argument("--offers", type=int, default=1000, help="liczba śledzonych ofert")
+    p.add_argument("--sale-rate", type=float, default=10, help="sprzedaże na śledzonych ofertach na sekundę")
+    p.add_argument("--offer-interval", type=float, default=10, help="interwał sprawdzania jednej oferty (s)")
+    p.add_argument("--budget", type=int, default=0, help="nadpisuje TRACKER_BUDZET (ofert na przebieg)")
+    p.add_argument("--events", action="store_true", help="monitor w trybie /order/events")
+    p.add_argument("--monitor-interval", type=float, default=1)
+    p.add_argument("--responder-interval", type=float, default=1)
+    p.add_argument("--tracker-interval", type=float, default=1)
+    p.add_argument("--latency", type=float, default=50, help="opóźnienie stubu Allegro (ms)")
+    p.add_argument("--jitter", type=float, default=20, help="rozrzut opóźnienia (ms)")
+    p.add_argument("--rate-429", type=float, default=0.0, help="odsetek odpowiedzi 429 (0-1)")
+    p.add_argument("--retry-after", type=float, default=0.5, help="Retry-After w odpowiedziach 429 (s)")
+    p.add_argument("--page-size", type=int, default=100, help="maks. rozmiar strony w stubie")
+    p.add_argument("--no-etag", action="store_true", help="stub bez ETag - niezmienione odpowiedzi wykrywa tylko skrót treści")
+    p.add_argument("--discord-latency", type=float, default=0, help="opóźnienie wysyłki na udawany Discord (ms)")
+    p.add_argument("--notify-window", type=float, default=None, help="NOTIFY_BATCH_WINDOW (s)")
+    p.add_argument("--notify-interval", type=float, default=None, help="NOTIFY_CHANNEL_INTERVAL (s)")
+    p.add_argument("--accounts", type=int, default=1, help="liczba kont Allegro w jednym procesie")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--json", help="zapisz raport do pliku JSON")
+    p.add_argument("--max-p95", type=float, default=None, help="próg p95 opóźnienia (s) - powyżej kod wyjścia 1")
+    p.add_argument("--min-rate", type=float, default=None, help="próg zdarzeń/s - poniżej kod wyjścia 1")
+    p.add_argument("--verbose", action="store_true", help="pokaż logi bota")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parsuj_argumenty(argv)
+    raport = asyncio.run(uruchom(args))
+    wypisz(raport)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(raport, f, ensure_ascii=False, indent=2)
+    bledy = regresje(raport, args)
+    for blad in bledy:
+        print(f"❌ {blad}")
+    return 1 if bledy else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+CACHE_TTL = float(os.environ.get("AI_CACHE_TTL_HOURS", "24")) * 3600
+CACHE_MAX = int(os.environ.get("AI_CACHE_MAX_ENTRIES", "500"))
+CACHE_PLIK = os.environ.get("AI_CACHE_FILE")  # brak = tylko w pamięci
+CACHE_ZAPIS_INTERWAL = float(os.environ.get("AI_CACHE_FLUSH_SECONDS", "30"))
+
+
+def normalizuj(tekst):
+    return " ".join(str(tekst).lower().split())
+
+
+def klucz_cache(*czesci):
+    surowy = "\x1f".join(normalizuj(c) for c in czesci)
+    return hashlib.sha256(surowy.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache odpowiedzi AI adresowany treścią (znormalizowane wejście -> sha256).
+    Wpisy wygasają po `ttl`, przy przepełnieniu wylatują najdawniej używane,
+    a równoczesne identyczne zapytania czekają na jedno wywołanie API (single-flight).
+    Plik zapisujemy najwyżej raz na `interwal` sekund (i przy zamknięciu), zawsze w jednym
+    wątku - kolejne zapisy nie nadpisują sobie nawzajem pliku tymczasowego.
+    """
+
+    def __init__(self, ttl=CACHE_TTL, max_size=CACHE_MAX, sciezka=CACHE_PLIK, interwal=CACHE_ZAPIS_INTERWAL):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.sciezka = sciezka
+        self.interwal = interwal
+        self._dane = OrderedDict()
+        self._w_locie = {}
+        self._zmieniony = False
+        self._zadanie = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache_ai")
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self._wczytaj()
+
+    def _wczytaj(self):
+        if not self.sciezka:
+            return
+        try:
+            with open(self.sciezka, encoding="utf-8") as f:
+                teraz = time.time()
+                for klucz, (wygasa, wartosc) in json.load(f).items():
+                    if wygasa > teraz:
+                        self._dane[klucz] = (wygasa, wartosc)
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def _zapisz(self, migawka):
+        tmp = self.sciezka + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(migawka, f, ensure_ascii=False)
+        os.replace(tmp, self.sciezka)
+
+    def get(self, klucz):
+        wpis = self._dane.get(klucz)
+        if wpis is None:
+            return None
+        if wpis[0] < time.time():
+            del self._dane[klucz]
+            return None
+        self._dane.move_to_end(klucz)
+        return wpis[1]
+
+    def put(self, klucz, wartosc):
+        self._dane[klucz] = (time.time() + self.ttl, wartosc)
+        self._dane.move_to_end(klucz)
+        while len(self._dane) > self.max_size:
+            self._dane.popitem(last=False)
+        if self.sciezka:
+            # Zapis na dysk odkładamy - cała partia (np. `!gpsr_batch`) trafi do pliku jednym zapisem
+            self._zmieniony = True
+            if self._zadanie is None:
+                self._zadanie = asyncio.get_running_loop().create_task(self._petla())
+
+    async def flush(self):
+        if not self._zmieniony:
+            return
+        self._zmieniony = False
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._zapisz, dict(self._dane))
+        except Exception as e:
+            self._zmieniony = True  # spróbujemy przy kolejnym zapisie
+            print(f"⚠️ Błąd zapisu cache AI: {e}")
+
+    async def _petla(self):
+        while True:
+            await asyncio.sleep(self.interwal)
+            await self.flush()
+
+    async def close(self):
+        if self._zadanie is not None:
+            self._zadanie.cancel()
+            self._zadanie = None
+        await self.flush()
+        self._executor.shutdown(wait=True)
+
+    async def get_or_compute(self, czesci, fabryka):
+        """Zwraca (wartość, czy_z_cache). Wyjątki z `fabryka` nie są cache'owane."""
+        klucz = klucz_cache(*czesci)
+        wartosc = self.get(klucz)
+        if wartosc is not None:
+            self.hits += 1
+            return wartosc, True
+
+        if klucz in self._w_locie:
+            self.shared += 1
+            return await asyncio.shield(self._w_locie[klucz]), True
+
+        self.misses += 1
+        zadanie = asyncio.ensure_future(fabryka())
+        self._w_locie[klucz] = zadanie
+        try:
+            wartosc = await asyncio.shield(zadanie)
+        finally:
+            self._w_locie.pop(klucz, None)
+        self.put(klucz, wartosc)
+        return wartosc, False
+
+    def stats(self):
+        return {"size": len(self._dane), "hits": self.hits, "misses": self.misses, "shared": self.shared}
@@ -0,0 +1,105 @@
+import datetime
+import time
+from collections import OrderedDict
+
+
+def na_sekundy(czas):
+    """Zamienia createdAt/updatedAt z Allegro (ISO 8601), datetime albo liczbę na timestamp."""
+    if czas is None:
+        return time.time()
+    if isinstance(czas, (int, float)):
+        return float(czas)
+    if isinstance(czas, datetime.datetime):
+        return czas.timestamp()
+    try:
+        return datetime.datetime.fromisoformat(str(czas).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return time.time()
+
+
+class DedupStore:
+    """
+    Pamięć przetworzonych ID (zamówienia, wiadomości).
+    Sprawdzenie `in` jest O(1), przy przepełnieniu wylatują najdawniej używane wpisy (LRU),
+    a wpisy starsze niż `ttl` sekund (licząc od createdAt/updatedAt) wygasają.
+    """
+
+    def __init__(self, max_size=10000, ttl=7 * 24 * 3600, on_add=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_add = on_add  # np. zapis do trwałej bazy: on_add(klucz, ts)
+        self._dane = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def _wygaslo(self, ts, teraz):
+        return bool(self.ttl) and ts < teraz - self.ttl
+
+    def __contains__(self, klucz):
+        ts = self._dane.get(klucz)
+        if ts is None:
+            self.misses += 1
+            return False
+        if self._wygaslo(ts, time.time()):
+            del self._dane[klucz]
+            self.expired += 1
+            self.misses += 1
+            return False
+        self._dane.move_to_end(klucz)
+        self.hits += 1
+        return True
+
+    def __len__(self):
+        return len(self._dane)
+
+    def __iter__(self):
+        return iter(self._dane)
+
+    def add(self, klucz, czas=None):
+        ts = na_sekundy(czas)
+        if self._wygaslo(ts, time.time()):
+            # Wpis martwy od początku - nie zajmuje miejsca i nie wypycha ważnych wpisów z LRU
+            if self._dane.pop(klucz, None) is not None:
+                self.expired += 1
+            return
+        self._dane[klucz] = ts
+        self._dane.move_to_end(klucz)
+        self._przytnij()
+        if self.on_add is not None:
+            self.on_add(klucz, ts)
+
+    def load(self, wpisy):
+        """Wczytuje pary (klucz, ts) z trwałej bazy - bez wywoływania on_add."""
+        teraz = time.time()
+        for klucz, ts in wpisy:
+            if not self._wygaslo(ts, teraz):
+                self._dane[klucz] = ts
+        self._przytnij()
+
+    def clear(self):
+        self._dane.clear()
+
+    def _przytnij(self):
+        # Wygasłe wpisy zbieramy z początku kolejki (najdawniej używane)
+        teraz = time.time()
+        while self._dane:
+            ts = next(iter(self._dane.values()))
+            if not self._wygaslo(ts, teraz):
+                break
+            self._dane.popitem(last=False)
+            self.expired += 1
+        while len(self._dane) > self.max_size:
+            self._dane.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "size": len(self._dane),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expired": self.expired,
+        }
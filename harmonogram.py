@@ -0,0 +1,75 @@
+import heapq
+import random
+import time
+
+
+class AdaptiveSchedule:
+    """
+    Kolejka priorytetowa ofert trackera posortowana po terminie następnego sprawdzenia.
+    Oferta, która się sprzedaje, jest sprawdzana coraz częściej (interwał / 2),
+    a uśpiona coraz rzadziej (interwał * 1.5), w granicach [min_interwal, max_interwal].
+    """
+
+    def __init__(self, min_interwal=300, max_interwal=6 * 3600, start_interwal=1800):
+        self.min_interwal = min_interwal
+        self.max_interwal = max_interwal
+        self.start_interwal = start_interwal
+        self._kopiec = []
+        self._terminy = {}
+        self.interwaly = {}
+
+    def __len__(self):
+        return len(self._terminy)
+
+    def __contains__(self, oferta_id):
+        return oferta_id in self._terminy
+
+    def _wstaw(self, oferta_id, termin):
+        self._terminy[oferta_id] = termin
+        heapq.heappush(self._kopiec, (termin, oferta_id))
+
+    def dodaj(self, oferta_id, interwal=None, termin=None):
+        interwal = interwal or self.interwaly.get(oferta_id) or self.start_interwal
+        self.interwaly[oferta_id] = interwal
+        if termin is None:
+            # Rozrzucamy start, żeby po restarcie nie sprawdzać wszystkiego w jednej minucie
+            termin = time.time() + random.uniform(0, interwal)
+        self._wstaw(oferta_id, termin)
+
+    def usun(self, oferta_id):
+        # Wpis w kopcu zostaje, ale bez terminu w słowniku jest ignorowany
+        self._terminy.pop(oferta_id, None)
+        self.interwaly.pop(oferta_id, None)
+
+    def do_sprawdzenia(self, limit, teraz=None):
+        teraz = time.time() if teraz is None else teraz
+        wynik = []
+        while self._kopiec and len(wynik) < limit and self._kopiec[0][0] <= teraz:
+            termin, oferta_id = heapq.heappop(self._kopiec)
+            if self._terminy.get(oferta_id) != termin:
+                continue  # nieaktualny wpis (usunięta albo przeplanowana oferta)
+            del self._terminy[oferta_id]
+            wynik.append(oferta_id)
+        return wynik
+
+    def zaplanuj(self, oferta_id, zmiana, teraz=None):
+        teraz = time.time() if teraz is None else teraz
+        interwal = self.interwaly.get(oferta_id, self.start_interwal)
+        interwal = interwal / 2 if zmiana else interwal * 1.5
+        interwal = max(self.min_interwal, min(self.max_interwal, interwal))
+        self.interwaly[oferta_id] = interwal
+        self._wstaw(oferta_id, teraz + interwal * random.uniform(0.9, 1.1))
+
+    def zalegle(self, teraz=None):
+        teraz = time.time() if teraz is None else teraz
+        return sum(1 for t in self._terminy.values() if t <= teraz)
+
+    def stats(self):
+        if not self.interwaly:
+            return {"offers": 0, "avg_interval": 0.0, "overdue": 0, "per_hour": 0.0}
+        return {
+            "offers": len(self._terminy),
+            "avg_interval": sum(self.interwaly.values()) / len(self.interwaly),
+            "overdue": self.zalegle(),
+            "per_hour": sum(3600 / i for i in self.interwaly.values()),
+        }
@@ -0,0 +1,157 @@
+# Kalkulator marży Allegro (VAT + ryczałt od przychodu netto + prowizja od ceny brutto).
+# Bez zależności od Discorda - funkcje przyjmują liczby albo tablice numpy, więc ten sam
+# kod liczy jeden scenariusz z `!marza`, tysiące SKU z CSV i skrypty cenowe poza botem.
+import csv
+import io
+
+import numpy as np
+
+VAT_DOMYSLNY = 23.0
+RYCZALT_DOMYSLNY = 3.0
+CELE_MARZY = (10, 20, 30)  # % ceny brutto, dla których liczymy ceny docelowe w trybie hurtowym
+
+# Nazwy kolumn akceptowane w pliku CSV
+KOLUMNY = {
+    "sku": ("sku", "nazwa", "produkt", "name", "id"),
+    "zakup": ("zakup", "cena_zakupu", "purchase", "purchase_price", "koszt"),
+    "sprzedaz": ("sprzedaz", "sprzedaż", "cena", "cena_sprzedazy", "sale", "sale_price", "price"),
+    "prowizja": ("prowizja", "commission"),
+    "vat": ("vat",),
+    "ryczalt": ("ryczalt", "ryczałt", "flat_tax", "podatek"),
+}
+
+
+def _wspolczynnik(prowizja, vat, ryczalt):
+    # Ile złotych zysku zostaje z każdej złotówki ceny brutto (przed odjęciem towaru)
+    return (1 - ryczalt / 100) / (1 + vat / 100) - prowizja / 100
+
+
+def oblicz(zakup_brutto, sprzedaz_brutto, prowizja=0.0, vat=VAT_DOMYSLNY, ryczalt=RYCZALT_DOMYSLNY):
+    """Rozbicie transakcji: słownik tablic (albo skalarów) z kosztami i zyskiem."""
+    zakup_brutto = np.asarray(zakup_brutto, dtype=np.float64)
+    sprzedaz_brutto = np.asarray(sprzedaz_brutto, dtype=np.float64)
+    mnoznik_vat = 1 + np.asarray(vat, dtype=np.float64) / 100
+
+    zakup_netto = zakup_brutto / mnoznik_vat
+    sprzedaz_netto = sprzedaz_brutto / mnoznik_vat
+    prowizja_kwota = sprzedaz_brutto * np.asarray(prowizja, dtype=np.float64) / 100
+    ryczalt_kwota = sprzedaz_netto * np.asarray(ryczalt, dtype=np.float64) / 100
+    zysk = sprzedaz_netto - zakup_netto - ryczalt_kwota - prowizja_kwota
+    marza = np.divide(zysk * 100, sprzedaz_brutto, out=np.full_like(zysk, np.nan), where=sprzedaz_brutto != 0)
+
+    return {
+        "zakup_netto": zakup_netto,
+        "sprzedaz_netto": sprzedaz_netto,
+        "prowizja_kwota": prowizja_kwota,
+        "ryczalt_kwota": ryczalt_kwota,
+        "zysk": zysk,
+        "marza_proc": marza,
+        "prog_rentownosci": cena_dla_zysku(zakup_brutto, 0.0, prowizja, vat, ryczalt),
+    }
+
+
+def cena_dla_zysku(zakup_brutto, zysk, prowizja=0.0, vat=VAT_DOMYSLNY, ryczalt=RYCZALT_DOMYSLNY):
+    """Cena brutto, przy której zostaje `zysk` zł. NaN, gdy prowizja i podatki zjadają całą cenę."""
+    zakup_netto = np.asarray(zakup_brutto, dtype=np.float64) / (1 + np.asarray(vat, dtype=np.float64) / 100)
+    wsp = np.asarray(_wspolczynnik(np.asarray(prowizja, dtype=np.float64), vat, ryczalt), dtype=np.float64)
+    licznik = np.asarray(zysk, dtype=np.float64) + zakup_netto
+    licznik, wsp = np.broadcast_arrays(licznik, wsp)
+    return np.divide(licznik, wsp, out=np.full(licznik.shape, np.nan), where=wsp > 0)
+
+
+def cena_dla_marzy(zakup_brutto, marza_proc, prowizja=0.0, vat=VAT_DOMYSLNY, ryczalt=RYCZALT_DOMYSLNY):
+    """Cena brutto, przy której zysk to `marza_proc` % ceny sprzedaży."""
+    zakup_netto = np.asarray(zakup_brutto, dtype=np.float64) / (1 + np.asarray(vat, dtype=np.float64) / 100)
+    wsp = np.asarray(_wspolczynnik(np.asarray(prowizja, dtype=np.float64), vat, ryczalt) - np.asarray(marza_proc) / 100,
+                     dtype=np.float64)
+    zakup_netto, wsp = np.broadcast_arrays(zakup_netto, wsp)
+    return np.divide(zakup_netto, wsp, out=np.full(wsp.shape, np.nan), where=wsp > 0)
+
+
+def _liczba(tekst, domyslna=np.nan):
+    tekst = str(tekst).replace(",", ".").replace("%", "").replace("zł", "").replace(" ", "").strip()
+    try:
+        return float(tekst) if tekst else domyslna
+    except ValueError:
+        return np.nan
+
+
+def wczytaj_csv(tekst):
+    """
+    Wczytuje CSV z nagłówkiem (przecinek, średnik lub tab).
+    Zwraca (lista SKU, słownik tablic: zakup, sprzedaz, prowizja, vat, ryczalt).
+    """
+    try:
+        dialekt = csv.Sniffer().sniff(tekst[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialekt = csv.excel
+    wiersze = [w for w in csv.reader(io.StringIO(tekst), dialekt) if any(k.strip() for k in w)]
+    if not wiersze:
+        raise ValueError("Pusty plik")
+
+    naglowek = [k.strip().lower() for k in wiersze[0]]
+    pozycje = {}
+    for kolumna, aliasy in KOLUMNY.items():
+        for i, nazwa in enumerate(naglowek):
+            if nazwa in aliasy:
+                pozycje[kolumna] = i
+                break
+    if "zakup" not in pozycje or "sprzedaz" not in pozycje:
+        raise ValueError("Brak kolumn 'zakup' i 'sprzedaz' w nagłówku")
+
+    dane = wiersze[1:]
+    domyslne = {"prowizja": 0.0, "vat": VAT_DOMYSLNY, "ryczalt": RYCZALT_DOMYSLNY}
+    kolumny = {}
+    for kolumna in ("zakup", "sprzedaz", "prowizja", "vat", "ryczalt"):
+        i = pozycje.get(kolumna)
+        domyslna = domyslne.get(kolumna, np.nan)
+        kolumny[kolumna] = np.array(
+            [_liczba(w[i], domyslna) if i is not None and i < len(w) else domyslna for w in dane], dtype=np.float64
+        )
+    i_sku = pozycje.get("sku")
+    sku = [w[i_sku].strip() if i_sku is not None and i_sku < len(w) else str(n + 1) for n, w in enumerate(dane)]
+    return sku, kolumny
+
+
+def oblicz_tabele(kolumny, cele_marzy=CELE_MARZY):
+    """Cały plik w jednym przebiegu: zysk, marża, próg rentowności i ceny dla docelowych marż."""
+    wynik = oblicz(kolumny["zakup"], kolumny["sprzedaz"], kolumny["prowizja"], kolumny["vat"], kolumny["ryczalt"])
+    cele = np.asarray(cele_marzy, dtype=np.float64)
+    # Siatka cen: wiersze = SKU, kolumny = docelowe marże (broadcasting zamiast pętli)
+    wynik["ceny_docelowe"] = cena_dla_marzy(
+        kolumny["zakup"][:, None], cele[None, :], kolumny["prowizja"][:, None],
+        kolumny["vat"][:, None], kolumny["ryczalt"][:, None],
+    )
+    return wynik
+
+
+def podsumowanie(wynik):
+    zysk = wynik["zysk"]
+    poprawne = ~np.isnan(zysk)
+    return {
+        "pozycje": int(len(zysk)),
+        "bledne": int((~poprawne).sum()),
+        "zysk_suma": float(np.nansum(zysk)),
+        "marza_srednia": float(np.nanmean(wynik["marza_proc"])) if poprawne.any() else float("nan"),
+        "stratne": int((zysk[poprawne] <= 0).sum()),
+    }
+
+
+def zapisz_csv(sku, kolumny, wynik, cele_marzy=CELE_MARZY):
+    bufor = io.StringIO()
+    pisarz = csv.writer(bufor, delimiter=";")
+    pisarz.writerow(
+        ["sku", "zakup", "sprzedaz", "prowizja", "vat", "ryczalt", "zysk", "marza_proc", "prog_rentownosci"]
+        + [f"cena_marza_{c}" for c in cele_marzy]
+    )
+
+    def fmt(x):
+        return "" if np.isnan(x) else f"{x:.2f}"
+
+    for i, nazwa in enumerate(sku):
+        pisarz.writerow(
+            [nazwa] + [fmt(kolumny[k][i]) for k in ("zakup", "sprzedaz", "prowizja", "vat", "ryczalt")]
+            + [fmt(wynik["zysk"][i]), fmt(wynik["marza_proc"][i]), fmt(wynik["prog_rentownosci"][i])]
+            + [fmt(c) for c in wynik["ceny_docelowe"][i]]
+        )
+    return bufor.getvalue()
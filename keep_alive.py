@@ -1,15 +1,62 @@
-from flask import Flask
-from threading import Thread
+import json
+import os
 
-app = Flask('')
+from aiohttp import web
 
-@app.route('/')
-def home():
-    return "Bot żyje i ma się dobrze!"
+from metryki import metryki
 
-def run():
-    app.run(host='0.0.0.0', port=8080)
+PORT = int(os.environ.get("PORT", "8080"))
 
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
\ No newline at end of file
+
+class HealthServer:
+    """
+    Serwer HTTP dla Render działający w pętli asyncio bota (bez osobnego wątku).
+    `/healthz` i `/readyz` wołają przekazane kontrole - każda zwraca {nazwa: (ok, szczegóły)} -
+    i odpowiadają 503, gdy któraś nie przejdzie. Zablokowana pętla nie odpowie wcale.
+    """
+
+    def __init__(self, zycie, gotowosc, port=PORT, host="0.0.0.0"):
+        self.zycie = zycie
+        self.gotowosc = gotowosc
+        self.port = port
+        self.host = host
+        self._runner = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/", self._home)
+        self.app.router.add_get("/healthz", self._healthz)
+        self.app.router.add_get("/readyz", self._readyz)
+        self.app.router.add_get("/metrics", self._metrics)
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        print(f"🩺 Serwer zdrowia na porcie {self.port}")
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @staticmethod
+    def _odpowiedz(kontrole):
+        try:
+            wyniki = kontrole()
+        except Exception as e:
+            wyniki = {"kontrola": (False, f"wyjątek: {e}")}
+        ok = all(w[0] for w in wyniki.values())
+        tresc = {"ok": ok, "checks": {nazwa: {"ok": w[0], "detail": w[1]} for nazwa, w in wyniki.items()}}
+        return web.json_response(tresc, status=200 if ok else 503, dumps=lambda d: json.dumps(d, ensure_ascii=False))
+
+    async def _home(self, request):
+        return web.Response(text="Bot żyje i ma się dobrze!")
+
+    async def _healthz(self, request):
+        return self._odpowiedz(self.zycie)
+
+    async def _readyz(self, request):
+        return self._odpowiedz(self.gotowosc)
+
+    async def _metrics(self, request):
+        return web.Response(text=metryki.render(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
@@ -0,0 +1,112 @@
+import json
+import os
+import time
+import zlib
+
+from allegro_api import AllegroClient
+from dedup import DedupStore
+from sprzedaz import SalesAggregates
+
+
+class Konto:
+    """
+    Jedno konto sprzedawcy Allegro: własny klient (token + kolejka zapytań z limitami),
+    pamięć przetworzonych ID, kursory monitora, ustawienia respondera, agregaty sprzedaży i kanały Discorda.
+    Pula połączeń HTTP, baza, magistrala i kolejka powiadomień są wspólne dla całego procesu,
+    więc każde kolejne konto to tylko kilka obiektów w pamięci, a nie osobny bot.
+    Konto główne trzyma stan pod dotychczasowymi kluczami - istniejąca baza działa bez migracji.
+    """
+
+    def __init__(self, nazwa, baza, pula, client_id=None, client_secret=None, redirect_uri=None,
+                 kanal_zamowienia=None, kanal_wiadomosci=None, kanal_tracker=None,
+                 dedup_max=10000, dedup_ttl=7 * 24 * 3600, glowne=False):
+        self.nazwa = nazwa
+        self.glowne = glowne
+        self.baza = baza
+        self.kanal_zamowienia = kanal_zamowienia
+        self.kanal_wiadomosci = kanal_wiadomosci
+        self.kanal_tracker = kanal_tracker
+
+        self.allegro = AllegroClient(client_id=client_id, client_secret=client_secret, redirect_uri=redirect_uri, pula=pula)
+        self.allegro.tokens.load(self.get("allegro_tokeny") or {"access_token": self.get("allegro_token")})
+        self.allegro.tokens.on_change = lambda tokeny: self.set("allegro_tokeny", tokeny)
+
+        self.processed_order_ids = self._pamiec("zamowienie", dedup_max, dedup_ttl)
+        self.processed_msg_ids = self._pamiec("wiadomosc", dedup_max, dedup_ttl)
+        self.zliczone_zamowienia = self._pamiec("sprzedaz", dedup_max, dedup_ttl) # Zamówienia doliczone do raportów (i wycofane po anulowaniu)
+        self.ostatni_updated_at = self.get("ostatni_updated_at") # Znacznik "high-water mark" monitora (updatedAt najnowszego zamówienia)
+        self.ostatnie_zdarzenie_id = self.get("ostatnie_zdarzenie_id") # ID ostatniego przetworzonego zdarzenia z /order/events
+        self.ostatni_udany_monitor = None # time.time() ostatniej udanej odpowiedzi z listy zamówień / dziennika zdarzeń
+        self.ostatni_cykl_respondera = None # (liczba wątków, czas w sekundach) z ostatniego cyklu
+        self.tryb_testowy = self.get("tryb_testowy", True)
+        self.responder_active = self.get("responder_active", False)
+        self.odpowiedzi_w_toku = set() # ID wątków czekających na auto-odpowiedź (żeby kolejny cykl jej nie zdublował)
+        self.sprzedaz = SalesAggregates(self.get, self.set) # Dzienne agregaty do raportów sprzedaży
+
+    def __repr__(self):
+        return f"Konto({self.nazwa!r})"
+
+    # --- STAN W BAZIE (klucze z prefiksem konta) ---
+    def klucz(self, klucz):
+        return klucz if self.glowne else f"konto:{self.nazwa}:{klucz}"
+
+    def rodzaj(self, rodzaj):
+        return rodzaj if self.glowne else f"{rodzaj}@{self.nazwa}"
+
+    def get(self, klucz, domyslna=None):
+        return self.baza.get(self.klucz(klucz), domyslna)
+
+    def set(self, klucz, wartosc):
+        self.baza.set(self.klucz(klucz), wartosc)
+
+    def _pamiec(self, rodzaj, max_size, ttl):
+        rodzaj = self.rodzaj(rodzaj)
+        pamiec = DedupStore(max_size=max_size, ttl=ttl,
+                            on_add=lambda id_, ts: self.baza.dodaj_przetworzone(rodzaj, id_, ts))
+        pamiec.load(self.baza.przetworzone(rodzaj, max_size))
+        # Historia starsza niż TTL nie jest już potrzebna
+        self.baza.usun_stare_przetworzone(rodzaj, time.time() - ttl)
+        return pamiec
+
+    # --- ROUTING ---
+    def kanaly(self):
+        return {self.kanal_zamowienia, self.kanal_wiadomosci, self.kanal_tracker} - {None}
+
+
+def wczytaj_konfiguracje(glowne):
+    """
+    Konto główne (dotychczasowe zmienne środowiskowe) + dodatkowe z ALLEGRO_ACCOUNTS
+    (JSON albo ścieżka do pliku JSON), np.:
+    [{"name": "sklep2", "client_id": "...", "client_secret": "...",
+      "orders_channel": 123, "messages_channel": 456, "tracker_channel": 789}]
+    Brakujące kanały dziedziczy po koncie głównym.
+    """
+    zrodlo = os.environ.get("ALLEGRO_ACCOUNTS", "").strip()
+    if zrodlo and not zrodlo.startswith("["):
+        with open(zrodlo, encoding="utf-8") as plik:
+            zrodlo = plik.read()
+    konfiguracja = [dict(glowne, glowne=True)]
+    for wpis in json.loads(zrodlo) if zrodlo else []:
+        nazwa = str(wpis.get("name") or "").strip()
+        if not nazwa or any(k["nazwa"] == nazwa for k in konfiguracja):
+            raise ValueError(f"ALLEGRO_ACCOUNTS: brak albo powtórzona nazwa konta ({nazwa!r})")
+        konfiguracja.append({
+            "nazwa": nazwa,
+            "client_id": wpis.get("client_id"),
+            "client_secret": wpis.get("client_secret"),
+            "redirect_uri": wpis.get("redirect_uri", glowne.get("redirect_uri")),
+            "kanal_zamowienia": int(wpis.get("orders_channel") or glowne["kanal_zamowienia"]),
+            "kanal_wiadomosci": int(wpis.get("messages_channel") or glowne["kanal_wiadomosci"]),
+            "kanal_tracker": int(wpis.get("tracker_channel") or glowne["kanal_tracker"]),
+        })
+    return konfiguracja
+
+
+def shard_konta(nazwa, liczba_shardow, glowne=False):
+    """
+    Stały przydział konta do procesu (crc32 nazwy - ten sam w każdym procesie, w przeciwieństwie do hash()).
+    Konto główne zawsze trafia do shardu 0, bo tam działają tracker i komendy niezwiązane z kontem.
+    """
+    if glowne or liczba_shardow <= 1:
+        return 0
+    return zlib.crc32(nazwa.encode()) % liczba_shardow
@@ -0,0 +1,150 @@
+import asyncio
+import collections
+import itertools
+import os
+import time
+
+# Pasy priorytetów - mniejsza liczba = obsługiwane wcześniej
+PRIORYTET_ZAMOWIENIA = 0  # zamówienia i wiadomości od klientów
+PRIORYTET_KOMENDY = 1     # komendy wpisane ręcznie na Discordzie
+PRIORYTET_TRACKER = 2     # masowe sprawdzanie ofert konkurencji
+
+# Limity zapytań na sekundę (globalny + per rodzina endpointów)
+LIMIT_GLOBALNY = float(os.environ.get("ALLEGRO_RATE_LIMIT", "20"))
+LIMIT_BURST = float(os.environ.get("ALLEGRO_RATE_BURST", "20"))
+LIMITY_RODZIN = {
+    "offers": float(os.environ.get("ALLEGRO_RATE_LIMIT_OFFERS", "10")),
+}
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.ostatnio = time.monotonic()
+
+    def _uzupelnij(self):
+        teraz = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (teraz - self.ostatnio) * self.rate)
+        self.ostatnio = teraz
+
+    def czas_do_tokena(self):
+        self._uzupelnij()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def pobierz(self):
+        self.tokens -= 1
+
+
+class RequestScheduler:
+    """
+    Centralna kolejka zapytań do Allegro.
+    Każde zapytanie musi dostać żeton z kubełka globalnego i kubełka swojej rodziny
+    (order, messaging, offers...). Gdy żetonów brakuje, pierwszeństwo ma niższy numer priorytetu,
+    więc duży przebieg trackera nie zablokuje powiadomień o zamówieniach.
+    Po 429 cała rodzina jest wstrzymywana na czas z Retry-After.
+    Kolejki są osobne dla każdej pary (priorytet, rodzina), więc wstrzymana albo wyczerpana rodzina
+    opóźnia tylko własne zapytania; w obrębie priorytetu gotowe rodziny idą w kolejności zgłoszeń.
+    """
+
+    def __init__(self, limit=LIMIT_GLOBALNY, burst=LIMIT_BURST, limity_rodzin=None):
+        self.globalny = TokenBucket(limit, burst)
+        self.limity_rodzin = dict(LIMITY_RODZIN if limity_rodzin is None else limity_rodzin)
+        self.domyslny_limit = limit
+        self.burst = burst
+        self._kubelki = {}
+        self._pauzy = {}
+        self._pasy = collections.defaultdict(collections.deque) # (priorytet, rodzina) -> [(nr zgłoszenia, future)]
+        self._numer = itertools.count()
+        self._sygnal = None
+        self._zadanie = None
+        # Metryki
+        self.wydane = 0
+        self.czekanie_suma = 0.0
+        self.czekanie_max = 0.0
+        self.throttled = 0
+
+    def _kubelek(self, rodzina):
+        if rodzina not in self._kubelki:
+            limit = self.limity_rodzin.get(rodzina, self.domyslny_limit)
+            self._kubelki[rodzina] = TokenBucket(limit, min(self.burst, max(limit, 1)))
+        return self._kubelki[rodzina]
+
+    def _pauza(self, rodzina):
+        return max(0.0, self._pauzy.get(rodzina, 0.0) - time.monotonic())
+
+    def wstrzymaj(self, rodzina, sekundy):
+        self._pauzy[rodzina] = max(self._pauzy.get(rodzina, 0.0), time.monotonic() + sekundy)
+        self.throttled += 1
+
+    async def acquire(self, rodzina, priorytet=PRIORYTET_KOMENDY):
+        if self._zadanie is None or self._zadanie.done():
+            self._sygnal = asyncio.Event()
+            self._zadanie = asyncio.get_running_loop().create_task(self._petla())
+        start = time.monotonic()
+        fut = asyncio.get_running_loop().create_future()
+        self._pasy[(priorytet, rodzina)].append((next(self._numer), fut))
+        self._sygnal.set()
+        await fut
+        czekanie = time.monotonic() - start
+        self.wydane += 1
+        self.czekanie_suma += czekanie
+        self.czekanie_max = max(self.czekanie_max, czekanie)
+
+    async def _petla(self):
+        while True:
+            czekaj = None
+            wybrany = None  # (priorytet, nr zgłoszenia, kolejka, kubełek rodziny)
+            for (priorytet, rodzina), pas in sorted(self._pasy.items()):
+                while pas and pas[0][1].done():  # anulowane w międzyczasie
+                    pas.popleft()
+                if not pas:
+                    del self._pasy[(priorytet, rodzina)]
+                    continue
+                if wybrany is not None and priorytet > wybrany[0]:
+                    break
+                kubelek = self._kubelek(rodzina)
+                t = max(kubelek.czas_do_tokena(), self._pauza(rodzina))
+                if t > 0:
+                    czekaj = t if czekaj is None else min(czekaj, t)
+                elif wybrany is None or pas[0][0] < wybrany[1]:
+                    wybrany = (priorytet, pas[0][0], pas, kubelek)
+
+            if wybrany is not None:
+                t = self.globalny.czas_do_tokena()
+                if t <= 0:
+                    _, _, pas, kubelek = wybrany
+                    _, fut = pas.popleft()
+                    self.globalny.pobierz()
+                    kubelek.pobierz()
+                    fut.set_result(None)
+                    continue
+                czekaj = t if czekaj is None else min(czekaj, t)
+            self._sygnal.clear()
+            try:
+                await asyncio.wait_for(self._sygnal.wait(), timeout=czekaj)
+            except asyncio.TimeoutError:
+                pass
+
+    def glebokosc(self):
+        glebokosc = collections.Counter()
+        for (priorytet, _), pas in self._pasy.items():
+            if pas: glebokosc[priorytet] += len(pas)
+        return dict(glebokosc)
+
+    def stats(self):
+        return {
+            "queue": self.glebokosc(),
+            "dispatched": self.wydane,
+            "avg_wait": self.czekanie_suma / self.wydane if self.wydane else 0.0,
+            "max_wait": self.czekanie_max,
+            "throttled": self.throttled,
+        }
+
+    def close(self):
+        if self._zadanie is not None:
+            self._zadanie.cancel()
+            self._zadanie = None
@@ -3,13 +3,30 @@ from discord.ext import commands, tasks
 import asyncio
 import datetime
 import os
-import aiohttp
-import base64
+import csv
+import io
 import json
 import random
+import re
+import time
+import zipfile
+import numpy as np
 from anthropic import AsyncAnthropic
 from openai import AsyncOpenAI
-from keep_alive import keep_alive  # <--- To musi byc w pliku keep_alive.py
+from keep_alive import HealthServer, PORT
+from allegro_api import HttpPool
+from limiter import PRIORYTET_KOMENDY
+from baza import StateStore
+from powiadomienia import NotificationQueue, StreamingEmbed, podziel_tekst
+from cache_ai import ResponseCache, klucz_cache
+from szeregi import TimeSeriesStore
+from harmonogram import AdaptiveSchedule
+import kalkulator
+from metryki import metryki
+from zdarzenia import EventBus, OrderCreated, BuyerMessage, OfferSalesIncreased, obsluga_ingestii
+from konta import Konto, wczytaj_konfiguracje, shard_konta
+from modele import Zamowienie, Watek, OfertaListingu, dekoduj
+import sprzedaz
 
 # --- KONFIGURACJA! ---
 TOKEN = os.environ.get("DISCORD_TOKEN")
@@ -20,12 +37,71 @@ PERPLEXITY_KEY = os.environ.get("PERPLEXITY_API_KEY") or os.environ.get("PERPLEX
 ALLEGRO_CLIENT_ID = os.environ.get("ALLEGRO_CLIENT_ID")
 ALLEGRO_CLIENT_SECRET = os.environ.get("ALLEGRO_CLIENT_SECRET")
 ALLEGRO_REDIRECT_URI = "http://localhost:8000"
+ALLEGRO_KONTO_NAZWA = os.environ.get("ALLEGRO_ACCOUNT_NAME", "glowne")
 
 # --- ID KANAŁÓW ---
 KANAL_ZAMOWIENIA_ID = 1464959293681045658
 KANAL_WIADOMOSCI_ID = 1465688093808922728 
 KANAL_TRACKER_ID = 1466194659184476261 # <--- ZMIEŃ JEŚLI POTRZEBA
 
+# Tracker: ile zapytań naraz i ile ID ofert w jednym zapytaniu do listingu
+TRACKER_WSPOLBIEZNOSC = int(os.environ.get("TRACKER_CONCURRENCY", "10"))
+TRACKER_PARTIA = int(os.environ.get("TRACKER_BATCH_SIZE", "20"))
+TRACKER_PROG_ZBIORCZY = 3 # Powyżej tylu wzrostów w jednym przebiegu wysyłamy jeden zbiorczy embed
+SZEREGI_PLIK = os.environ.get("TRACKER_HISTORY_FILE", "tracker_historia.npz")
+
+# Adaptacyjny harmonogram: granice interwału (minuty) i budżet sprawdzeń ofert na minutę
+TRACKER_MIN_INTERWAL = float(os.environ.get("TRACKER_MIN_INTERVAL_MIN", "5")) * 60
+TRACKER_MAX_INTERWAL = float(os.environ.get("TRACKER_MAX_INTERVAL_MIN", "360")) * 60
+TRACKER_START_INTERWAL = 30 * 60
+TRACKER_BUDZET = int(os.environ.get("TRACKER_BUDGET_PER_MIN", "200"))
+TRACKER_IMPORT_MAX = int(os.environ.get("TRACKER_IMPORT_MAX", "1000")) # Limit ofert z jednego importu / wyszukiwania
+LISTING_STRONA = 100 # Maksymalny `limit` publicznego listingu
+TRACKER_LISTA_STRONA = 20 # Ofert na stronę w !lista_tracker
+
+# Monitor zamówień: rozmiar strony przy stronicowaniu checkout-forms (max 100 w API)
+ZAMOWIENIA_STRONA = 100
+
+# Auto-responder: strona wątków (max 20 w API), limit stron na cykl i ile wątków obsługujemy naraz
+WATKI_STRONA = 20
+WATKI_MAX_STRON = int(os.environ.get("RESPONDER_MAX_PAGES", "10"))
+RESPONDER_WSPOLBIEZNOSC = int(os.environ.get("RESPONDER_CONCURRENCY", "5"))
+
+# Tryb zdarzeń: zamiast odpytywać checkout-forms czytamy dziennik /order/events
+ZAMOWIENIA_ZDARZENIA = os.environ.get("ALLEGRO_ORDER_EVENTS", "0") == "1"
+ZDARZENIA_LIMIT = 1000
+MONITOR_INTERWAL = float(os.environ.get("MONITOR_INTERVAL", "5" if ZAMOWIENIA_ZDARZENIA else "60"))
+
+# Raport sprzedaży: godzina wysyłki (czas polski) i rodzaje raportów (dzienny za wczoraj, tygodniowy w poniedziałek)
+RAPORT_GODZINA = int(os.environ.get("SALES_DIGEST_HOUR", "8"))
+RAPORT_RODZAJE = {r.strip() for r in os.environ.get("SALES_DIGEST", "daily,weekly").split(",") if r.strip()}
+
+# Pamięć przetworzonych ID: maksymalna liczba wpisów i czas życia (godziny)
+DEDUP_MAX = int(os.environ.get("DEDUP_MAX_SIZE", "10000"))
+DEDUP_TTL_H = float(os.environ.get("DEDUP_TTL_HOURS", "168"))
+
+# Trwały stan (token, tracker, historia powiadomień) - przeżywa restart
+BAZA_SCIEZKA = os.environ.get("BOT_STATE_DB", "bot_stan.db")
+
+# Masowe GPSR: ile opisów generujemy naraz i maksymalna wielkość jednego zadania
+GPSR_WSPOLBIEZNOSC = int(os.environ.get("GPSR_BATCH_CONCURRENCY", "4"))
+GPSR_MAX_PRODUKTOW = 2000
+# Limit załącznika Discorda poza serwerem (na serwerze bierzemy limit z jego poziomu boostów)
+LIMIT_ZALACZNIKA = 8 * 1024 * 1024
+
+# Wiele kont w jednym procesie (ALLEGRO_ACCOUNTS) i opcjonalny podział kont między procesy:
+# proces SHARD_INDEX z SHARD_COUNT obsługuje tylko konta, których crc32(nazwa) % SHARD_COUNT == SHARD_INDEX
+SHARD_COUNT = max(1, int(os.environ.get("SHARD_COUNT", "1")))
+SHARD_INDEX = int(os.environ.get("SHARD_INDEX", "0"))
+
+# Wpychanie zdarzeń z innych systemów (POST /events) - bez tokena endpoint jest wyłączony
+INGEST_TOKEN = os.environ.get("EVENTS_INGEST_TOKEN")
+
+# Serwer zdrowia (/healthz): czas na start, tolerancja rozłączenia z Discordem i maks. wiek udanego odpytania Allegro (sekundy)
+ZDROWIE_START = int(os.environ.get("HEALTH_STARTUP_GRACE", "300"))
+ZDROWIE_GATEWAY = int(os.environ.get("HEALTH_GATEWAY_GRACE", "180"))
+ZDROWIE_ALLEGRO = float(os.environ.get("HEALTH_ALLEGRO_MAX_AGE", max(900, MONITOR_INTERWAL * 10)))
+
 # TREŚĆ AUTOMATYCZNEJ ODPOWIEDZI
 AUTO_REPLY_MSG = (
     "Dzień dobry! Dziękujemy za wiadomość. Właśnie ją odebraliśmy. "
@@ -37,18 +113,104 @@ AUTO_REPLY_MSG = (
 claude_client = AsyncAnthropic(api_key=CLAUDE_KEY)
 perplexity_client = AsyncOpenAI(api_key=PERPLEXITY_KEY, base_url="https://api.perplexity.ai")
 
+# Cache odpowiedzi AI (!gpsr, !trend) - te same pytania nie idą drugi raz do API
+cache_odpowiedzi = ResponseCache()
+
+# Wspólna pula połączeń HTTP dla wszystkich kont, pętli i komend
+pula_http = HttpPool()
+
+# Trwała baza stanu - wczytujemy wszystko raz przy starcie
+baza = StateStore(BAZA_SCIEZKA)
+
+# Konta Allegro: każde ma własny token, limity zapytań, stan monitora i kanały
+konfiguracja_kont = wczytaj_konfiguracje({
+    "nazwa": ALLEGRO_KONTO_NAZWA, "client_id": ALLEGRO_CLIENT_ID, "client_secret": ALLEGRO_CLIENT_SECRET,
+    "redirect_uri": ALLEGRO_REDIRECT_URI, "kanal_zamowienia": KANAL_ZAMOWIENIA_ID,
+    "kanal_wiadomosci": KANAL_WIADOMOSCI_ID, "kanal_tracker": KANAL_TRACKER_ID,
+})
+konta = [
+    Konto(**k, baza=baza, pula=pula_http, dedup_max=DEDUP_MAX, dedup_ttl=DEDUP_TTL_H * 3600)
+    for k in konfiguracja_kont if shard_konta(k["nazwa"], SHARD_COUNT, k.get("glowne")) == SHARD_INDEX
+]
+konta_po_nazwie = {k.nazwa: k for k in konta}
+# Konto główne (tracker, komendy ogólne) żyje tylko w shardzie 0
+konto_glowne = konta_po_nazwie.get(ALLEGRO_KONTO_NAZWA)
+# Do którego konta należy kanał - także dla kont z innych shardów (żeby nie odpowiadać za nie)
+konto_kanalu = {}
+for _k in reversed(konfiguracja_kont):
+    for _kanal in (_k["kanal_zamowienia"], _k["kanal_wiadomosci"], _k["kanal_tracker"]):
+        konto_kanalu[_kanal] = _k["nazwa"]
+WIELE_KONT = len(konfiguracja_kont) > 1
+
 # Zmienne globalne
-allegro_token = None
-processed_order_ids = set() 
-processed_msg_ids = set()
-tryb_testowy = True
-responder_active = False
-sledzone_oferty = {} # Słownik: { 'ID_OFERTY': 'OSTATNIA_ILOSC_SPRZEDANYCH' }
+start_bota = time.time()
+rozlaczony_od = None # time.time() utraty połączenia z gateway Discorda (None = połączony)
+sledzone_oferty = baza.oferty() # Słownik: { 'ID_OFERTY': 'OSTATNIA_ILOSC_SPRZEDANYCH' }
+historia_ofert = TimeSeriesStore(SZEREGI_PLIK) # Historia sprzedaży i cen z każdego przebiegu trackera
+ostatnia_kompaktacja = 0.0
+ostatni_zapis_historii = 0.0
+
+# Kiedy sprawdzić którą ofertę - szybko sprzedające się częściej, uśpione rzadziej
+harmonogram_ofert = AdaptiveSchedule(TRACKER_MIN_INTERWAL, TRACKER_MAX_INTERWAL, TRACKER_START_INTERWAL)
+for _oferta_id, _interwal in (baza.get("tracker_interwaly") or {}).items():
+    if _oferta_id in sledzone_oferty: harmonogram_ofert.dodaj(_oferta_id, interwal=_interwal)
+for _oferta_id in sledzone_oferty:
+    if _oferta_id not in harmonogram_ofert: harmonogram_ofert.dodaj(_oferta_id)
 
 # Konfiguracja bota
+class EcommerceBot(commands.Bot):
+    async def setup_hook(self):
+        baza.start()
+        await serwer_zdrowia.start()
+
+    async def on_command_error(self, ctx, error):
+        # Komendę z kanału konta z innego shardu obsługuje proces tego konta
+        if isinstance(error, commands.CheckFailure): return
+        await super().on_command_error(ctx, error)
+
+    async def close(self):
+        await serwer_zdrowia.close()
+        # Najpierw subskrybenci kończą zdarzenia z kolejek (powiadomienia, auto-reply), dopiero potem zamykamy powiadomienia
+        await magistrala.close()
+        # Historię trackera zapisuje tylko shard 0 - pozostałe miałyby nieaktualną kopię tego samego pliku
+        if konto_glowne is not None:
+            await historia_ofert.zapisz()
+        await historia_ofert.close()
+        await powiadomienia.close()
+        await cache_odpowiedzi.close()
+        for konto in konta:
+            await konto.allegro.close()
+        await pula_http.close()
+        await baza.close()
+        await super().close()
+
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix='!', intents=intents, help_command=None)
+bot = EcommerceBot(command_prefix='!', intents=intents, help_command=None)
+
+# Kolejka powiadomień - pętle Allegro nie czekają na Discorda
+powiadomienia = NotificationQueue(bot)
+
+# Magistrala zdarzeń - pollery i /events publikują, powiadomienia i auto-reply subskrybują
+magistrala = EventBus()
+
+# Wskaźniki liczone przy każdym odczycie /metrics
+metryki.gauge("allegro_queue_depth", lambda: {(("account", k.nazwa), ("priority", str(p))): n
+                                             for k in konta for p, n in k.allegro.scheduler.stats()["queue"].items()})
+metryki.gauge("notification_queue_depth", powiadomienia.glebokosc)
+metryki.gauge("event_queue_depth", magistrala.glebokosc)
+metryki.gauge("ai_cache", lambda: {(("stat", k),): v for k, v in cache_odpowiedzi.stats().items()})
+metryki.gauge("dedup_entries", lambda: {**{(("account", k.nazwa), ("kind", "orders")): len(k.processed_order_ids) for k in konta},
+                                        **{(("account", k.nazwa), ("kind", "messages")): len(k.processed_msg_ids) for k in konta}})
+metryki.gauge("tracker_offers", lambda: len(sledzone_oferty))
+metryki.gauge("tracker_overdue", harmonogram_ofert.zalegle)
+metryki.gauge("monitor_last_success_age_seconds", lambda: {(("account", k.nazwa),): time.time() - k.ostatni_udany_monitor
+                                                           for k in konta if k.ostatni_udany_monitor})
+metryki.opis("loop_lag_seconds", "Opóźnienie startu iteracji pętli względem jej interwału")
+metryki.opis("allegro_request_seconds", "Czas pojedynczego zapytania HTTP do Allegro")
+metryki.opis("allegro_unchanged_total", "Zapytania warunkowe bez zmian od poprzedniego cyklu (304 albo ten sam skrót treści)")
+metryki.opis("payload_invalid_total", "Rekordy z API w nieoczekiwanym kształcie, pominięte przy dekodowaniu (per model)")
+metryki.opis("order_events_skipped_total", "Zdarzenia zamówień pominięte, bo zamówienie już nie istnieje (404 / 410)")
 
 # --- FUNKCJE POMOCNICZE ---
 def clean_text(text):
@@ -71,6 +233,9 @@ def czy_swieze_zamowienie(data_str):
         print(f"⚠️ Błąd daty: {e}")
         return True 
 
+def teraz_iso():
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
 def parsuj_liczbe(tekst):
     if not tekst: return 0.0
     tekst = str(tekst).replace(',', '.').replace('%', '').strip()
@@ -88,241 +253,631 @@ def wyciagnij_id_z_linku(tekst):
         return tekst
     return None
 
+def wyciagnij_id_z_tekstu(tekst):
+    """
+    ID ofert z wklejonej listy albo pliku (linki, same numery, CSV) - bez duplikatów, w kolejności wystąpienia.
+    Gołe liczby krótsze niż 10 cyfr (np. kolumna z ilością w CSV) pomijamy.
+    """
+    ids = {}
+    for slowo in re.split(r"[\s,;\"'<>()\[\]]+", tekst):
+        if "allegro.pl" in slowo or (slowo.isdigit() and len(slowo) >= 10):
+            oferta_id = wyciagnij_id_z_linku(slowo)
+            if oferta_id: ids[oferta_id] = None
+    return list(ids)
+
+# --- KONTA (routing komend i zdarzeń) ---
+def konto_dla(ctx):
+    """Konto, którego kanał jest kontekstem komendy; poza kanałami sklepów - konto główne."""
+    kanal = getattr(ctx, "channel", None)
+    kanal_id = getattr(kanal, "id", None)
+    for konto in konta:
+        if kanal_id in konto.kanaly(): return konto
+    return konto_glowne
+
+def etykieta(konto):
+    # Przy jednym koncie embedy wyglądają jak dawniej
+    return f"[{konto.nazwa}] " if WIELE_KONT else ""
+
 # --- LOGIKA ALLEGRO (API) ---
-async def get_allegro_token(auth_code):
-    auth_str = f"{ALLEGRO_CLIENT_ID}:{ALLEGRO_CLIENT_SECRET}"
-    b64_auth = base64.b64encode(auth_str.encode()).decode()
-    url = "https://allegro.pl/auth/oauth/token"
-    headers = {"Authorization": f"Basic {b64_auth}"}
-    data = {"grant_type": "authorization_code", "code": auth_code, "redirect_uri": ALLEGRO_REDIRECT_URI}
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, headers=headers, data=data) as resp:
-            if resp.status == 200: return await resp.json()
-            return None
-
-async def fetch_orders():
-    global allegro_token
-    if not allegro_token: return None
-    url = "https://api.allegro.pl/order/checkout-forms?limit=5"
-    headers = {"Authorization": f"Bearer {allegro_token}", "Accept": "application/vnd.allegro.public.v1+json"}
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as resp:
-            if resp.status == 200: return await resp.json()
-            return None
-
-async def pobierz_wiadomosci():
-    global allegro_token
-    if not allegro_token: return None
-    url = "https://api.allegro.pl/messaging/threads?limit=5" 
-    headers = {"Authorization": f"Bearer {allegro_token}", "Accept": "application/vnd.allegro.public.v1+json"}
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as resp:
-            if resp.status == 200: return await resp.json()
-            return None
-
-async def wyslij_odpowiedz(thread_id, text):
-    global allegro_token
-    url = f"https://api.allegro.pl/messaging/threads/{thread_id}/messages"
-    headers = {
-        "Authorization": f"Bearer {allegro_token}",
-        "Accept": "application/vnd.allegro.public.v1+json",
-        "Content-Type": "application/vnd.allegro.public.v1+json"
-    }
-    payload = {"text": text}
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, headers=headers, json=payload) as resp:
-            return resp.status == 201
-
-async def oznacz_jako_przeczytane(thread_id, last_msg_id):
-    global allegro_token
-    url = f"https://api.allegro.pl/messaging/threads/{thread_id}/read"
-    headers = {"Authorization": f"Bearer {allegro_token}", "Accept": "application/vnd.allegro.public.v1+json", "Content-Type": "application/vnd.allegro.public.v1+json"}
-    payload = {"lastSeenMessageId": last_msg_id}
-    async with aiohttp.ClientSession() as session:
-        await session.put(url, headers=headers, json=payload)
+async def get_allegro_token(konto, auth_code):
+    # Token manager zapamiętuje też refresh_token i czas wygaśnięcia
+    return await konto.allegro.tokens.exchange_code(auth_code)
+
+async def pobierz_strone_zamowien(konto, limit=5, offset=0, od=None, warunkowo=False):
+    if not konto.allegro.token: return None
+    params = {"limit": limit, "offset": offset}
+    if od: params["updatedAt.gte"] = od
+    resp = await konto.allegro.get("/order/checkout-forms", params=params, warunkowo=warunkowo)
+    if resp.status == 200:
+        konto.ostatni_udany_monitor = time.time()
+        return resp
+    return None
 
-# --- PĘTLA AUTO-RESPONDERA ---
-@tasks.loop(minutes=2) 
-async def allegro_responder():
-    global allegro_token, tryb_testowy, responder_active, processed_msg_ids
-    if not allegro_token: return
+async def fetch_orders(konto, limit=5, offset=0, od=None):
+    resp = await pobierz_strone_zamowien(konto, limit, offset, od)
+    return resp.data if resp else None
+
+async def pobierz_zamowienia_od(konto, od):
+    """Wszystkie zamówienia zmienione od `od` (ze stronicowaniem). None = błąd, spróbujemy w kolejnym cyklu."""
+    zamowienia = []
+    offset = 0
+    while True:
+        resp = await pobierz_strone_zamowien(konto, limit=ZAMOWIENIA_STRONA, offset=offset, od=od, warunkowo=offset == 0)
+        data = resp.data if resp else None
+        if not data or "checkoutForms" not in data: return None
+        # Ta sama pierwsza strona co w poprzednim cyklu (zwykle samo zamówienie ze znacznika) - nic nowego
+        if resp.bez_zmian: return []
+        strona = data["checkoutForms"]
+        zamowienia.extend(dekoduj(Zamowienie, strona))
+        offset += len(strona)
+        if len(strona) < ZAMOWIENIA_STRONA or offset >= data.get("totalCount", 0):
+            return zamowienia
+
+async def pobierz_wiadomosci(konto, limit=WATKI_STRONA, offset=0, warunkowo=False):
+    if not konto.allegro.token: return None
+    resp = await konto.allegro.get("/messaging/threads", params={"limit": limit, "offset": offset}, warunkowo=warunkowo)
+    if resp.status == 200: return resp
+    return None
 
+async def pobierz_aktywne_watki(konto):
+    """
+    Wątki są posortowane od najnowszej wiadomości, więc stronicujemy tylko do pierwszej
+    strony, na której pojawia się wątek starszy niż okno świeżości.
+    Niezmieniona pierwsza strona oznacza, że od poprzedniego cyklu nikt nie napisał - zwracamy pustą listę.
+    """
+    watki = []
+    for strona in range(WATKI_MAX_STRON):
+        resp = await pobierz_wiadomosci(konto, offset=strona * WATKI_STRONA, warunkowo=strona == 0)
+        data = resp.data if resp else None
+        if not data or "threads" not in data: break
+        if resp.bez_zmian: return []
+        strona_watkow = dekoduj(Watek, data["threads"])
+        watki.extend(strona_watkow)
+        if len(data["threads"]) < WATKI_STRONA: break
+        if any(not czy_swieze_zamowienie(t.czas) for t in strona_watkow): break
+    return watki
+
+async def pobierz_zamowienie(konto, order_id):
+    """Zwraca (status, zamówienie) - status pozwala odróżnić zamówienie, którego już nie ma, od chwilowej awarii."""
+    resp = await konto.allegro.get(f"/order/checkout-forms/{order_id}")
+    return resp.status, (resp.data if resp.status == 200 else None)
+
+async def pobierz_zdarzenia_zamowien(konto, od_id):
+    params = {"type": "READY_FOR_PROCESSING", "limit": ZDARZENIA_LIMIT}
+    if od_id: params["from"] = od_id
+    resp = await konto.allegro.get("/order/events", params=params)
+    if resp.status == 200:
+        konto.ostatni_udany_monitor = time.time()
+        return (resp.data or {}).get("events", [])
+    return None
+
+async def pobierz_najnowsze_zdarzenie_id(konto):
+    resp = await konto.allegro.get("/order/event-stats")
+    if resp.status == 200: return ((resp.data or {}).get("latestEvent") or {}).get("id")
+    return None
+
+async def wyslij_odpowiedz(konto, thread_id, text):
+    resp = await konto.allegro.post(f"/messaging/threads/{thread_id}/messages", json={"text": text})
+    return resp.status == 201
+
+async def oznacz_jako_przeczytane(konto, thread_id, last_msg_id):
+    await konto.allegro.put(f"/messaging/threads/{thread_id}/read", json={"lastSeenMessageId": last_msg_id})
+
+async def pobierz_oferte_z_listingu(oferta_id):
+    # Publiczny listing zamiast prywatnego (sale/offers) - omija błąd 403 dla cudzych ofert
+    # Wołane z komendy, więc wyprzedza masowe zapytania trackera
+    return await konto_glowne.allegro.get("/offers/listing", params={"offer.id": oferta_id}, priorytet=PRIORYTET_KOMENDY)
+
+def oferty_z_listingu(data):
+    # Oferta może być w regular lub promoted
+    items = (data or {}).get("items") or {}
+    return dekoduj(OfertaListingu, (items.get("regular") or []) + (items.get("promoted") or []))
+
+async def pobierz_partie_ofert(ids, semafor, priorytet=None, warunkowo=True):
+    """
+    Zwraca { ID_OFERTY: (status, OfertaListingu) } dla partii ofert.
+    Pyta listing o kilka `offer.id` naraz; czego nie ma w udanej odpowiedzi partii,
+    to dopytujemy pojedynczo (API nie zawsze zwraca wszystkie ID z jednego zapytania).
+    Gdy całe zapytanie się nie uda (429 / 5xx po ponowieniach, 401), cała partia wraca z tym statusem.
+    `warunkowo=False` przy weryfikacji nowych ofert - tam potrzebujemy danych, a nie informacji "bez zmian".
+    """
+    try:
+        async with semafor:
+            resp = await konto_glowne.allegro.get("/offers/listing", params=[("offer.id", i) for i in ids],
+                                                  priorytet=priorytet, warunkowo=warunkowo)
+    except Exception as e:
+        print(f"⚠️ Błąd pobierania partii ofert: {e}")
+        return {i: (None, None) for i in ids}
+
+    if resp.bez_zmian:
+        # Ta sama odpowiedź co ostatnio - sprzedaż się nie zmieniła; oferty z zapamiętanej odpowiedzi
+        # idą dalej ze statusem 304, żeby historia dostała próbkę z dotychczasową popularnością
+        # (niepełną partię przetwarzamy jak zwykle, bo brakujące oferty i tak dopytujemy pojedynczo)
+        znalezione = {o.id: o for o in oferty_z_listingu(resp.data)}
+        if len(ids) == 1 or all(i in znalezione for i in ids):
+            return {i: (304, znalezione[i]) if i in znalezione else (200, None) for i in ids}
+
+    if len(ids) == 1:
+        lista = oferty_z_listingu(resp.data) if resp.status == 200 else []
+        return {ids[0]: (resp.status, lista[0] if lista else None)}
+
+    if resp.status != 200:
+        # Bez pojedynczych dopytań - przy throttlingu czy awarii tylko zwiększyłyby ruch;
+        # harmonogram trackera przełoży te oferty na później. 404 całej partii nie znaczy,
+        # że każda z ofert zniknęła, więc nie przekazujemy go dalej (tracker by je usunął)
+        status = None if resp.status == 404 else resp.status
+        return {i: (status, None) for i in ids}
+
+    wyniki = {}
+    for oferta in oferty_z_listingu(resp.data):
+        if oferta.id in ids:
+            wyniki[oferta.id] = (200, oferta)
+
+    brakujace = [i for i in ids if i not in wyniki]
+    if brakujace:
+        pojedyncze = await asyncio.gather(*(pobierz_partie_ofert([i], semafor, priorytet, warunkowo) for i in brakujace))
+        for wynik in pojedyncze:
+            wyniki.update(wynik)
+    return wyniki
+
+# --- BRAMKA ZDARZEŃ (wspólna dla pollerów i /events) ---
+def przyjmij_zdarzenie(zdarzenie):
+    """
+    Odrzuca duplikaty i publikuje resztę na magistrali. Zwraca True, jeśli zdarzenie poszło dalej.
+    Zdarzenia zamówień i wiadomości bez nazwy konta należą do konta głównego; konto z innego shardu odrzucamy.
+    """
+    if isinstance(zdarzenie, (OrderCreated, BuyerMessage)):
+        konto = konta_po_nazwie.get(zdarzenie.konto or ALLEGRO_KONTO_NAZWA)
+        if konto is None: return False
+        zdarzenie.konto = konto.nazwa
+
+    if isinstance(zdarzenie, OrderCreated):
+        if zdarzenie.id in konto.processed_order_ids: return False
+        konto.processed_order_ids.add(zdarzenie.id, zdarzenie.order.updated_at)
+        zlicz_sprzedaz(konto, zdarzenie.order)
+
+    elif isinstance(zdarzenie, BuyerMessage):
+        thread = zdarzenie.thread
+        if thread.autor != "BUYER": return False
+        # Powiadamiamy raz o każdej świeżej wiadomości, a nieprzeczytany wątek trafia do auto-reply
+        zdarzenie.nowa = czy_swieze_zamowienie(thread.utworzono) and zdarzenie.msg_id not in konto.processed_msg_ids
+        if zdarzenie.nowa:
+            konto.processed_msg_ids.add(zdarzenie.msg_id, thread.utworzono)
+        do_odpowiedzi = not thread.read and thread.id not in konto.odpowiedzi_w_toku
+        if not zdarzenie.nowa and not do_odpowiedzi: return False
+        if do_odpowiedzi: konto.odpowiedzi_w_toku.add(thread.id)
+
+    magistrala.publish(zdarzenie)
+    return True
+
+# --- PĘTLA AUTO-RESPONDERA ---
+def powiadom_o_wiadomosci(zdarzenie):
+    if not zdarzenie.nowa: return
+    konto = konta_po_nazwie[zdarzenie.konto]
+    thread = zdarzenie.thread
+
+    embed = discord.Embed(title=f"📩 {etykieta(konto)}NOWA WIADOMOŚĆ", color=0x3498db)
+    embed.add_field(name="Klient", value=thread.rozmowca, inline=True)
+    embed.add_field(name="Treść", value=f"*{thread.tekst}*", inline=False)
+    
+    status_ar = "✅ Włączony" if konto.responder_active else "❌ Wyłączony (Tylko powiadomienie)"
+    if thread.read: status_ar += " (Odczytana na Allegro)"
+    
+    embed.set_footer(text=f"Auto-Reply: {status_ar} | {polski_czas()}")
+    powiadomienia.send(konto.kanal_wiadomosci, content="@here Klient pisze!", embed=embed)
+    print(f"✅ Zakolejkowano powiadomienie o wiadomości ID: {zdarzenie.msg_id}")
+
+async def odpowiedz_automatycznie(zdarzenie):
+    konto = konta_po_nazwie[zdarzenie.konto]
+    thread = zdarzenie.thread
+    thread_id = thread.id
+    wysylka, wyslano = False, False
     try:
-        data = await pobierz_wiadomosci()
-        if not data or "threads" not in data: return
-
-        for thread in data["threads"]:
-            last_msg = thread["lastMessage"]
-            msg_id = last_msg["id"]
-            author_role = last_msg["author"]["role"]
-            thread_id = thread["id"]
+        if not konto.responder_active or thread.read: return
+        if konto.tryb_testowy:
+            print(f"🛡️ [TEST] {etykieta(konto)}Bot odpisałby na wątek {thread_id}")
+            return
+        wysylka = True
+        sukces = await wyslij_odpowiedz(konto, thread_id, AUTO_REPLY_MSG)
+        if sukces:
+            wyslano = True
+            print(f"🤖 {etykieta(konto)}Odpisano automatycznie do wątku {thread_id}")
+            await oznacz_jako_przeczytane(konto, thread_id, zdarzenie.msg_id)
             
-            is_fresh = czy_swieze_zamowienie(last_msg["createdAt"]) 
-
-            # POWIADOMIENIE
-            if author_role == "BUYER" and is_fresh and msg_id not in processed_msg_ids:
-                processed_msg_ids.add(msg_id)
-                
-                channel = bot.get_channel(KANAL_WIADOMOSCI_ID)
-                if channel:
-                    embed = discord.Embed(title="📩 NOWA WIADOMOŚĆ", color=0x3498db)
-                    embed.add_field(name="Klient", value=thread["interlocutor"]["login"], inline=True)
-                    embed.add_field(name="Treść", value=f"*{last_msg['text']}*", inline=False)
-                    
-                    status_ar = "✅ Włączony" if responder_active else "❌ Wyłączony (Tylko powiadomienie)"
-                    if thread["read"]: status_ar += " (Odczytana na Allegro)"
-                    
-                    embed.set_footer(text=f"Auto-Reply: {status_ar} | {polski_czas()}")
-                    await channel.send(content="@here Klient pisze!", embed=embed)
-                    print(f"✅ Wysłano powiadomienie o wiadomości ID: {msg_id}")
-
-            # AUTO-REPLY
-            if responder_active and thread["read"] == False and author_role == "BUYER":
-                if tryb_testowy:
-                    print(f"🛡️ [TEST] Bot odpisałby na wątek {thread_id}")
-                    pass 
-                else:
-                    sukces = await wyslij_odpowiedz(thread_id, AUTO_REPLY_MSG)
-                    if sukces:
-                        print(f"🤖 Odpisano automatycznie do wątku {thread_id}")
-                        await oznacz_jako_przeczytane(thread_id, msg_id)
-                        
-                        channel = bot.get_channel(KANAL_WIADOMOSCI_ID)
-                        if channel:
-                            await channel.send(f"🤖 **Auto-Reply:** Wysłano odpowiedź do klienta.")
-                    else:
-                        print(f"❌ Błąd wysyłania odpowiedzi do {thread_id}")
+            powiadomienia.send(konto.kanal_wiadomosci, content=f"🤖 {etykieta(konto)}**Auto-Reply:** Wysłano odpowiedź do klienta.")
+        else:
+            print(f"❌ Błąd wysyłania odpowiedzi do {thread_id}")
+    finally:
+        konto.odpowiedzi_w_toku.discard(thread_id)
+        # Odpowiedź nie poszła (False albo wyjątek) - bez tego kolejny cykl dostałby 304 i wątek zostałby bez odpowiedzi
+        if wysylka and not wyslano:
+            ponow_wszystko(konto)
+
+def ponow_wszystko(konto):
+    # Pollery pomijają niezmienione odpowiedzi - po zmianie ustawień albo nieudanej odpowiedzi
+    # wątki muszą przejść przez bramkę jeszcze raz
+    konto.allegro.zapomnij_odpowiedzi()
+
+async def odpytaj_watki(konto):
+    try:
+        start = time.perf_counter()
+        watki = await pobierz_aktywne_watki(konto)
+        if not watki: return
+
+        # Poller tylko publikuje - powiadomienie i auto-reply obsługują subskrybenci magistrali
+        for thread in watki:
+            try:
+                przyjmij_zdarzenie(BuyerMessage(thread, konto=konto.nazwa))
+            except Exception as e:
+                print(f"Błąd Respondera (wątek {thread.id}): {e}")
+
+        konto.ostatni_cykl_respondera = (len(watki), time.perf_counter() - start)
+        print(f"📨 {etykieta(konto)}Responder: {len(watki)} wątków w {konto.ostatni_cykl_respondera[1]:.2f}s")
 
     except Exception as e:
-        print(f"Błąd Respondera: {e}")
+        metryki.inc("loop_errors_total", loop="responder")
+        print(f"Błąd Respondera ({konto.nazwa}): {e}")
+
+@tasks.loop(minutes=2) 
+@metryki.petla("responder", 120)
+async def allegro_responder():
+    # Wszystkie konta w jednej iteracji, równolegle - każde ma własną kolejkę i limity API,
+    # więc wolny sklep nie opóźnia pozostałych
+    await asyncio.gather(*(odpytaj_watki(k) for k in konta if k.allegro.token))
 
 # --- PĘTLA SPRAWDZAJĄCA ZAMÓWIENIA ---
-@tasks.loop(seconds=60)
-async def allegro_monitor():
-    global processed_order_ids, allegro_token
+async def powiadom_o_zamowieniu(zdarzenie):
+    konto = konta_po_nazwie[zdarzenie.konto]
+    order = zdarzenie.order
+    order_id = order.id
+    
+    produkty_tekst = ""
+    for item in order.pozycje:
+        nazwa_oferty = item.nazwa
+        if len(nazwa_oferty) > 45: nazwa_oferty = nazwa_oferty[:45] + "..."
+        produkty_tekst += f"• {item.ilosc}x **{nazwa_oferty}**\n"
     
-    if not allegro_token:
-        return 
+    embed = discord.Embed(title=f"💰 {etykieta(konto)}NOWE ZAMÓWIENIE!", color=0xf1c40f)
+    embed.add_field(name="Kupujący", value=order.kupujacy, inline=True)
+    embed.add_field(name="Kwota", value=f"**{order.kwota:.2f} {order.waluta}**", inline=True)
+    embed.add_field(name="📦 Produkty", value=produkty_tekst or "-", inline=False)
+    embed.set_footer(text=f"ID: {order_id} | {polski_czas()}")
+    
+    powiadomienia.send(konto.kanal_zamowienia, content="@here Wpadła kasa! 💸", embed=embed)
+    print(f"✅ Zakolejkowano powiadomienie o zamówieniu {order_id}")
+
+async def monitor_zdarzen(konto):
+    """Czyta dziennik zdarzeń zamówień od ostatniego zapisanego ID - po restarcie wznawia dokładnie tam, gdzie skończył."""
+    if konto.ostatnie_zdarzenie_id is None:
+        # Pierwsze uruchomienie w ogóle - zaczynamy od bieżącego końca dziennika
+        konto.ostatnie_zdarzenie_id = await pobierz_najnowsze_zdarzenie_id(konto)
+        if konto.ostatnie_zdarzenie_id is None: return
+        print(f"⚙️ {etykieta(konto)}Inicjalizacja dziennika zdarzeń zamówień...")
+        konto.set("ostatnie_zdarzenie_id", konto.ostatnie_zdarzenie_id)
+        return
 
-    try:
-        data = await fetch_orders()
-        if not data or "checkoutForms" not in data: return
-        
-        orders = data["checkoutForms"]
-        if not orders: return
-        
-        # Sortujemy od najstarszego
-        orders.sort(key=lambda x: x["updatedAt"])
-        
-        # Inicjalizacja po restarcie
-        if not processed_order_ids:
-            print("⚙️ Inicjalizacja bazy zamówień...")
-            for order in orders:
-                processed_order_ids.add(order["id"])
-            return 
+    while True:
+        events = await pobierz_zdarzenia_zamowien(konto, konto.ostatnie_zdarzenie_id)
+        if not events: return
+
+        for event in events:
+            try:
+                order_id = str(event["order"]["checkoutForm"]["id"])
+            except (KeyError, TypeError) as e:
+                # Zdarzenie w nieoczekiwanym kształcie pomijamy (log + licznik), żeby nie zablokowało kursora
+                metryki.inc("payload_invalid_total", model="OrderEvent")
+                print(f"⚠️ {etykieta(konto)}Pominięto niepoprawne zdarzenie zamówienia {str(event)[:200]} ({e!r})")
+                order_id = None
+            if order_id is not None and order_id not in konto.processed_order_ids:
+                status, order = await pobierz_zamowienie(konto, order_id)
+                if status in (404, 410):
+                    # Zamówienia już nie ma - ponawianie nic nie da, pomijamy je i przesuwamy kursor
+                    metryki.inc("order_events_skipped_total", reason=status)
+                    print(f"⚠️ {etykieta(konto)}Pominięto zdarzenie - zamówienie {order_id} nie istnieje ({status})")
+                elif order is None:
+                    # Błąd chwilowy (5xx / 429 / brak autoryzacji) - nie przesuwamy kursora, ponowimy w kolejnym cyklu
+                    print(f"⚠️ Nie udało się pobrać zamówienia {order_id} ({status})")
+                    return
+                else:
+                    # Zamówienie w nieoczekiwanym kształcie pomijamy (log + licznik), kursor idzie dalej
+                    for zamowienie in dekoduj(Zamowienie, [order]):
+                        przyjmij_zdarzenie(OrderCreated(zamowienie, konto=konto.nazwa))
+
+            # Zdarzenie bez ID (nie da się na nim oprzeć kursora) - kursor przesunie następne poprawne
+            event_id = event.get("id") if isinstance(event, dict) else None
+            if event_id:
+                konto.ostatnie_zdarzenie_id = event_id
+                konto.set("ostatnie_zdarzenie_id", konto.ostatnie_zdarzenie_id)
+
+        if len(events) < ZDARZENIA_LIMIT: return
 
+async def sprawdz_zamowienia(konto):
+    if ZAMOWIENIA_ZDARZENIA:
+        await monitor_zdarzen(konto)
+        return
+
+    # Inicjalizacja po restarcie - zapamiętujemy ostatnie zamówienia i znacznik czasu
+    if konto.ostatni_updated_at is None:
+        data = await fetch_orders(konto)
+        if not data or "checkoutForms" not in data: return
+        print(f"⚙️ {etykieta(konto)}Inicjalizacja bazy zamówień...")
+        orders = dekoduj(Zamowienie, data["checkoutForms"])
         for order in orders:
-            order_id = order["id"]
+            konto.processed_order_ids.add(order.id, order.updated_at)
+        konto.ostatni_updated_at = max((o.updated_at for o in orders), default=teraz_iso())
+        konto.set("ostatni_updated_at", konto.ostatni_updated_at)
+        return
 
-            if order_id in processed_order_ids:
-                continue 
-            
-            processed_order_ids.add(order_id)
-            
-            if len(processed_order_ids) > 100:
-                processed_order_ids.pop()
+    # Pobieramy tylko zmiany od ostatniego znacznika (wszystkie strony przy większym ruchu)
+    orders = await pobierz_zamowienia_od(konto, konto.ostatni_updated_at)
+    if not orders: return
+    konto.ostatni_updated_at = max(konto.ostatni_updated_at, max(o.updated_at for o in orders))
+    konto.set("ostatni_updated_at", konto.ostatni_updated_at)
 
-            if not czy_swieze_zamowienie(order["updatedAt"]):
-                continue 
-            
-            kupujacy = order["buyer"]["login"]
-            kwota = order["summary"]["totalToPay"]["amount"]
-            waluta = order["summary"]["totalToPay"]["currency"]
-            
-            produkty_tekst = ""
-            for item in order["lineItems"]:
-                nazwa_oferty = item['offer']['name']
-                if len(nazwa_oferty) > 45: nazwa_oferty = nazwa_oferty[:45] + "..."
-                produkty_tekst += f"• {item['quantity']}x **{nazwa_oferty}**\n"
-            
-            channel = bot.get_channel(KANAL_ZAMOWIENIA_ID)
-            if channel:
-                embed = discord.Embed(title="💰 NOWE ZAMÓWIENIE!", color=0xf1c40f)
-                embed.add_field(name="Kupujący", value=kupujacy, inline=True)
-                embed.add_field(name="Kwota", value=f"**{kwota} {waluta}**", inline=True)
-                embed.add_field(name="📦 Produkty", value=produkty_tekst, inline=False)
-                embed.set_footer(text=f"ID: {order_id} | {polski_czas()}")
-                
-                await channel.send(content="@here Wpadła kasa! 💸", embed=embed)
-                print(f"✅ Wysłano powiadomienie o zamówieniu {order_id}")
+    # Raporty widzą każdą zmianę statusu (opłacenie, anulowanie), także zamówień już znanych
+    for order in orders:
+        zlicz_sprzedaz(konto, order)
+
+    # Zwykle wraca tylko zamówienie ze znacznika - wtedy nie ma nic do roboty
+    orders = [o for o in orders if o.id not in konto.processed_order_ids]
+    if not orders: return
+    
+    # Sortujemy od najstarszego
+    orders.sort(key=lambda x: x.updated_at)
+
+    for order in orders:
+        if not czy_swieze_zamowienie(order.updated_at):
+            # Stare zamówienie (np. po przerwie) zapamiętujemy bez powiadomienia (do raportu już trafiło wyżej)
+            konto.processed_order_ids.add(order.id, order.updated_at)
+            continue 
+        
+        przyjmij_zdarzenie(OrderCreated(order, konto=konto.nazwa))
 
+async def monitoruj_konto(konto):
+    try:
+        await sprawdz_zamowienia(konto)
     except Exception as e:
-        print(f"Błąd w pętli Allegro: {e}")
+        metryki.inc("loop_errors_total", loop="monitor")
+        print(f"Błąd w pętli Allegro ({konto.nazwa}): {e}")
+
+@tasks.loop(seconds=MONITOR_INTERWAL)
+@metryki.petla("monitor", MONITOR_INTERWAL)
+async def allegro_monitor():
+    # Jedna pętla dla wszystkich kont - niezalogowane konta po prostu pomijamy
+    await asyncio.gather(*(monitoruj_konto(k) for k in konta if k.allegro.token))
 
 # --- PĘTLA TRACKERA (Śledzenie wzrostów sprzedaży) ---
-# --- PĘTLA TRACKERA (Śledzenie wzrostów sprzedaży) ---
-# --- PĘTLA TRACKERA (Śledzenie wzrostów sprzedaży) ---
-@tasks.loop(minutes=30)
+def przetworz_oferte_trackera(oferta_id, znaleziona_oferta):
+    """Aktualizuje stan oferty; zwraca (id, tytuł, wzrost, łącznie) gdy sprzedaż wzrosła."""
+    if not znaleziona_oferta:
+        print(f"⚠️ Nie znaleziono danych dla ID {oferta_id} w publicznym listingu")
+        return None
+    if oferta_id not in sledzone_oferty:
+        return None
+
+    # W publicznym API "popularity" to liczba sprzedanych/zainteresowania
+    aktualna_ilosc = znaleziona_oferta.popularnosc
+    tytul = znaleziona_oferta.nazwa
+    historia_ofert.dodaj(oferta_id, aktualna_ilosc, znaleziona_oferta.cena, nazwa=tytul)
+    
+    roznica = aktualna_ilosc - sledzone_oferty[oferta_id]
+    
+    if roznica > 0:
+        sledzone_oferty[oferta_id] = aktualna_ilosc
+        baza.zapisz_oferte(oferta_id, aktualna_ilosc)
+        print(f"🔥 Wzrost na ofercie {oferta_id}: +{roznica}")
+        return (oferta_id, tytul, roznica, aktualna_ilosc)
+    return None
+
+def powiadom_o_wzrostach(zdarzenia):
+    wzrosty = [(z.oferta_id, z.tytul, z.wzrost, z.lacznie) for z in zdarzenia]
+    if len(wzrosty) <= TRACKER_PROG_ZBIORCZY:
+        for oferta_id, tytul, roznica, aktualna_ilosc in wzrosty:
+            embed = discord.Embed(title="📈 SKOK SPRZEDAŻY!", color=0xe74c3c)
+            embed.add_field(name="Produkt", value=f"[{tytul}](https://allegro.pl/oferta/{oferta_id})", inline=False)
+            embed.add_field(name="Wzrost", value=f"🚀 **+{roznica} szt.**", inline=True)
+            embed.add_field(name="Łącznie sprzedano", value=f"{aktualna_ilosc} szt.", inline=True)
+            powiadomienia.send(konto_glowne.kanal_tracker, embed=embed)
+        return
+
+    # Dużo wzrostów naraz - jeden zbiorczy embed zamiast lawiny wiadomości
+    wzrosty = sorted(wzrosty, key=lambda w: w[2], reverse=True)
+    linie = []
+    for oferta_id, tytul, roznica, aktualna_ilosc in wzrosty:
+        if len(tytul) > 45: tytul = tytul[:45] + "..."
+        linia = f"🚀 **+{roznica}** [{tytul}](https://allegro.pl/oferta/{oferta_id}) ({aktualna_ilosc} szt.)"
+        if sum(len(l) + 1 for l in linie) + len(linia) > 3900:
+            linie.append(f"...i {len(wzrosty) - len(linie)} więcej")
+            break
+        linie.append(linia)
+    embed = discord.Embed(title=f"📈 SKOKI SPRZEDAŻY ({len(wzrosty)} ofert)", description="\n".join(linie), color=0xe74c3c)
+    embed.set_footer(text=f"Łącznie: +{sum(w[2] for w in wzrosty)} szt. | {polski_czas()}")
+    powiadomienia.send(konto_glowne.kanal_tracker, embed=embed)
+
+@tasks.loop(minutes=1)
+@metryki.petla("tracker", 60)
 async def allegro_tracker():
-    global sledzone_oferty, allegro_token
+    global sledzone_oferty, ostatnia_kompaktacja, ostatni_zapis_historii
     
-    if not allegro_token or not sledzone_oferty:
+    # Listing ofert jest publiczny, więc tracker jest wspólny i idzie przez konto główne
+    if not konto_glowne.allegro.token or not sledzone_oferty:
         return
 
     try:
-        do_usuniecia = []
-
-        for oferta_id, stara_ilosc in sledzone_oferty.items():
-            # ZMIANA: Używamy endpointu publicznego (listing) zamiast prywatnego (sale/offers)
-            url = f"https://api.allegro.pl/offers/listing?offer.id={oferta_id}"
-            headers = {"Authorization": f"Bearer {allegro_token}", "Accept": "application/vnd.allegro.public.v1+json"}
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        
-                        # Pobieramy ofertę z wyników wyszukiwania (może być w regular lub promoted)
-                        items = data.get("items", {})
-                        znaleziona_oferta = None
-                        
-                        # Sprawdzamy obie listy
-                        lista_ofert = items.get("regular", []) + items.get("promoted", [])
-                        if lista_ofert:
-                            znaleziona_oferta = lista_ofert[0] # Bierzemy pierwszą (szukamy po ID, więc będzie jedna)
-
-                        if znaleziona_oferta:
-                            # W publicznym API "popularity" to liczba sprzedanych/zainteresowania
-                            aktualna_ilosc = int(znaleziona_oferta.get("sellingMode", {}).get("popularity", 0))
-                            tytul = znaleziona_oferta.get("name", "Nieznana oferta")
-                            
-                            roznica = aktualna_ilosc - stara_ilosc
-                            
-                            if roznica > 0:
-                                channel = bot.get_channel(KANAL_TRACKER_ID)
-                                if channel:
-                                    embed = discord.Embed(title="📈 SKOK SPRZEDAŻY!", color=0xe74c3c)
-                                    embed.add_field(name="Produkt", value=f"[{tytul}](https://allegro.pl/oferta/{oferta_id})", inline=False)
-                                    embed.add_field(name="Wzrost", value=f"🚀 **+{roznica} szt.**", inline=True)
-                                    embed.add_field(name="Łącznie sprzedano", value=f"{aktualna_ilosc} szt.", inline=True)
-                                    await channel.send(embed=embed)
-                                
-                                sledzone_oferty[oferta_id] = aktualna_ilosc
-                                print(f"🔥 Wzrost na ofercie {oferta_id}: +{roznica}")
-                        else:
-                             print(f"⚠️ Nie znaleziono danych dla ID {oferta_id} w publicznym listingu")
-                    
-                    elif resp.status == 404:
-                        do_usuniecia.append(oferta_id)
-
-        for id_us in do_usuniecia:
-            del sledzone_oferty[id_us]
+        # Tylko oferty, którym minął termin, i nie więcej niż budżet na minutę
+        ids = harmonogram_ofert.do_sprawdzenia(TRACKER_BUDZET)
+        if ids:
+            await sprawdz_oferty(ids)
+
+        # Stare próbki zagęszczamy raz na dobę, historię zapisujemy co 10 minut
+        if time.time() - ostatnia_kompaktacja > 86400:
+            usuniete = historia_ofert.kompaktuj()
+            ostatnia_kompaktacja = time.time()
+            print(f"🗜️ Historia trackera: zagęszczono {usuniete} próbek, zostało {len(historia_ofert)}")
+        if ids and time.time() - ostatni_zapis_historii > 600:
+            ostatni_zapis_historii = time.time()
+            await historia_ofert.zapisz()
+            baza.set("tracker_interwaly", harmonogram_ofert.interwaly)
 
     except Exception as e:
+        metryki.inc("loop_errors_total", loop="tracker")
         print(f"Błąd Trackera: {e}")
 
+async def sprawdz_oferty(ids):
+    do_usuniecia = []
+    wzrosty = []
+    sprawdzone = set()
+    semafor = asyncio.Semaphore(TRACKER_WSPOLBIEZNOSC)
+    partie = [ids[i:i + TRACKER_PARTIA] for i in range(0, len(ids), TRACKER_PARTIA)]
+    zadania = [asyncio.create_task(pobierz_partie_ofert(partia, semafor)) for partia in partie]
+
+    try:
+        # Przetwarzamy wyniki w kolejności ukończenia, a nie wysłania
+        for gotowe in asyncio.as_completed(zadania):
+            wyniki = await gotowe
+            for oferta_id, (status_http, znaleziona_oferta) in wyniki.items():
+                sprawdzone.add(oferta_id)
+                if status_http == 404:
+                    do_usuniecia.append(oferta_id)
+                    continue
+                wzrost = None
+                if status_http in (200, 304):
+                    wzrost = przetworz_oferte_trackera(oferta_id, znaleziona_oferta)
+                    if wzrost: wzrosty.append(wzrost)
+                if oferta_id in sledzone_oferty:
+                    harmonogram_ofert.zaplanuj(oferta_id, zmiana=wzrost is not None)
+    finally:
+        # Oferty, których nie udało się sprawdzić (np. wyjątek), wracają do harmonogramu
+        for oferta_id in ids:
+            if oferta_id not in sprawdzone and oferta_id in sledzone_oferty:
+                harmonogram_ofert.zaplanuj(oferta_id, zmiana=False)
+
+    for id_us in do_usuniecia:
+        usun_z_trackera(id_us)
+
+    for wzrost in wzrosty:
+        przyjmij_zdarzenie(OfferSalesIncreased(*wzrost))
+
+# --- LISTA OBSERWOWANYCH OFERT ---
+def dodaj_do_trackera(oferta, rozloz=False):
+    """Zaczyna śledzić ofertę z listingu. `rozloz=True` (import hurtowy) rozrzuca pierwsze sprawdzenia w czasie."""
+    sledzone_oferty[oferta.id] = oferta.popularnosc
+    baza.zapisz_oferte(oferta.id, oferta.popularnosc)
+    historia_ofert.dodaj(oferta.id, oferta.popularnosc, oferta.cena, nazwa=oferta.nazwa)
+    harmonogram_ofert.dodaj(oferta.id, termin=None if rozloz else time.time() + TRACKER_START_INTERWAL)
+
+def usun_z_trackera(oferta_id):
+    """Zwraca True, jeśli oferta była śledzona. Historię sprzedaży zostawiamy (`!historia` dalej działa)."""
+    if sledzone_oferty.pop(oferta_id, None) is None: return False
+    harmonogram_ofert.usun(oferta_id)
+    baza.usun_oferte(oferta_id)
+    return True
+
+async def zweryfikuj_oferty(ids):
+    """
+    Sprawdza w publicznym listingu partie ofert równolegle (te same partie i limit co tracker).
+    Zwraca (znalezione oferty, ID nieistniejących, ID, których nie udało się sprawdzić).
+    """
+    semafor = asyncio.Semaphore(TRACKER_WSPOLBIEZNOSC)
+    partie = [ids[i:i + TRACKER_PARTIA] for i in range(0, len(ids), TRACKER_PARTIA)]
+    wyniki = await asyncio.gather(*(pobierz_partie_ofert(partia, semafor, priorytet=PRIORYTET_KOMENDY, warunkowo=False)
+                                    for partia in partie))
+    znalezione, brak, bledy = [], [], []
+    for wynik in wyniki:
+        for oferta_id, (status_http, oferta) in wynik.items():
+            if oferta is not None: znalezione.append(oferta)
+            elif status_http in (200, 404): brak.append(oferta_id)
+            else: bledy.append(oferta_id)
+    return znalezione, brak, bledy
+
+async def szukaj_ofert(fraza=None, kategoria=None, limit=TRACKER_IMPORT_MAX):
+    """
+    Oferty z publicznego listingu dla frazy i/lub kategorii (regular + promoted, bez duplikatów).
+    Pierwsza strona mówi, ile jest wyników - resztę stron pobieramy równolegle.
+    Zwraca (lista OfertaListingu, status HTTP pierwszej strony).
+    """
+    parametry = ([("phrase", fraza)] if fraza else []) + ([("category.id", kategoria)] if kategoria else [])
+    semafor = asyncio.Semaphore(TRACKER_WSPOLBIEZNOSC)
+
+    async def strona(offset):
+        async with semafor:
+            return await konto_glowne.allegro.get("/offers/listing", priorytet=PRIORYTET_KOMENDY,
+                                                  params=parametry + [("limit", LISTING_STRONA), ("offset", offset)])
+
+    pierwsza = await strona(0)
+    if pierwsza.status != 200:
+        return [], pierwsza.status
+    meta = (pierwsza.data or {}).get("searchMeta") or {}
+    wszystkich = meta.get("availableCount") or meta.get("totalCount") or 0
+    kolejne = await asyncio.gather(*(strona(offset) for offset in range(LISTING_STRONA, min(wszystkich, limit), LISTING_STRONA)))
+
+    oferty = {}
+    for resp in [pierwsza, *kolejne]:
+        if resp.status != 200: continue
+        for oferta in oferty_z_listingu(resp.data):
+            oferty.setdefault(oferta.id, oferta)
+    return list(oferty.values())[:limit], 200
+
+# --- RAPORT SPRZEDAŻY ---
+def zlicz_sprzedaz(konto, order):
+    """
+    Do raportów liczymy tylko opłacone zamówienia (READY_FOR_PROCESSING) - raz, w dniu zakupu,
+    także te nadrobione po przerwie. Anulowanie już doliczonego zamówienia wycofuje je z tego samego dnia.
+    Osobna pamięć (a nie pamięć powiadomień) - zmiana statusu zamówienia, o którym już powiadomiliśmy, też się liczy.
+    """
+    if order.status == "READY_FOR_PROCESSING" and order.id not in konto.zliczone_zamowienia:
+        konto.zliczone_zamowienia.add(order.id, order.updated_at)
+        konto.sprzedaz.dodaj(order)
+    elif order.status == "CANCELLED" and order.id in konto.zliczone_zamowienia \
+            and f"{order.id}:CANCELLED" not in konto.zliczone_zamowienia:
+        konto.zliczone_zamowienia.add(f"{order.id}:CANCELLED", order.updated_at)
+        konto.sprzedaz.dodaj(order, znak=-1)
+
+def embed_raportu(konto, tytul, od, do):
+    start = time.perf_counter()
+    raport = konto.sprzedaz.podsumowanie(od, do)
+    czas_ms = (time.perf_counter() - start) * 1000
+
+    okres = od.strftime("%d.%m.%Y") if od == do else f"{od.strftime('%d.%m')} - {do.strftime('%d.%m.%Y')}"
+    embed = discord.Embed(title=f"🧾 {etykieta(konto)}{tytul} ({okres})", color=0x27ae60)
+    if not raport["zamowienia"]:
+        embed.description = "📭 Brak zamówień w tym okresie."
+        return embed
+    embed.add_field(name="Przychód", value="\n".join(f"**{kwota:.2f} {w}**" for w, kwota in raport["przychod"].items()), inline=True)
+    embed.add_field(name="Zamówienia", value=f"**{raport['zamowienia']}** ({raport['sztuki']} szt.)", inline=True)
+    embed.add_field(name="Średni koszyk", value="\n".join(f"{kwota:.2f} {w}" for w, kwota in raport["sredni_koszyk"].items()), inline=True)
+
+    linie = []
+    for i, (oferta_id, nazwa, sztuki, kwota, waluta) in enumerate(raport["top"], 1):
+        if len(nazwa) > 45: nazwa = nazwa[:45] + "..."
+        link = f"[{nazwa}](https://allegro.pl/oferta/{oferta_id})" if oferta_id.isdigit() else nazwa
+        linie.append(f"{i}. {link} - **{sztuki}** szt." + (f" ({kwota:.2f} {waluta})" if kwota else ""))
+    embed.add_field(name="🏆 Najlepiej sprzedające się", value="\n".join(linie) or "-", inline=False)
+    embed.set_footer(text=f"Z agregatów dziennych | {czas_ms:.1f} ms")
+    return embed
+
+@tasks.loop(time=datetime.time(hour=RAPORT_GODZINA, tzinfo=sprzedaz.STREFA))
+async def raport_sprzedazy():
+    dzis = sprzedaz.dzisiaj()
+    wczoraj = dzis - datetime.timedelta(days=1)
+    for konto in konta:
+        # Znacznik wysłanego raportu chroni przed dublem po ponownym połączeniu z Discordem
+        if konto.get("raport_wyslany") == dzis.isoformat(): continue
+        if "daily" in RAPORT_RODZAJE:
+            powiadomienia.send(konto.kanal_zamowienia, embed=embed_raportu(konto, "Raport dzienny", wczoraj, wczoraj))
+        if "weekly" in RAPORT_RODZAJE and dzis.weekday() == 0:
+            powiadomienia.send(konto.kanal_zamowienia, embed=embed_raportu(konto, "Raport tygodniowy", dzis - datetime.timedelta(days=7), wczoraj))
+        konto.set("raport_wyslany", dzis.isoformat())
+
+# --- SUBSKRYBENCI MAGISTRALI ---
+magistrala.subscribe(OrderCreated, powiadom_o_zamowieniu)
+magistrala.subscribe(BuyerMessage, powiadom_o_wiadomosci)
+magistrala.subscribe(BuyerMessage, odpowiedz_automatycznie, workers=RESPONDER_WSPOLBIEZNOSC)
+# Wzrosty z jednego przebiegu trackera przychodzą razem, więc zbiorczy embed dalej działa
+magistrala.subscribe(OfferSalesIncreased, powiadom_o_wzrostach, partiami=True)
+
 # --- AI HELPERS ---
-async def generuj_opis_gpsr(produkt):
+async def _zapytaj_claude_gpsr(produkt, na_fragment=None):
     prompt = (
         f"Jesteś specjalistą ds. bezpieczeństwa produktów (Compliance Officer). "
         f"Napisz profesjonalną instrukcję bezpieczeństwa GPSR dla produktu: {produkt}. "
@@ -337,19 +892,67 @@ async def generuj_opis_gpsr(produkt):
         f"Styl: Formalny, nakazowy, krótki i konkretny. Używaj myślników jako punktorów."
     )
     
-    try:
-        if not CLAUDE_KEY: return "❌ Brak klucza Claude."
-        msg = await claude_client.messages.create(
+    # Strumieniujemy, żeby użytkownik widział tekst od pierwszej sekundy
+    fragmenty = []
+    with metryki.mierz("ai_request", provider="claude"):
+        async with claude_client.messages.stream(
             model="claude-3-haiku-20240307", 
             max_tokens=3000, 
             messages=[{"role": "user", "content": prompt}]
-        )
-        return msg.content[0].text
+        ) as stream:
+            async for fragment in stream.text_stream:
+                fragmenty.append(fragment)
+                if na_fragment: na_fragment("".join(fragmenty))
+    return "".join(fragmenty)
+
+async def generuj_opis_gpsr(produkt, na_fragment=None):
+    try:
+        if not CLAUDE_KEY: return "❌ Brak klucza Claude."
+        opis, _ = await cache_odpowiedzi.get_or_compute(("gpsr", produkt), lambda: _zapytaj_claude_gpsr(produkt, na_fragment))
+        return opis
     except Exception as e: return f"Błąd: {e}"
 
+async def generuj_raport_trendow(okres, temat_prompt, na_fragment=None):
+    teraz = datetime.datetime.now().strftime("%d.%m.%Y")
+    prompt = (
+        f"Jesteś ekspertem e-commerce w Polsce. Data: {teraz}. Okres: {okres}. "
+        f"Temat: {temat_prompt}. "
+        f"Twoim zadaniem jest znalezienie 5 FIZYCZNYCH PRODUKTÓW do dropshippingu/sprzedaży (physical goods ONLY). "
+        f"BARDZO WAŻNE: Ignoruj oprogramowanie, usługi SaaS, bramki płatności i aplikacje. Interesują mnie tylko przedmioty, które można zapakować w paczkę. "
+        f"Format odpowiedzi (Markdown): "
+        f"1. **Nazwa Produktu**\n2. **Dlaczego teraz?**\n3. **Cena sprzedaży (PLN)**\n4. **Potencjał**\n"
+        f"Podaj same konkrety."
+    )
+    fragmenty = []
+    with metryki.mierz("ai_request", provider="perplexity"):
+        stream = await perplexity_client.chat.completions.create(
+            model="sonar-pro",
+            messages=[{"role": "user", "content": prompt}],
+            stream=True
+        )
+        async for chunk in stream:
+            if not chunk.choices: continue
+            fragment = chunk.choices[0].delta.content
+            if fragment:
+                fragmenty.append(fragment)
+                if na_fragment: na_fragment("".join(fragmenty))
+    return "".join(fragmenty)
+
 # --- EVENTY ---
+@bot.event
+async def on_disconnect():
+    global rozlaczony_od
+    if rozlaczony_od is None: rozlaczony_od = time.time()
+
+@bot.event
+async def on_resumed():
+    global rozlaczony_od
+    rozlaczony_od = None
+
 @bot.event
 async def on_ready():
+    global rozlaczony_od
+    rozlaczony_od = None
     print(f"✅ ZALOGOWANO JAKO: {bot.user}")
     await bot.change_presence(activity=discord.Game(name="!pomoc | E-commerce"))
     
@@ -358,112 +961,273 @@ async def on_ready():
         allegro_monitor.start()
     if not allegro_responder.is_running():
         allegro_responder.start()
-    if not allegro_tracker.is_running():
+    if konto_glowne is not None and not allegro_tracker.is_running():
         allegro_tracker.start()
+    if RAPORT_RODZAJE and not raport_sprzedazy.is_running():
+        raport_sprzedazy.start()
+
+# --- ZDROWIE (/healthz, /readyz) ---
+def petle_bota():
+    petle = [("monitor", allegro_monitor, MONITOR_INTERWAL), ("responder", allegro_responder, 120)]
+    if konto_glowne is not None: petle.append(("tracker", allegro_tracker, 60))
+    return petle
+
+def kontrola_zycia():
+    teraz = time.time()
+    if not bot.is_ready() and teraz - start_bota < ZDROWIE_START:
+        return {"startup": (True, f"start {teraz - start_bota:.0f}s temu")}
+
+    wyniki = {}
+    if bot.is_closed():
+        wyniki["gateway"] = (False, "klient zamknięty")
+    elif rozlaczony_od is not None:
+        wyniki["gateway"] = (teraz - rozlaczony_od < ZDROWIE_GATEWAY, f"rozłączony od {teraz - rozlaczony_od:.0f}s")
+    else:
+        wyniki["gateway"] = (bot.is_ready(), f"opóźnienie {bot.latency * 1000:.0f} ms" if bot.is_ready() else "brak on_ready")
+
+    for nazwa, petla, interwal in petle_bota():
+        wiek = metryki.ostatnia_iteracja(nazwa)
+        # Iteracja, która nie ruszyła od 3 interwałów, oznacza zawieszoną pętlę
+        ok = petla.is_running() and (wiek is None or wiek < interwal * 3 + 60)
+        wyniki[f"loop_{nazwa}"] = (ok, "zatrzymana" if not petla.is_running() else f"ostatni start {wiek or 0:.0f}s temu")
+
+    for konto in konta:
+        nazwa = "allegro_poll" if konto.glowne else f"allegro_poll_{konto.nazwa}"
+        if konto.allegro.token:
+            wiek = teraz - (konto.ostatni_udany_monitor or start_bota)
+            wyniki[nazwa] = (wiek < ZDROWIE_ALLEGRO, f"ostatnie udane odpytanie {wiek:.0f}s temu")
+        else:
+            wyniki[nazwa] = (True, "brak tokena - monitor nieaktywny")
+    return wyniki
+
+def kontrola_gotowosci():
+    return {
+        "gateway": (bot.is_ready() and not bot.is_closed(), str(bot.user) if bot.user else "łączenie"),
+        "loops": (all(p.is_running() for _, p, _ in petle_bota()), "pętle uruchomione"),
+        "allegro_token": (True, ", ".join(f"{k.nazwa}: {'jest' if k.allegro.token else 'brak'}" for k in konta) or "brak kont w tym shardzie"),
+    }
+
+# Każdy shard ma własny port (PORT + SHARD_INDEX), żeby kilka procesów na jednej maszynie nie walczyło o bind
+serwer_zdrowia = HealthServer(kontrola_zycia, kontrola_gotowosci, port=PORT + SHARD_INDEX)
+serwer_zdrowia.app.router.add_post("/events", obsluga_ingestii(przyjmij_zdarzenie, INGEST_TOKEN))
 
 # --- KOMENDY ---
+# Tracker (lista ofert, historia, listing przez konto główne) żyje tylko w shardzie 0 - niezależnie od kanału
+KOMENDY_TRACKERA = {"tracker", "tracker_import", "tracker_szukaj", "lista_tracker", "tracker_usun", "tempo", "historia"}
+
+@bot.check
+async def komenda_tego_shardu(ctx):
+    # Przy kilku procesach każdy słyszy wszystkie komendy - odpowiada tylko właściciel konta,
+    # a komendy spoza kanałów sklepów (AI, marża) i komendy trackera obsługuje shard 0
+    if ctx.command is not None and ctx.command.name in KOMENDY_TRACKERA: return SHARD_INDEX == 0
+    wlasciciel = konto_kanalu.get(ctx.channel.id)
+    if wlasciciel is None: return SHARD_INDEX == 0
+    return wlasciciel in konta_po_nazwie
+
 @bot.command()
 async def pomoc(ctx):
     await ctx.message.delete()
     embed = discord.Embed(title="🛠️ Menu Bota", color=0xff9900)
-    embed.add_field(name="🔑 Allegro", value="`!allegro_login`\n`!ostatnie`\n`!status`", inline=False)
+    embed.add_field(name="🔑 Allegro", value="`!allegro_login`\n`!allegro_device`\n`!ostatnie`\n`!raport [dzis | wczoraj | tydzien | dni]`\n`!status`\n`!konta`", inline=False)
     embed.add_field(name="🤖 Auto-Responder", value="`!auto_start`\n`!tryb_live`\n`!tryb_test`", inline=False)
-    embed.add_field(name="🧠 Narzędzia", value="`!marza [zakup]`\n`!marza [zakup] [sprzedaz] [prowizja]`\n`!trend`\n`!gpsr`", inline=False)
-    embed.add_field(name="📈 Tracker", value="`!tracker [link]`\n`!lista_tracker`", inline=False)
+    embed.add_field(name="🧠 Narzędzia", value="`!marza [zakup]`\n`!marza [zakup] [sprzedaz] [prowizja]`\n`!marza` + plik CSV (hurtowo)\n`!trend`\n`!gpsr`\n`!gpsr_batch [plik CSV | moje | wznow]`", inline=False)
+    embed.add_field(name="📈 Tracker", value="`!tracker [link]`\n`!tracker_import [linki | plik]`\n`!tracker_szukaj [fraza] [kategoria=ID] [limit=N]`\n`!lista_tracker [strona]`\n`!tracker_usun [linki | wszystko]`\n`!tempo [godziny]`\n`!historia [link]`", inline=False)
+    if WIELE_KONT:
+        embed.set_footer(text="Komendy Allegro i Auto-Respondera działają na koncie, do którego należy kanał.")
     await ctx.send(embed=embed)
 
+def opis_dedup(nazwa, pamiec):
+    st = pamiec.stats()
+    return (f"{nazwa}: {st['size']}/{st['max_size']} | trafienia {st['hits']} / chybienia {st['misses']} | "
+            f"usunięte {st['evictions']} / wygasłe {st['expired']}")
+
+def opis_kolejki(konto):
+    st = konto.allegro.scheduler.stats()
+    kolejka = ", ".join(f"P{p}: {n}" for p, n in sorted(st["queue"].items())) or "pusta"
+    pw = powiadomienia.stats()
+    ca = cache_odpowiedzi.stats()
+    hr = harmonogram_ofert.stats()
+    mg = magistrala.stats()
+    subskrybenci = ", ".join(f"{n}: {v['handled']}" + (f" (+{v['queued']} czeka)" if v["queued"] else "") + (f" ❌{v['errors']}" if v["errors"] else "")
+                             for n, v in mg["subscribers"].items())
+    return (f"Kolejka API: {kolejka} | wysłane {st['dispatched']} | śr. czekanie {st['avg_wait']:.2f}s "
+            f"(max {st['max_wait']:.2f}s) | 429: {st['throttled']}\n"
+            f"Zdarzenia: {mg['published']} opublikowanych | {subskrybenci}\n"
+            f"Powiadomienia: w kolejce {pw['queued']} | przyjęte {pw['accepted']} → wiadomości {pw['sent']} | błędy {pw['errors']}\n"
+            f"Cache AI: {ca['size']} wpisów | trafienia {ca['hits']} (+{ca['shared']} współdzielone) / chybienia {ca['misses']}\n"
+            f"Tracker: {hr['offers']} ofert | śr. interwał {hr['avg_interval'] / 60:.0f} min | "
+            f"~{hr['per_hour']:.0f} sprawdzeń/h | zaległe {hr['overdue']}")
+
+def opis_metryk():
+    linie = []
+    api = metryki.suma_histogramow("allegro_request_seconds")
+    if api.ile:
+        statusy = {}
+        for etykiety, n in metryki.liczniki("allegro_responses_total").items():
+            kod = dict(etykiety)["status"]
+            if not kod.startswith("2"): statusy[kod] = statusy.get(kod, 0) + n
+        bledy_sieci = sum(metryki.liczniki("allegro_request_errors_total").values())
+        bledy = ", ".join(f"{k}×{v}" for k, v in sorted(statusy.items())) or "brak"
+        bez_zmian = sum(metryki.liczniki("allegro_unchanged_total").values())
+        linie.append(f"Allegro API: {api.ile} zapytań | śr. {api.suma / api.ile * 1000:.0f} ms | "
+                     f"p95 {api.kwantyl(0.95) * 1000:.0f} ms | bez zmian {bez_zmian} | błędy HTTP: {bledy} | sieć: {bledy_sieci}")
+    for petla in metryki.etykiety("loop_iteration_seconds", "loop"):
+        it = metryki.suma_histogramow("loop_iteration_seconds", loop=petla)
+        lag = metryki.suma_histogramow("loop_lag_seconds", loop=petla)
+        bledy = metryki.liczniki("loop_errors_total").get((("loop", petla),), 0)
+        linie.append(f"Pętla {petla}: {it.ile} przebiegów | p95 {it.kwantyl(0.95):.2f}s | "
+                     f"opóźnienie p95 {lag.kwantyl(0.95):.1f}s | błędy {bledy}")
+    for dostawca in metryki.etykiety("ai_request_seconds", "provider"):
+        ai = metryki.suma_histogramow("ai_request_seconds", provider=dostawca)
+        linie.append(f"AI {dostawca}: {ai.ile} zapytań | śr. {ai.suma / ai.ile:.1f}s | p95 {ai.kwantyl(0.95):.1f}s")
+    for konto in konta:
+        if konto.ostatni_udany_monitor:
+            linie.append(f"Ostatni udany przebieg monitora{' (' + konto.nazwa + ')' if WIELE_KONT else ''}: "
+                         f"{time.time() - konto.ostatni_udany_monitor:.0f}s temu")
+    return "\n".join(linie)
+
+def opis_tokena(konto):
+    tokeny = konto.allegro.tokens
+    token_status = "✅ POŁĄCZONY" if tokeny.access_token else "❌ ROZŁĄCZONY"
+    if tokeny.expires_at:
+        wazny_do = datetime.datetime.utcfromtimestamp(tokeny.expires_at) + datetime.timedelta(hours=1)
+        token_status += f" (ważny do {wazny_do.strftime('%d.%m %H:%M')}, auto-odświeżanie: {'✅' if tokeny.refresh_token else '❌'})"
+    return token_status
+
 @bot.command()
 async def status(ctx):
-    token_status = "✅ POŁĄCZONY" if allegro_token else "❌ ROZŁĄCZONY"
-    ilosc_w_pamieci = len(processed_order_ids)
-    await ctx.send(f"🤖 **Status Bota:**\nAllegro Token: {token_status}\nZamówień w pamięci: {ilosc_w_pamieci}")
+    konto = konto_dla(ctx)
+    ilosc_w_pamieci = len(konto.processed_order_ids)
+    metryki_txt = opis_metryk()
+    tekst = (
+        f"🤖 **Status Bota{' - konto ' + konto.nazwa if WIELE_KONT else ''}:**\n"
+        f"Allegro Token: {opis_tokena(konto)}\nZamówień w pamięci: {ilosc_w_pamieci}\n"
+        f"{opis_dedup('Zamówienia', konto.processed_order_ids)}\n{opis_dedup('Wiadomości', konto.processed_msg_ids)}\n"
+        f"{opis_kolejki(konto)}"
+        + (f"\n{metryki_txt}" if metryki_txt else "")
+        + (f"\nResponder: {konto.ostatni_cykl_respondera[0]} wątków w {konto.ostatni_cykl_respondera[1]:.2f}s" if konto.ostatni_cykl_respondera else "")
+    )
+    for czesc in podziel_tekst(tekst, 2000):
+        await ctx.send(czesc)
+
+@bot.command(name="konta", aliases=["konto"])
+async def lista_kont(ctx):
+    linie = []
+    for konto in konta:
+        responder = ("✅ " + ("TEST" if konto.tryb_testowy else "LIVE")) if konto.responder_active else "❌"
+        monitor = f"{time.time() - konto.ostatni_udany_monitor:.0f}s temu" if konto.ostatni_udany_monitor else "—"
+        linie.append(f"**{konto.nazwa}**{' (główne)' if konto.glowne else ''}: token {'✅' if konto.allegro.token else '❌'} | "
+                     f"responder {responder} | monitor {monitor} | kanały <#{konto.kanal_zamowienia}> <#{konto.kanal_wiadomosci}>")
+    embed = discord.Embed(title=f"🏪 Konta Allegro ({len(konta)})", description="\n".join(linie) or "Brak kont w tym procesie.", color=0xff9900)
+    if SHARD_COUNT > 1:
+        embed.set_footer(text=f"Shard {SHARD_INDEX + 1}/{SHARD_COUNT} - konta z innych shardów obsługują ich procesy")
+    await ctx.send(embed=embed)
 
 @bot.command()
 async def auto_start(ctx):
     await ctx.message.delete()
-    global responder_active
-    responder_active = True
-    status = "TESTOWY (Bezpieczny)" if tryb_testowy else "LIVE (Wysyła wiadomości!)"
-    await ctx.send(f"✅ Auto-Responder AKTYWOWANY. Tryb: **{status}**.")
+    konto = konto_dla(ctx)
+    konto.responder_active = True
+    konto.set("responder_active", True)
+    ponow_wszystko(konto)
+    status = "TESTOWY (Bezpieczny)" if konto.tryb_testowy else "LIVE (Wysyła wiadomości!)"
+    await ctx.send(f"✅ {etykieta(konto)}Auto-Responder AKTYWOWANY. Tryb: **{status}**.")
 
 @bot.command()
 async def auto_stop(ctx):
     await ctx.message.delete()
-    global responder_active
-    responder_active = False
-    await ctx.send("🛑 Auto-Responder ZATRZYMANY.")
+    konto = konto_dla(ctx)
+    konto.responder_active = False
+    konto.set("responder_active", False)
+    await ctx.send(f"🛑 {etykieta(konto)}Auto-Responder ZATRZYMANY.")
 
 @bot.command()
 async def tryb_live(ctx):
     await ctx.message.delete()
-    global tryb_testowy
-    tryb_testowy = False
-    await ctx.send("🔥 **UWAGA! Tryb LIVE włączony.** Bot będzie odpisywał klientom!")
+    konto = konto_dla(ctx)
+    konto.tryb_testowy = False
+    konto.set("tryb_testowy", False)
+    ponow_wszystko(konto)
+    await ctx.send(f"🔥 {etykieta(konto)}**UWAGA! Tryb LIVE włączony.** Bot będzie odpisywał klientom!")
 
 @bot.command()
 async def tryb_test(ctx):
     await ctx.message.delete()
-    global tryb_testowy
-    tryb_testowy = True
-    await ctx.send("🛡️ Tryb TESTOWY włączony. Tylko powiadomienia na Discord.")
+    konto = konto_dla(ctx)
+    konto.tryb_testowy = True
+    konto.set("tryb_testowy", True)
+    await ctx.send(f"🛡️ {etykieta(konto)}Tryb TESTOWY włączony. Tylko powiadomienia na Discord.")
 
 @bot.command()
 async def allegro_login(ctx):
     await ctx.message.delete()
-    if not ALLEGRO_CLIENT_ID: return await ctx.send("❌ Brak Client ID!")
-    url = f"https://allegro.pl/auth/oauth/authorize?response_type=code&client_id={ALLEGRO_CLIENT_ID}&redirect_uri={ALLEGRO_REDIRECT_URI}"
-    embed = discord.Embed(title="🔐 Logowanie", description=f"[KLIKNIJ]({url})\nSkopiuj kod i wpisz: `!allegro_kod TWÓJ_KOD`", color=0xff6600)
+    konto = konto_dla(ctx)
+    tokeny = konto.allegro.tokens
+    if not tokeny.client_id: return await ctx.send("❌ Brak Client ID!")
+    url = f"https://allegro.pl/auth/oauth/authorize?response_type=code&client_id={tokeny.client_id}&redirect_uri={tokeny.redirect_uri}"
+    embed = discord.Embed(title=f"🔐 {etykieta(konto)}Logowanie", description=f"[KLIKNIJ]({url})\nSkopiuj kod i wpisz: `!allegro_kod TWÓJ_KOD`", color=0xff6600)
     await ctx.send(embed=embed)
 
 @bot.command()
 async def allegro_kod(ctx, code: str = None):
     await ctx.message.delete()
-    global allegro_token
     if not code: return await ctx.send("❌ Podaj kod!")
     msg = await ctx.send("🔄 Łączę...")
-    data = await get_allegro_token(code)
+    data = await get_allegro_token(konto_dla(ctx), code)
     if data and "access_token" in data:
-        allegro_token = data["access_token"]
         await msg.edit(content="✅ **Sukces!** Połączono z Allegro.")
     else:
         await msg.edit(content="❌ Błąd logowania.")
 
+@bot.command()
+async def allegro_device(ctx):
+    await ctx.message.delete()
+    tokeny = konto_dla(ctx).allegro.tokens
+    if not tokeny.client_id: return await ctx.send("❌ Brak Client ID!")
+    data = await tokeny.start_device_flow()
+    if not data:
+        return await ctx.send("❌ Nie udało się rozpocząć logowania.")
+    url = data.get("verification_uri_complete") or data.get("verification_uri")
+    embed = discord.Embed(title="🔐 Logowanie (bez kopiowania kodu)", description=f"[KLIKNIJ I ZATWIERDŹ]({url})\nKod: `{data.get('user_code')}`", color=0xff6600)
+    msg = await ctx.send(embed=embed)
+    sukces = await tokeny.poll_device_flow(data["device_code"], int(data.get("interval", 5)), int(data.get("expires_in", 3600)))
+    if sukces:
+        await msg.edit(content="✅ **Sukces!** Połączono z Allegro. Token będzie odświeżany automatycznie.", embed=None)
+    else:
+        await msg.edit(content="❌ Logowanie wygasło lub zostało odrzucone.", embed=None)
+
 @bot.command()
 async def ostatnie(ctx):
     await ctx.message.delete()
-    if not allegro_token:
+    konto = konto_dla(ctx)
+    if not konto.allegro.token:
         return await ctx.send("❌ Najpierw zaloguj się: `!allegro_login`")
 
     status_msg = await ctx.send("⏳ Pobieram listę ostatnich zamówień...")
     try:
-        data = await fetch_orders()
+        data = await fetch_orders(konto)
         if not data or "checkoutForms" not in data:
             await status_msg.edit(content="❌ Błąd pobierania danych z Allegro.")
             return
 
-        orders = data["checkoutForms"]
+        orders = dekoduj(Zamowienie, data["checkoutForms"])
         if not orders:
             await status_msg.edit(content="📭 Brak zamówień na liście.")
             return
 
-        orders.sort(key=lambda x: x["updatedAt"], reverse=True)
-        embed = discord.Embed(title="📦 Ostatnie 5 zamówień", color=0x3498db)
+        orders.sort(key=lambda x: x.updated_at, reverse=True)
+        embed = discord.Embed(title=f"📦 {etykieta(konto)}Ostatnie 5 zamówień", color=0x3498db)
 
         for i, order in enumerate(orders[:5]):
-            kupujacy = order["buyer"]["login"]
-            kwota = order["summary"]["totalToPay"]["amount"]
-            waluta = order["summary"]["totalToPay"]["currency"]
-            status = order["status"]
-            
             produkty_lista = ""
-            for item in order["lineItems"]:
-                produkty_lista += f"• {item['quantity']}x {item['offer']['name']}\n"
+            for item in order.pozycje:
+                produkty_lista += f"• {item.ilosc}x {item.nazwa}\n"
             
             if len(produkty_lista) > 1000: produkty_lista = produkty_lista[:1000] + "..."
 
             embed.add_field(
-                name=f"{i+1}. {kupujacy} ({kwota} {waluta}) [{status}]",
-                value=produkty_lista,
+                name=f"{i+1}. {order.kupujacy} ({order.kwota:.2f} {order.waluta}) [{order.status}]",
+                value=produkty_lista or "-",
                 inline=False
             )
         embed.set_footer(text=f"Wygenerowano: {polski_czas()}")
@@ -472,55 +1236,76 @@ async def ostatnie(ctx):
     except Exception as e:
         await status_msg.edit(content=f"❌ Wystąpił błąd: {e}")
 
+@bot.command()
+async def raport(ctx, okres: str = "tydzien"):
+    konto = konto_dla(ctx)
+    dzis = sprzedaz.dzisiaj()
+    okres = okres.lower()
+    if okres in ("dzis", "dziś", "dzien", "dzień"):
+        tytul, od, do = "Sprzedaż dzisiaj", dzis, dzis
+    elif okres == "wczoraj":
+        tytul, od = "Sprzedaż wczoraj", dzis - datetime.timedelta(days=1)
+        do = od
+    else:
+        # "tydzien", "miesiac" albo liczba dni - zawsze łącznie z dzisiejszym
+        dni = {"tydzien": 7, "tydzień": 7, "miesiac": 30, "miesiąc": 30}.get(okres) or int(parsuj_liczbe(okres))
+        if dni < 1:
+            return await ctx.send("❌ Podaj okres: `!raport dzis`, `!raport wczoraj`, `!raport tydzien` albo liczbę dni, np. `!raport 14`")
+        dni = min(dni, konto.sprzedaz.retencja_dni)
+        tytul, od, do = f"Sprzedaż - ostatnie {dni} dni", dzis - datetime.timedelta(days=dni - 1), dzis
+    await ctx.send(embed=embed_raportu(konto, tytul, od, do))
+
 @bot.command()
 async def marza(ctx, *args):
+    # Załącznik czytamy przed usunięciem wiadomości - potem link do pliku przestaje działać
+    zalacznik = await ctx.message.attachments[0].read() if ctx.message.attachments else None
     await ctx.message.delete()
+    if zalacznik is not None:
+        return await marza_hurtowa(ctx, zalacznik)
     if len(args) == 0:
-        return await ctx.send("❌ Użyj: `!marza [zakup] [sprzedaz] [prowizja%]`")
+        return await ctx.send("❌ Użyj: `!marza [zakup] [sprzedaz] [prowizja%]` albo dołącz plik CSV")
 
     try:
         zakup_brutto = parsuj_liczbe(args[0])
-        zakup_netto = zakup_brutto / 1.23
 
         if len(args) == 1:
             cele_zysku = [10, 20, 30, 50, 100]
+            ceny = kalkulator.cena_dla_zysku(zakup_brutto, cele_zysku)
             embed = discord.Embed(title=f"🛒 Zakup: {zakup_brutto:.2f} zł brutto", color=0x3498db)
             embed.description = "**Sugerowane ceny sprzedaży** (bez prowizji Allegro!):"
-            
+
             tekst_sugestii = ""
-            for cel in cele_zysku:
-                sprzedaz_netto_wymagana = (cel + zakup_netto) / 0.97
-                sprzedaz_brutto_wymagana = sprzedaz_netto_wymagana * 1.23
-                tekst_sugestii += f"Zysk **{cel} zł** → Sprzedaj za: **{sprzedaz_brutto_wymagana:.2f} zł**\n"
-            
+            for cel, cena in zip(cele_zysku, ceny):
+                tekst_sugestii += f"Zysk **{cel} zł** → Sprzedaj za: **{cena:.2f} zł**\n"
+
             embed.add_field(name="Kalkulacja (VAT 23% + Ryczałt 3%)", value=tekst_sugestii, inline=False)
             await ctx.send(embed=embed)
 
         elif len(args) >= 2:
             sprzedaz_brutto = parsuj_liczbe(args[1])
             prowizja_procent = parsuj_liczbe(args[2]) if len(args) > 2 else 0.0
-            
-            sprzedaz_netto = sprzedaz_brutto / 1.23
-            prowizja_kwota = sprzedaz_brutto * (prowizja_procent / 100)
-            ryczalt_kwota = sprzedaz_netto * 0.03 
-            
-            zysk = sprzedaz_netto - zakup_netto - ryczalt_kwota - prowizja_kwota
-            
+
+            wynik = kalkulator.oblicz(zakup_brutto, sprzedaz_brutto, prowizja_procent)
+            zysk = float(wynik["zysk"])
+
             kolor = 0x2ecc71 if zysk > 0 else 0xe74c3c
             emoji = "✅" if zysk > 0 else "⚠️"
 
             embed = discord.Embed(title=f"{emoji} Wynik Transakcji", color=kolor)
             embed.add_field(name="1. Ceny", value=f"Zakup: **{zakup_brutto:.2f} zł**\nSprzedaż: **{sprzedaz_brutto:.2f} zł**", inline=False)
-            
+
             koszty_txt = (
-                f"• Towar netto: {zakup_netto:.2f} zł\n"
-                f"• Prowizja Allegro ({prowizja_procent}%): **-{prowizja_kwota:.2f} zł**\n"
-                f"• Ryczałt (3%): -{ryczalt_kwota:.2f} zł\n"
+                f"• Towar netto: {float(wynik['zakup_netto']):.2f} zł\n"
+                f"• Prowizja Allegro ({prowizja_procent}%): **-{float(wynik['prowizja_kwota']):.2f} zł**\n"
+                f"• Ryczałt (3%): -{float(wynik['ryczalt_kwota']):.2f} zł\n"
                 f"• VAT (23%): wliczony w netto"
             )
             embed.add_field(name="2. Koszty i Podatki", value=koszty_txt, inline=False)
             embed.add_field(name="3. ZYSK NA RĘKĘ", value=f"💰 **{zysk:.2f} zł**", inline=False)
-            
+            prog = float(wynik["prog_rentownosci"])
+            if prog == prog:  # NaN = prowizja i podatki zjadają całą cenę
+                embed.add_field(name="4. Próg rentowności", value=f"Sprzedaż poniżej **{prog:.2f} zł** = strata", inline=False)
+
             if prowizja_procent == 0:
                 embed.set_footer(text="⚠️ Uwaga: Obliczono bez prowizji Allegro! Dodaj trzecią liczbę.")
             else:
@@ -530,6 +1315,31 @@ async def marza(ctx, *args):
     except Exception as e:
         await ctx.send(f"❌ Błąd obliczeń: {str(e)}")
 
+async def marza_hurtowa(ctx, zawartosc):
+    try:
+        sku, kolumny = kalkulator.wczytaj_csv(zawartosc.decode("utf-8-sig", errors="replace"))
+    except ValueError as e:
+        return await ctx.send(f"❌ Zły plik CSV: {e}\nWymagane kolumny: `sku;zakup;sprzedaz` (opcjonalnie `prowizja;vat;ryczalt`).")
+
+    start = time.perf_counter()
+    wynik = kalkulator.oblicz_tabele(kolumny)
+    czas_ms = (time.perf_counter() - start) * 1000
+    podsumowanie = kalkulator.podsumowanie(wynik)
+
+    plik = discord.File(
+        io.BytesIO(kalkulator.zapisz_csv(sku, kolumny, wynik).encode("utf-8-sig")),
+        filename=f"marza_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}.csv",
+    )
+    kolor = 0x2ecc71 if podsumowanie["stratne"] == 0 else 0xe67e22
+    embed = discord.Embed(title="📊 Kalkulacja hurtowa marży", color=kolor)
+    embed.add_field(name="Pozycje", value=f"{podsumowanie['pozycje']} (błędne: {podsumowanie['bledne']})", inline=True)
+    embed.add_field(name="Zysk łącznie", value=f"{podsumowanie['zysk_suma']:.2f} zł", inline=True)
+    embed.add_field(name="Średnia marża", value=f"{podsumowanie['marza_srednia']:.1f}%", inline=True)
+    embed.add_field(name="Na stracie", value=str(podsumowanie["stratne"]), inline=True)
+    cele = ", ".join(f"{c}%" for c in kalkulator.CELE_MARZY)
+    embed.set_footer(text=f"W pliku: próg rentowności i ceny dla marży {cele} • {czas_ms:.1f} ms")
+    await ctx.send(embed=embed, file=plik)
+
 @bot.command()
 async def trend(ctx, *, okres: str = None):
     if not okres:
@@ -560,33 +1370,19 @@ async def trend(ctx, *, okres: str = None):
 
     status_msg = await ctx.send(f"⏳ **Szukam produktów na {okres}...**\nKategoria: *{kategoria_final}*")
 
-    teraz = datetime.datetime.now().strftime("%d.%m.%Y")
-    prompt = (
-        f"Jesteś ekspertem e-commerce w Polsce. Data: {teraz}. Okres: {okres}. "
-        f"Temat: {temat_prompt}. "
-        f"Twoim zadaniem jest znalezienie 5 FIZYCZNYCH PRODUKTÓW do dropshippingu/sprzedaży (physical goods ONLY). "
-        f"BARDZO WAŻNE: Ignoruj oprogramowanie, usługi SaaS, bramki płatności i aplikacje. Interesują mnie tylko przedmioty, które można zapakować w paczkę. "
-        f"Format odpowiedzi (Markdown): "
-        f"1. **Nazwa Produktu**\n2. **Dlaczego teraz?**\n3. **Cena sprzedaży (PLN)**\n4. **Potencjał**\n"
-        f"Podaj same konkrety."
-    )
-
     try:
         if not PERPLEXITY_KEY:
             await status_msg.edit(content="❌ Brak klucza API Perplexity.")
             return
 
-        response = await perplexity_client.chat.completions.create(
-            model="sonar-pro",
-            messages=[{"role": "user", "content": prompt}]
+        podglad = StreamingEmbed(status_msg, f"📈 Raport Trendów: {okres}", 0x9b59b6)
+        surowy, z_cache = await cache_odpowiedzi.get_or_compute(
+            ("trend", okres, temat_prompt),
+            lambda: generuj_raport_trendow(okres, temat_prompt, lambda t: podglad.aktualizuj(clean_text(t)))
         )
         
-        raport = clean_text(response.choices[0].message.content)
-        if len(raport) > 4000: raport = raport[:4000] + "..."
-
-        embed = discord.Embed(title=f"📈 Raport Trendów: {okres}", description=raport, color=0x9b59b6)
-        embed.set_footer(text=f"Kategoria: {kategoria_final}")
-        await status_msg.edit(content=None, embed=embed)
+        raport = clean_text(surowy)
+        await podglad.zakoncz(raport, stopka=f"Kategoria: {kategoria_final}" + (" | z pamięci podręcznej" if z_cache else ""))
 
     except Exception as e:
         await status_msg.edit(content=f"❌ Błąd API: {str(e)}")
@@ -598,19 +1394,154 @@ async def gpsr(ctx, *, produkt: str = None):
     
     msg = await ctx.send(f"✍️ **Generuję profesjonalny GPSR dla:** `{produkt}`...\nTo może chwilę potrwać.")
     
-    opis = await generuj_opis_gpsr(produkt)
+    podglad = StreamingEmbed(msg, "📄 Dokumentacja GPSR", 0x2ecc71, formatuj=lambda t: f"```yaml\n{t}\n```")
+    opis = await generuj_opis_gpsr(produkt, na_fragment=podglad.aktualizuj)
     opis = opis.strip()
 
-    embed = discord.Embed(title="📄 Dokumentacja GPSR", color=0x2ecc71)
-    tekst_do_kopiowania = f"```yaml\n{opis}\n```"
-    embed.description = tekst_do_kopiowania
-    embed.set_footer(text="Skopiuj treść przyciskiem lub zaznaczając tekst.")
+    await podglad.zakoncz(opis, stopka="Skopiuj treść przyciskiem lub zaznaczając tekst.")
+
+def spakuj_csv(naglowek, wiersze, nazwa, limit):
+    """
+    CSV (średnik, UTF-8 z BOM jak reszta eksportów) spakowany do ZIP-a. Gdy archiwum nie mieści się
+    w limicie załącznika, dzielimy wiersze na coraz więcej części - każda to osobny ZIP.
+    Zwraca listę (nazwa pliku, bajty).
+    """
+    czesci = 1
+    while True:
+        rozmiar = max(1, -(-len(wiersze) // czesci))
+        pliki = []
+        for n, od in enumerate(range(0, max(len(wiersze), 1), rozmiar), 1):
+            bufor = io.StringIO()
+            pisarz = csv.writer(bufor, delimiter=";")
+            pisarz.writerow(naglowek)
+            pisarz.writerows(wiersze[od:od + rozmiar])
+            nazwa_czesci = nazwa if czesci == 1 else f"{nazwa}_cz{n}"
+            archiwum = io.BytesIO()
+            with zipfile.ZipFile(archiwum, "w", zipfile.ZIP_DEFLATED) as zip_:
+                zip_.writestr(f"{nazwa_czesci}.csv", bufor.getvalue().encode("utf-8-sig"))
+            pliki.append((f"{nazwa_czesci}.zip", archiwum.getvalue()))
+        if rozmiar == 1 or all(len(dane) <= limit for _, dane in pliki):
+            return pliki
+        czesci *= 2
+
+def wczytaj_nazwy_produktow(tekst):
+    # CSV (przecinek, średnik lub tab) albo zwykła lista - bierzemy pierwszą kolumnę
+    try:
+        dialekt = csv.Sniffer().sniff(tekst[:2048], delimiters=",;\t")
+    except csv.Error:
+        dialekt = csv.excel
+    nazwy = []
+    for wiersz in csv.reader(io.StringIO(tekst), dialekt):
+        if not wiersz: continue
+        nazwa = wiersz[0].strip()
+        if nazwa and nazwa.lower() not in ("nazwa", "produkt", "name", "product"):
+            nazwy.append(nazwa)
+    return nazwy
+
+async def pobierz_nazwy_moich_ofert(konto):
+    nazwy, offset = [], 0
+    while True:
+        resp = await konto.allegro.get("/sale/offers", params={"limit": 1000, "offset": offset}, priorytet=PRIORYTET_KOMENDY)
+        if resp.status != 200: break
+        oferty = (resp.data or {}).get("offers", [])
+        nazwy.extend(o["name"] for o in oferty if o.get("name"))
+        offset += len(oferty)
+        if len(oferty) < 1000 or offset >= resp.data.get("totalCount", 0): break
+    return nazwy
+
+async def generuj_gpsr_batch(produkty, na_postep=None):
+    """
+    Generuje GPSR dla listy produktów z ograniczoną współbieżnością.
+    Duplikaty liczone są raz, a gotowe opisy lądują w bazie - ponowne uruchomienie
+    tej samej listy (np. po restarcie) robi tylko to, czego brakuje.
+    """
+    unikalne = {}
+    for produkt in produkty:
+        unikalne.setdefault(klucz_cache("gpsr", produkt), produkt)
+
+    gotowe = await baza.gpsr_dla(unikalne.keys())
+    bledy = {}
+    semafor = asyncio.Semaphore(GPSR_WSPOLBIEZNOSC)
+
+    async def jeden(klucz, produkt):
+        async with semafor:
+            try:
+                opis, _ = await cache_odpowiedzi.get_or_compute(("gpsr", produkt), lambda: _zapytaj_claude_gpsr(produkt))
+                gotowe[klucz] = (produkt, opis.strip())
+                baza.zapisz_gpsr(klucz, produkt, opis.strip())
+            except Exception as e:
+                bledy[klucz] = (produkt, str(e))
+        if na_postep: na_postep(len(gotowe) + len(bledy), len(unikalne))
+
+    await asyncio.gather(*(jeden(k, p) for k, p in unikalne.items() if k not in gotowe))
+    return unikalne, gotowe, bledy
+
+@bot.command()
+async def gpsr_batch(ctx, zrodlo: str = None):
+    if not CLAUDE_KEY:
+        return await ctx.send("❌ Brak klucza Claude.")
+
+    if ctx.message.attachments:
+        tekst = (await ctx.message.attachments[0].read()).decode("utf-8-sig", errors="replace")
+        produkty = wczytaj_nazwy_produktow(tekst)
+    elif zrodlo == "moje":
+        konto = konto_dla(ctx)
+        if not konto.allegro.token:
+            return await ctx.send("❌ Bot nie jest zalogowany do Allegro.")
+        produkty = await pobierz_nazwy_moich_ofert(konto)
+    elif zrodlo == "wznow":
+        produkty = baza.get("gpsr_zadanie") or []
+    else:
+        return await ctx.send("❌ Dołącz plik CSV z nazwami produktów albo użyj `!gpsr_batch moje` / `!gpsr_batch wznow`")
+
+    if not produkty:
+        return await ctx.send("📭 Brak produktów do przetworzenia.")
+    pominiete = max(0, len(produkty) - GPSR_MAX_PRODUKTOW)
+    produkty = produkty[:GPSR_MAX_PRODUKTOW]
+    # Zapamiętujemy listę, żeby po restarcie dało się wznowić `!gpsr_batch wznow`
+    baza.set("gpsr_zadanie", produkty)
+
+    uwaga_limit = (f"\n✂️ Limit {GPSR_MAX_PRODUKTOW} pozycji na raz - pominięto {pominiete} ostatnich wierszy, "
+                   f"wyślij je w osobnym pliku." if pominiete else "")
+    msg = await ctx.send(f"🏭 **GPSR hurtowo:** {len(produkty)} pozycji, startuję...{uwaga_limit}")
+    ostatnia_edycja = [0.0]
+
+    def postep(zrobione, wszystkie):
+        if time.monotonic() - ostatnia_edycja[0] < 3: return
+        ostatnia_edycja[0] = time.monotonic()
+        asyncio.ensure_future(msg.edit(content=f"🏭 **GPSR hurtowo:** {zrobione}/{wszystkie}...{uwaga_limit}"))
+
+    start = time.perf_counter()
+    unikalne, gotowe, bledy = await generuj_gpsr_batch(produkty, postep)
+
+    wiersze = [[produkt, gotowe[klucz][1] if klucz in gotowe else f"BŁĄD: {bledy.get(klucz, (produkt, 'brak'))[1]}"]
+               for klucz, produkt in unikalne.items()]
+    limit = ctx.guild.filesize_limit if ctx.guild else LIMIT_ZALACZNIKA
+    pliki = spakuj_csv(["produkt", "gpsr"], wiersze, f"gpsr_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}", limit)
+
+    podsumowanie = (f"✅ **GPSR gotowe:** {len(gotowe)}/{len(unikalne)} unikalnych produktów "
+                    f"({len(produkty) - len(unikalne)} duplikatów) w {time.perf_counter() - start:.0f}s")
+    if len(pliki) > 1:
+        podsumowanie += f"\n📦 Wynik podzielony na {len(pliki)} części ZIP (limit załącznika {limit / 1024 / 1024:.0f} MB)."
+    if bledy:
+        podsumowanie += f"\n⚠️ Błędy: {len(bledy)} - uruchom `!gpsr_batch wznow`, żeby dokończyć."
+    podsumowanie += uwaga_limit
+    await msg.edit(content=podsumowanie)
 
-    await msg.edit(content=None, embed=embed)
+    try:
+        for nazwa, dane in pliki:
+            await ctx.send(file=discord.File(io.BytesIO(dane), filename=nazwa))
+    except discord.HTTPException as e:
+        # Opisy są już w bazie, a zadanie zostaje zapamiętane - `wznow` zbuduje plik bez ponownego generowania
+        print(f"❌ GPSR hurtowo: nie udało się wysłać wyniku: {e}")
+        return await ctx.send(f"❌ Nie udało się wysłać pliku z wynikami ({e.status}). Opisy są zapisane w bazie bota - "
+                              f"`!gpsr_batch wznow` wyśle je ponownie bez generowania od nowa.")
+    if not bledy:
+        baza.set("gpsr_zadanie", None)
 
 @bot.command()
 async def tracker(ctx, link: str = None):
-    global sledzone_oferty, allegro_token
+    global sledzone_oferty
     
     if not link:
         return await ctx.send("❌ Podaj link lub numer oferty! Np. `!tracker https://allegro.pl/oferta/123...`")
@@ -619,49 +1550,179 @@ async def tracker(ctx, link: str = None):
     if not oferta_id:
         return await ctx.send("❌ Nie wykryłem poprawnego ID oferty.")
 
-    if not allegro_token:
+    if not konto_glowne.allegro.token:
         return await ctx.send("❌ Bot nie jest zalogowany do Allegro.")
 
     msg = await ctx.send("🔍 Sprawdzam ofertę (Public API)...")
 
-    # ZMIANA NA LISTING (Publiczny) - to omija błąd 403 dla cudzych ofert
-    url = f"https://api.allegro.pl/offers/listing?offer.id={oferta_id}"
-    headers = {"Authorization": f"Bearer {allegro_token}", "Accept": "application/vnd.allegro.public.v1+json"}
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as resp:
-            if resp.status == 200:
-                data = await resp.json()
-                
-                # Logika wyciągania z listingu
-                items = data.get("items", {})
-                lista_ofert = items.get("regular", []) + items.get("promoted", [])
-                
-                if lista_ofert:
-                    oferta = lista_ofert[0]
-                    # Popularity = sprzedane sztuki (w przybliżeniu Allegro)
-                    sprzedane_total = int(oferta.get("sellingMode", {}).get("popularity", 0))
-                    nazwa = oferta.get("name")
-                    cena = oferta.get("sellingMode", {}).get("price", {}).get("amount", "???")
-                    waluta = oferta.get("sellingMode", {}).get("price", {}).get("currency", "PLN")
-                    
-                    sledzone_oferty[oferta_id] = sprzedane_total
-                    
-                    embed = discord.Embed(title="✅ Dodano do Trackera", color=0x2ecc71)
-                    embed.description = f"Będę śledzić: **{nazwa}**\nCena: **{cena} {waluta}**\nObecnie sprzedano: **{sprzedane_total}** szt."
-                    embed.set_footer(text="Będę sprawdzać co 30 min.")
-                    await msg.edit(content=None, embed=embed)
-                else:
-                    await msg.edit(content="❌ Nie znaleziono takiej oferty w API publicznym.")
-            else:
-                tekst_bledu = await resp.text()
-                print(f"BŁĄD API: {tekst_bledu}") 
-                await msg.edit(content=f"❌ Błąd API Allegro: {resp.status}")
+    resp = await pobierz_oferte_z_listingu(oferta_id)
+    if resp.status == 200:
+        lista_ofert = oferty_z_listingu(resp.data)
+        
+        if lista_ofert:
+            oferta = lista_ofert[0]
+            # Popularity = sprzedane sztuki (w przybliżeniu Allegro)
+            sprzedane_total = oferta.popularnosc
+            nazwa = oferta.nazwa
+            cena = f"{oferta.cena:.2f}" if oferta.cena is not None else "???"
+            waluta = oferta.waluta
+            
+            dodaj_do_trackera(oferta)
+            
+            embed = discord.Embed(title="✅ Dodano do Trackera", color=0x2ecc71)
+            embed.description = f"Będę śledzić: **{nazwa}**\nCena: **{cena} {waluta}**\nObecnie sprzedano: **{sprzedane_total}** szt."
+            embed.set_footer(text=f"Sprawdzam co {TRACKER_MIN_INTERWAL / 60:.0f} min - {TRACKER_MAX_INTERWAL / 3600:.0f} h, zależnie od tempa sprzedaży.")
+            await msg.edit(content=None, embed=embed)
+        else:
+            await msg.edit(content="❌ Nie znaleziono takiej oferty w API publicznym.")
+    else:
+        print(f"BŁĄD API: {resp.text}") 
+        await msg.edit(content=f"❌ Błąd API Allegro: {resp.status}")
+
+async def tekst_komendy(ctx, tekst):
+    """Treść komendy + pierwszy załącznik (lista linków albo CSV)."""
+    if ctx.message.attachments:
+        tekst += "\n" + (await ctx.message.attachments[0].read()).decode("utf-8-sig", errors="replace")
+    return tekst
+
+async def importuj_do_trackera(msg, ids):
+    """Weryfikuje nowe ID w listingu i dodaje istniejące oferty; raport w `msg`."""
+    juz_sledzone = sum(1 for i in ids if i in sledzone_oferty)
+    nowe = [i for i in ids if i not in sledzone_oferty]
+    obciete = max(0, len(nowe) - TRACKER_IMPORT_MAX)
+    nowe = nowe[:TRACKER_IMPORT_MAX]
+
+    start = time.perf_counter()
+    znalezione, brak, bledy = await zweryfikuj_oferty(nowe) if nowe else ([], [], [])
+    for oferta in znalezione:
+        dodaj_do_trackera(oferta, rozloz=True)
+
+    raport = (f"✅ **Tracker:** dodano {len(znalezione)} ofert w {time.perf_counter() - start:.1f}s "
+              f"(śledzonych łącznie: {len(sledzone_oferty)})")
+    if juz_sledzone: raport += f"\n♻️ Już śledzone: {juz_sledzone}"
+    if brak: raport += f"\n❌ Nie znaleziono w listingu ({len(brak)}): " + ", ".join(brak[:10]) + (" ..." if len(brak) > 10 else "")
+    if bledy: raport += f"\n⚠️ Nie udało się sprawdzić ({len(bledy)}) - spróbuj zaimportować je ponownie."
+    if obciete: raport += f"\n✂️ Pominięto {obciete} ponad limit {TRACKER_IMPORT_MAX} na jeden import."
+    await msg.edit(content=raport)
+
+@bot.command(name="tracker_import")
+async def tracker_import(ctx, *, tekst: str = ""):
+    if not konto_glowne.allegro.token:
+        return await ctx.send("❌ Bot nie jest zalogowany do Allegro.")
+    ids = wyciagnij_id_z_tekstu(await tekst_komendy(ctx, tekst))
+    if not ids:
+        return await ctx.send("❌ Wklej linki / numery ofert albo dołącz plik, np. `!tracker_import 1234567890 https://allegro.pl/oferta/...`")
+
+    msg = await ctx.send(f"🔍 Sprawdzam {len(ids)} ofert (Public API)...")
+    await importuj_do_trackera(msg, ids)
+
+@bot.command(name="tracker_szukaj")
+async def tracker_szukaj(ctx, *, zapytanie: str = ""):
+    # Opcje w treści: kategoria=ID, limit=N; reszta to szukana fraza
+    opcje, slowa = {}, []
+    for slowo in zapytanie.split():
+        klucz, _, wartosc = slowo.partition("=")
+        if klucz in ("kategoria", "limit") and wartosc: opcje[klucz] = wartosc
+        else: slowa.append(slowo)
+    fraza = " ".join(slowa)
+    kategoria = opcje.get("kategoria")
+    limit = min(int(parsuj_liczbe(opcje.get("limit", "")) or TRACKER_IMPORT_MAX), TRACKER_IMPORT_MAX)
+
+    if not fraza and not kategoria:
+        return await ctx.send("❌ Podaj frazę i/lub kategorię, np. `!tracker_szukaj lampka nocna limit=200` albo `!tracker_szukaj kategoria=257931`")
+    if not konto_glowne.allegro.token:
+        return await ctx.send("❌ Bot nie jest zalogowany do Allegro.")
 
-# --- START BOTA ---
-keep_alive()  # <--- TO JEST KLUCZOWE DLA RENDER.COM
-bot.run(TOKEN)
+    msg = await ctx.send(f"🔎 Szukam ofert: *{fraza or '-'}*" + (f" (kategoria {kategoria})" if kategoria else "") + "...")
+    oferty, status_http = await szukaj_ofert(fraza, kategoria, limit)
+    if status_http != 200:
+        return await msg.edit(content=f"❌ Błąd API Allegro: {status_http}")
+    if not oferty:
+        return await msg.edit(content="📭 Brak ofert dla tego wyszukiwania.")
+
+    # Oferty z wyszukiwania mają już komplet danych - nie trzeba ich weryfikować drugi raz
+    nowe = [o for o in oferty if o.id not in sledzone_oferty]
+    for oferta in nowe:
+        dodaj_do_trackera(oferta, rozloz=True)
+    await msg.edit(content=f"✅ **Tracker:** znaleziono {len(oferty)} ofert, dodano {len(nowe)} nowych "
+                           f"(śledzonych łącznie: {len(sledzone_oferty)})")
+
+@bot.command(name="lista_tracker")
+async def lista_tracker(ctx, strona: str = "1"):
+    if not sledzone_oferty:
+        return await ctx.send("📭 Tracker nie śledzi żadnych ofert. Dodaj je: `!tracker`, `!tracker_import`, `!tracker_szukaj`")
+
+    oferty = sorted(sledzone_oferty, key=lambda i: historia_ofert.nazwy.get(i, i).lower())
+    stron = (len(oferty) + TRACKER_LISTA_STRONA - 1) // TRACKER_LISTA_STRONA
+    nr = max(1, min(stron, int(parsuj_liczbe(strona) or 1)))
+    linie = []
+    for i, oferta_id in enumerate(oferty[(nr - 1) * TRACKER_LISTA_STRONA:nr * TRACKER_LISTA_STRONA], (nr - 1) * TRACKER_LISTA_STRONA + 1):
+        nazwa = historia_ofert.nazwy.get(oferta_id, oferta_id)
+        if len(nazwa) > 45: nazwa = nazwa[:45] + "..."
+        linie.append(f"{i}. [{nazwa}](https://allegro.pl/oferta/{oferta_id}) - **{sledzone_oferty[oferta_id]}** szt. (`{oferta_id}`)")
+
+    embed = discord.Embed(title=f"📋 Śledzone oferty ({len(oferty)})", description="\n".join(linie), color=0x3498db)
+    embed.set_footer(text=f"Strona {nr}/{stron}" + (f" | następna: !lista_tracker {nr + 1}" if nr < stron else ""))
+    await ctx.send(embed=embed)
 
+@bot.command(name="tracker_usun")
+async def tracker_usun(ctx, *, tekst: str = ""):
+    if tekst.strip().lower() == "wszystko":
+        ids = list(sledzone_oferty)
+    else:
+        ids = wyciagnij_id_z_tekstu(await tekst_komendy(ctx, tekst))
+    if not ids:
+        return await ctx.send("❌ Podaj linki / numery ofert (albo plik), np. `!tracker_usun 1234567890`, lub `!tracker_usun wszystko`")
 
+    usuniete = sum(1 for oferta_id in ids if usun_z_trackera(oferta_id))
+    odpowiedz = f"🗑️ Usunięto z trackera: {usuniete} (śledzonych łącznie: {len(sledzone_oferty)})"
+    if usuniete < len(ids): odpowiedz += f"\nℹ️ Nieśledzone: {len(ids) - usuniete}"
+    await ctx.send(odpowiedz)
+
+@bot.command()
+async def tempo(ctx, godziny: str = "24"):
+    okno = parsuj_liczbe(godziny) or 24
+    start = time.perf_counter()
+    ranking = historia_ofert.top_movers(n=15, okno_h=okno)
+    czas_ms = (time.perf_counter() - start) * 1000
+    if not ranking:
+        return await ctx.send(f"📭 Brak wzrostów w ostatnich {okno:g} h (albo za mało historii).")
+
+    linie = []
+    for i, (oferta_id, na_godzine, przyrost) in enumerate(ranking, 1):
+        nazwa = historia_ofert.nazwy.get(oferta_id, oferta_id)
+        if len(nazwa) > 45: nazwa = nazwa[:45] + "..."
+        linie.append(f"{i}. [{nazwa}](https://allegro.pl/oferta/{oferta_id}) - **{na_godzine:.2f} szt./h** (+{przyrost})")
+    embed = discord.Embed(title=f"🏎️ Najszybciej sprzedające się oferty ({okno:g} h)", description="\n".join(linie), color=0xe67e22)
+    embed.set_footer(text=f"{len(historia_ofert.oferty)} ofert, {len(historia_ofert)} próbek | {czas_ms:.0f} ms")
+    await ctx.send(embed=embed)
 
+@bot.command()
+async def historia(ctx, link: str = None):
+    oferta_id = wyciagnij_id_z_linku(link) if link else None
+    if not oferta_id:
+        return await ctx.send("❌ Podaj link lub numer oferty, np. `!historia 1234567890`")
+
+    ts, pop, ceny = historia_ofert.historia(oferta_id)
+    if len(ts) < 2:
+        return await ctx.send("📭 Za mało danych o tej ofercie - tracker musi ją sprawdzić kilka razy.")
+
+    indeksy, tempo_h, _ = historia_ofert.tempo_sprzedazy(24)
+    tempo_24h = next((float(t) for i, t in zip(indeksy, tempo_h) if historia_ofert.oferty[i] == oferta_id), 0.0)
+    dni = (ts[-1] - ts[0]) / 86400
+    _, srednia = historia_ofert.srednia_kroczaca(oferta_id, okno_h=24 * 7, okno_sredniej_h=24)
+
+    embed = discord.Embed(title=f"📊 {historia_ofert.nazwy.get(oferta_id, oferta_id)}", url=f"https://allegro.pl/oferta/{oferta_id}", color=0x3498db)
+    embed.add_field(name="Sprzedaż (24 h)", value=f"{tempo_24h:.2f} szt./h", inline=True)
+    embed.add_field(name=f"Sprzedaż ({dni:.0f} dni)", value=f"+{int(pop[-1] - pop[0])} szt.", inline=True)
+    if len(srednia):
+        embed.add_field(name="Średnia krocząca 24 h", value=f"{srednia[-1] * 24:.1f} szt./dzień (tydzień temu: {srednia[0] * 24:.1f})", inline=False)
+    znane_ceny = ceny[~np.isnan(ceny)]
+    if len(znane_ceny):
+        embed.add_field(name="Cena", value=f"{znane_ceny[-1]:.2f} zł (min {znane_ceny.min():.2f} / max {znane_ceny.max():.2f})", inline=False)
+    embed.set_footer(text=f"{len(ts)} pomiarów")
+    await ctx.send(embed=embed)
 
+# --- START BOTA ---
+if __name__ == "__main__":
+    bot.run(TOKEN)
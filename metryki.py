@@ -0,0 +1,192 @@
+import functools
+import time
+from contextlib import contextmanager
+
+# Granice kubełków histogramów czasu (sekundy)
+KUBELKI = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PREFIKS = "bot_"
+
+
+class Histogram:
+    __slots__ = ("kubelki", "liczniki", "suma", "ile")
+
+    def __init__(self, kubelki=KUBELKI):
+        self.kubelki = kubelki
+        self.liczniki = [0] * (len(kubelki) + 1)  # ostatni = +Inf
+        self.suma = 0.0
+        self.ile = 0
+
+    def obserwuj(self, wartosc):
+        for i, granica in enumerate(self.kubelki):
+            if wartosc <= granica:
+                break
+        else:
+            i = len(self.kubelki)
+        self.liczniki[i] += 1
+        self.suma += wartosc
+        self.ile += 1
+
+    def dodaj(self, inny):
+        for i, n in enumerate(inny.liczniki):
+            self.liczniki[i] += n
+        self.suma += inny.suma
+        self.ile += inny.ile
+
+    def kwantyl(self, q):
+        """Przybliżony kwantyl z kubełków (interpolacja liniowa wewnątrz kubełka)."""
+        if not self.ile:
+            return 0.0
+        cel = q * self.ile
+        narastajaco = 0
+        for i, n in enumerate(self.liczniki):
+            if narastajaco + n >= cel and n:
+                dolna = self.kubelki[i - 1] if i > 0 else 0.0
+                if i == len(self.kubelki):
+                    return dolna
+                return dolna + (self.kubelki[i] - dolna) * (cel - narastajaco) / n
+            narastajaco += n
+        return self.kubelki[-1]
+
+
+def _etykiety(etykiety):
+    return tuple(sorted((k, str(v)) for k, v in etykiety.items()))
+
+
+def _escape(wartosc):
+    return str(wartosc).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_etykiet(etykiety, dodatkowe=()):
+    pary = list(etykiety) + list(dodatkowe)
+    if not pary:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pary) + "}"
+
+
+class Metrics:
+    """
+    Liczniki, histogramy czasu i wskaźniki (gauge) dla całego procesu.
+    Zapis i odczyt (/metrics) idą z tej samej pętli asyncio, więc bez zamków -
+    inkrementacja to jedna operacja na słowniku w gorącej ścieżce.
+    """
+
+    def __init__(self):
+        self._liczniki = {}
+        self._histogramy = {}
+        self._wskazniki = {}
+        self._opisy = {}
+        self._petle = {}
+
+    def opis(self, nazwa, tekst):
+        self._opisy[nazwa] = tekst
+
+    def inc(self, nazwa, wartosc=1, **etykiety):
+        klucz = (nazwa, _etykiety(etykiety))
+        self._liczniki[klucz] = self._liczniki.get(klucz, 0) + wartosc
+
+    def observe(self, nazwa, wartosc, **etykiety):
+        klucz = (nazwa, _etykiety(etykiety))
+        histogram = self._histogramy.get(klucz)
+        if histogram is None:
+            histogram = self._histogramy[klucz] = Histogram()
+        histogram.obserwuj(wartosc)
+
+    def gauge(self, nazwa, funkcja):
+        """`funkcja()` zwraca liczbę albo słownik {etykiety (dict/tuple): liczba}; liczona przy odczycie."""
+        self._wskazniki[nazwa] = funkcja
+
+    @contextmanager
+    def mierz(self, nazwa, **etykiety):
+        """Czas bloku trafia do `<nazwa>_seconds`, a wyjątek zwiększa `<nazwa>_errors_total`."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.inc(f"{nazwa}_errors_total", error=type(e).__name__, **etykiety)
+            raise
+        finally:
+            self.observe(f"{nazwa}_seconds", time.perf_counter() - start, **etykiety)
+
+    def petla(self, nazwa, interwal):
+        """
+        Dekorator dla ciała `tasks.loop`: mierzy czas iteracji i opóźnienie względem planu
+        (ile później niż `interwal` po poprzednim starcie ruszyła kolejna iteracja).
+        """
+        def dekorator(funkcja):
+            @functools.wraps(funkcja)
+            async def opakowana(*args, **kwargs):
+                start = time.monotonic()
+                poprzedni = self._petle.get(nazwa)
+                if poprzedni is not None:
+                    self.observe("loop_lag_seconds", max(0.0, start - poprzedni - interwal), loop=nazwa)
+                self._petle[nazwa] = start
+                with self.mierz("loop_iteration", loop=nazwa):
+                    return await funkcja(*args, **kwargs)
+            return opakowana
+        return dekorator
+
+    def ostatnia_iteracja(self, nazwa):
+        """Sekundy od startu ostatniej iteracji pętli (None, jeśli jeszcze nie ruszyła)."""
+        start = self._petle.get(nazwa)
+        return None if start is None else time.monotonic() - start
+
+    # --- ODCZYT ---
+    def suma_histogramow(self, nazwa, **filtr):
+        wynik = Histogram()
+        for (n, etykiety), histogram in self._histogramy.items():
+            if n == nazwa and all(dict(etykiety).get(k) == str(v) for k, v in filtr.items()):
+                wynik.dodaj(histogram)
+        return wynik
+
+    def liczniki(self, nazwa):
+        """{etykiety (krotka par klucz-wartość): wartość} dla jednego licznika."""
+        return {etykiety: v for (n, etykiety), v in self._liczniki.items() if n == nazwa}
+
+    def etykiety(self, nazwa, klucz):
+        return sorted({dict(e).get(klucz) for (n, e) in self._histogramy if n == nazwa} - {None})
+
+    def render(self):
+        """Format tekstowy Prometheusa (exposition format 0.0.4)."""
+        liczniki = sorted(self._liczniki.items())
+        histogramy = sorted((k, (list(h.liczniki), h.suma, h.ile, h.kubelki)) for k, h in self._histogramy.items())
+        linie = []
+        ostatnia = None
+
+        def naglowek(nazwa, typ):
+            nonlocal ostatnia
+            if nazwa != ostatnia:
+                if nazwa in self._opisy:
+                    linie.append(f"# HELP {PREFIKS}{nazwa} {self._opisy[nazwa]}")
+                linie.append(f"# TYPE {PREFIKS}{nazwa} {typ}")
+                ostatnia = nazwa
+
+        for (nazwa, etykiety), wartosc in liczniki:
+            naglowek(nazwa, "counter")
+            linie.append(f"{PREFIKS}{nazwa}{_format_etykiet(etykiety)} {wartosc}")
+
+        for (nazwa, etykiety), (kubelki_n, suma, ile, granice) in histogramy:
+            naglowek(nazwa, "histogram")
+            narastajaco = 0
+            for granica, n in zip(list(granice) + ["+Inf"], kubelki_n):
+                narastajaco += n
+                linie.append(f"{PREFIKS}{nazwa}_bucket{_format_etykiet(etykiety, [('le', granica)])} {narastajaco}")
+            linie.append(f"{PREFIKS}{nazwa}_sum{_format_etykiet(etykiety)} {suma}")
+            linie.append(f"{PREFIKS}{nazwa}_count{_format_etykiet(etykiety)} {ile}")
+
+        for nazwa, funkcja in sorted(self._wskazniki.items()):
+            try:
+                wartosc = funkcja()
+            except Exception:
+                continue  # jeden zepsuty wskaźnik nie może wywrócić całego /metrics
+            naglowek(nazwa, "gauge")
+            if isinstance(wartosc, dict):
+                for etykiety, v in wartosc.items():
+                    etykiety = _etykiety(etykiety) if isinstance(etykiety, dict) else etykiety
+                    linie.append(f"{PREFIKS}{nazwa}{_format_etykiet(etykiety)} {v}")
+            elif wartosc is not None:
+                linie.append(f"{PREFIKS}{nazwa} {wartosc}")
+        return "\n".join(linie) + "\n"
+
+
+# Jeden rejestr na proces - importują go klient Allegro, kolejka powiadomień i bot
+metryki = Metrics()
@@ -0,0 +1,173 @@
+# Modele danych z API Allegro: tylko pola, których używa bot, w obiektach ze __slots__.
+# Każdy rekord dekodujemy osobno - rekord w nieoczekiwanym kształcie trafia do logu i licznika
+# `payload_invalid_total`, a reszta strony idzie dalej (zamiast wywracać cały cykl pętli).
+from metryki import metryki
+
+
+def _pole(dane, *sciezka):
+    """dane["a"]["b"]... albo None, jeśli po drodze czegoś brakuje albo to nie słownik."""
+    for klucz in sciezka:
+        if not isinstance(dane, dict):
+            return None
+        dane = dane.get(klucz)
+    return dane
+
+
+def _wymagane(dane, *sciezka):
+    wartosc = _pole(dane, *sciezka)
+    if wartosc is None or wartosc == "":
+        raise ValueError(f"brak pola {'.'.join(sciezka)}")
+    return wartosc
+
+
+def _liczba(wartosc, domyslna=None):
+    if wartosc is None:
+        return domyslna
+    try:
+        return float(str(wartosc).replace(",", "."))
+    except ValueError:
+        return domyslna
+
+
+def _tekst(wartosc, domyslna=""):
+    return domyslna if wartosc is None else str(wartosc)
+
+
+class Pozycja:
+    __slots__ = ("oferta_id", "nazwa", "ilosc", "cena", "waluta")
+
+    def __init__(self, oferta_id, nazwa, ilosc, cena=None, waluta=None):
+        self.oferta_id = oferta_id
+        self.nazwa = nazwa
+        self.ilosc = ilosc
+        self.cena = cena  # cena jednostkowa brutto (None, jeśli API jej nie podało)
+        self.waluta = waluta  # None = waluta zamówienia
+
+    @classmethod
+    def z_api(cls, dane):
+        return cls(
+            oferta_id=_tekst(_pole(dane, "offer", "id")),
+            nazwa=_tekst(_pole(dane, "offer", "name"), "Nieznana oferta"),
+            ilosc=int(_liczba(_pole(dane, "quantity"), 1)),
+            cena=_liczba(_pole(dane, "price", "amount")),
+            waluta=_pole(dane, "price", "currency"),
+        )
+
+    def to_dict(self):
+        return {"quantity": self.ilosc, "offer": {"id": self.oferta_id, "name": self.nazwa},
+                "price": {"amount": self.cena, "currency": self.waluta}}
+
+
+class Zamowienie:
+    """Checkout form (`/order/checkout-forms`). `kupiono` to czas zakupu (boughtAt), a bez niego - updatedAt."""
+    __slots__ = ("id", "updated_at", "status", "kupujacy", "kwota", "waluta", "pozycje", "kupiono")
+
+    def __init__(self, id, updated_at, status, kupujacy, kwota, waluta, pozycje, kupiono=None):
+        self.id = id
+        self.updated_at = updated_at
+        self.status = status
+        self.kupujacy = kupujacy
+        self.kwota = kwota
+        self.waluta = waluta
+        self.pozycje = pozycje
+        self.kupiono = kupiono or updated_at
+
+    @classmethod
+    def z_api(cls, dane):
+        if not isinstance(dane, dict):
+            raise ValueError("zamówienie nie jest obiektem")
+        pozycje = _pole(dane, "lineItems") or []
+        if not isinstance(pozycje, list):
+            raise ValueError("lineItems nie jest listą")
+        kupiono = min((str(p["boughtAt"]) for p in pozycje if isinstance(p, dict) and p.get("boughtAt")), default=None)
+        return cls(
+            id=_tekst(_wymagane(dane, "id")),
+            updated_at=_tekst(_wymagane(dane, "updatedAt")),
+            status=_tekst(_pole(dane, "status")),
+            kupujacy=_tekst(_pole(dane, "buyer", "login"), "?"),
+            kwota=_liczba(_pole(dane, "summary", "totalToPay", "amount"), 0.0),
+            waluta=_tekst(_pole(dane, "summary", "totalToPay", "currency"), "PLN"),
+            pozycje=[Pozycja.z_api(p) for p in pozycje],
+            kupiono=kupiono or _pole(dane, "payment", "finishedAt"),
+        )
+
+    def to_dict(self):
+        return {"id": self.id, "updatedAt": self.updated_at, "status": self.status, "buyer": {"login": self.kupujacy},
+                "summary": {"totalToPay": {"amount": f"{self.kwota:.2f}", "currency": self.waluta}},
+                "lineItems": [dict(p.to_dict(), boughtAt=self.kupiono) for p in self.pozycje]}
+
+
+class Watek:
+    """Wątek wiadomości (`/messaging/threads`) z ostatnią wiadomością."""
+    __slots__ = ("id", "read", "rozmowca", "msg_id", "tekst", "autor", "utworzono", "ostatnia_aktywnosc")
+
+    def __init__(self, id, read, rozmowca, msg_id, tekst, autor, utworzono, ostatnia_aktywnosc=None):
+        self.id = id
+        self.read = read
+        self.rozmowca = rozmowca
+        self.msg_id = msg_id
+        self.tekst = tekst
+        self.autor = autor
+        self.utworzono = utworzono
+        self.ostatnia_aktywnosc = ostatnia_aktywnosc
+
+    @property
+    def czas(self):
+        return self.ostatnia_aktywnosc or self.utworzono
+
+    @classmethod
+    def z_api(cls, dane):
+        if not isinstance(dane, dict):
+            raise ValueError("wątek nie jest obiektem")
+        return cls(
+            id=_tekst(_wymagane(dane, "id")),
+            read=bool(_pole(dane, "read")),
+            rozmowca=_tekst(_pole(dane, "interlocutor", "login"), "?"),
+            msg_id=_tekst(_wymagane(dane, "lastMessage", "id")),
+            tekst=_tekst(_pole(dane, "lastMessage", "text")),
+            autor=_tekst(_pole(dane, "lastMessage", "author", "role")),
+            utworzono=_tekst(_wymagane(dane, "lastMessage", "createdAt")),
+            ostatnia_aktywnosc=_pole(dane, "lastMessageDateTime"),
+        )
+
+    def to_dict(self):
+        return {"id": self.id, "read": self.read, "interlocutor": {"login": self.rozmowca},
+                "lastMessageDateTime": self.ostatnia_aktywnosc,
+                "lastMessage": {"id": self.msg_id, "text": self.tekst, "createdAt": self.utworzono,
+                                "author": {"role": self.autor}}}
+
+
+class OfertaListingu:
+    """Oferta z publicznego listingu (`/offers/listing`); popularność to w przybliżeniu sprzedane sztuki."""
+    __slots__ = ("id", "nazwa", "popularnosc", "cena", "waluta")
+
+    def __init__(self, id, nazwa, popularnosc, cena=None, waluta="PLN"):
+        self.id = id
+        self.nazwa = nazwa
+        self.popularnosc = popularnosc
+        self.cena = cena
+        self.waluta = waluta
+
+    @classmethod
+    def z_api(cls, dane):
+        if not isinstance(dane, dict):
+            raise ValueError("oferta nie jest obiektem")
+        return cls(
+            id=_tekst(_wymagane(dane, "id")),
+            nazwa=_tekst(_pole(dane, "name"), "Nieznana oferta"),
+            popularnosc=int(_liczba(_pole(dane, "sellingMode", "popularity"), 0)),
+            cena=_liczba(_pole(dane, "sellingMode", "price", "amount")),
+            waluta=_tekst(_pole(dane, "sellingMode", "price", "currency"), "PLN"),
+        )
+
+
+def dekoduj(model, rekordy):
+    """Lista modeli z listy słowników z API; niepoprawne rekordy są pomijane (log + licznik)."""
+    wynik = []
+    for rekord in rekordy or ():
+        try:
+            wynik.append(model.z_api(rekord))
+        except (TypeError, ValueError) as e:
+            metryki.inc("payload_invalid_total", model=model.__name__)
+            print(f"⚠️ Pominięto niepoprawny rekord {model.__name__}: {e}")
+    return wynik
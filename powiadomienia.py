@@ -0,0 +1,191 @@
+import asyncio
+import os
+import time
+
+import discord
+
+from metryki import metryki
+
+# Limity Discorda dla jednej wiadomości
+MAX_EMBEDOW = 10
+MAX_ZNAKOW_EMBEDOW = 6000
+MAX_TRESCI = 2000
+MAX_OPISU = 4096
+
+# Odstęp między edycjami wiadomości przy strumieniowaniu odpowiedzi AI
+ODSTEP_EDYCJI = float(os.environ.get("STREAM_EDIT_INTERVAL", "1.5"))
+
+# Jak długo zbieramy serię powiadomień i minimalny odstęp między wiadomościami na kanale
+OKNO_ZBIERANIA = float(os.environ.get("NOTIFY_BATCH_WINDOW", "0.5"))
+ODSTEP_KANALU = float(os.environ.get("NOTIFY_CHANNEL_INTERVAL", "1.0"))
+# Ile przy zamykaniu bota czekamy na wysłanie tego, co zostało w kolejce
+LIMIT_ZAMKNIECIA = float(os.environ.get("NOTIFY_DRAIN_TIMEOUT", "10"))
+
+
+class NotificationQueue:
+    """
+    Kolejka powiadomień na Discorda, oddzielona od pętli Allegro.
+    Producenci tylko wrzucają (content, embed) i wracają do pracy, a osobny nadawca
+    na każdy kanał skleja serię w wiadomości po max 10 embedów i pilnuje odstępów.
+    """
+
+    def __init__(self, bot, okno=OKNO_ZBIERANIA, odstep=ODSTEP_KANALU):
+        self.bot = bot
+        self.okno = okno
+        self.odstep = odstep
+        self._kolejki = {}
+        self._zadania = {}
+        self.przyjete = 0
+        self.wyslane = 0
+        self.bledy = 0
+
+    def send(self, kanal_id, content=None, embed=None):
+        kolejka = self._kolejki.get(kanal_id)
+        if kolejka is None:
+            kolejka = self._kolejki[kanal_id] = asyncio.Queue()
+            self._zadania[kanal_id] = asyncio.get_running_loop().create_task(self._nadawca(kanal_id, kolejka))
+        kolejka.put_nowait((content, embed))
+        self.przyjete += 1
+
+    def glebokosc(self):
+        return sum(k.qsize() for k in self._kolejki.values())
+
+    def stats(self):
+        return {"queued": self.glebokosc(), "accepted": self.przyjete, "sent": self.wyslane, "errors": self.bledy}
+
+    async def _nadawca(self, kanal_id, kolejka):
+        while True:
+            partia = [await kolejka.get()]
+            await asyncio.sleep(self.okno)
+            while not kolejka.empty():
+                partia.append(kolejka.get_nowait())
+            for content, embeds in self._sklej(partia):
+                await self._wyslij(kanal_id, content, embeds)
+                await asyncio.sleep(self.odstep)
+            for _ in partia:
+                kolejka.task_done()
+
+    @staticmethod
+    def _sklej(partia):
+        """
+        Dzieli serię na wiadomości mieszczące się w limitach Discorda.
+        Wspólny nagłówek embedów (np. "@here") idzie raz na wiadomość, a same treści - każda osobną linią,
+        nawet jeśli się powtarzają (każda to osobne zdarzenie).
+        """
+        wiadomosci = []
+        tresci, naglowki, embeds, znaki = [], set(), [], 0
+        for content, embed in partia:
+            dl_embeda = len(embed) if embed is not None else 0
+            nowa_tresc = content and not (embed is not None and content in naglowki)
+            za_duzo = (
+                (embed is not None and (len(embeds) >= MAX_EMBEDOW or znaki + dl_embeda > MAX_ZNAKOW_EMBEDOW))
+                or (nowa_tresc and len("\n".join(tresci + [content])) > MAX_TRESCI)
+            )
+            if za_duzo and (tresci or embeds):
+                wiadomosci.append(("\n".join(tresci) or None, embeds))
+                tresci, naglowki, embeds, znaki = [], set(), [], 0
+                nowa_tresc = bool(content)
+            if nowa_tresc:
+                tresci.append(content)
+                if embed is not None: naglowki.add(content)
+            if embed is not None:
+                embeds.append(embed)
+                znaki += dl_embeda
+        if tresci or embeds:
+            wiadomosci.append(("\n".join(tresci) or None, embeds))
+        return wiadomosci
+
+    async def _wyslij(self, kanal_id, content, embeds):
+        channel = self.bot.get_channel(kanal_id)
+        if not channel:
+            print(f"⚠️ Brak kanału {kanal_id} - pomijam powiadomienie")
+            return
+        try:
+            with metryki.mierz("discord_request", op="send"):
+                await channel.send(content=content, embeds=embeds)
+            self.wyslane += 1
+        except Exception as e:
+            self.bledy += 1
+            print(f"❌ Błąd wysyłania na Discord: {e}")
+
+    async def close(self, limit=LIMIT_ZAMKNIECIA):
+        # ID zamówień i wiadomości są już zapisane jako przetworzone, więc powiadomienie porzucone
+        # w kolejce nie wróciłoby po restarcie - najpierw próbujemy wysłać zaległości
+        if self._kolejki:
+            try:
+                await asyncio.wait_for(asyncio.gather(*(k.join() for k in self._kolejki.values())), timeout=limit)
+            except asyncio.TimeoutError:
+                print(f"⚠️ Zamykanie: nie wysłano {self.glebokosc()} powiadomień w {limit:g}s")
+        for zadanie in self._zadania.values():
+            zadanie.cancel()
+        self._zadania.clear()
+        self._kolejki.clear()
+
+
+def podziel_tekst(tekst, limit):
+    """Dzieli tekst na kawałki <= limit, tnąc w miarę możliwości na końcach linii."""
+    czesci = []
+    while len(tekst) > limit:
+        ciecie = tekst.rfind("\n", 0, limit)
+        if ciecie <= 0:
+            ciecie = limit
+        czesci.append(tekst[:ciecie])
+        tekst = tekst[ciecie:].lstrip("\n")
+    if tekst or not czesci:
+        czesci.append(tekst)
+    return czesci
+
+
+class StreamingEmbed:
+    """
+    Pokazuje odpowiedź AI w trakcie generowania: kolejne fragmenty trafiają do embeda
+    nie częściej niż co `odstep` sekund, a gotowy tekst dłuższy niż limit embeda
+    jest dzielony na kilka wiadomości zamiast ucinania.
+    """
+
+    def __init__(self, msg, tytul, kolor, formatuj=None, odstep=ODSTEP_EDYCJI):
+        self.msg = msg
+        self.tytul = tytul
+        self.kolor = kolor
+        self.formatuj = formatuj or (lambda t: t)
+        self.odstep = odstep
+        self._tekst = ""
+        self._ostatnia_edycja = 0.0
+        self._zadanie = None
+        # Zapas na znaki dokładane przez `formatuj` (np. blok ```yaml)
+        self.limit = MAX_OPISU - len(self.formatuj(""))
+
+    def aktualizuj(self, tekst):
+        self._tekst = tekst
+        if self._zadanie is None or self._zadanie.done():
+            self._zadanie = asyncio.ensure_future(self._edytuj())
+
+    async def _edytuj(self):
+        czekaj = self.odstep - (time.monotonic() - self._ostatnia_edycja)
+        if czekaj > 0:
+            await asyncio.sleep(czekaj)
+        podglad = self._tekst
+        if len(podglad) > self.limit - 2:
+            # W podglądzie pokazujemy koniec - tam właśnie coś się dzieje
+            podglad = "…" + podglad[-(self.limit - 3):]
+        try:
+            embed = discord.Embed(title=self.tytul, description=self.formatuj(podglad + " ▌"), color=self.kolor)
+            with metryki.mierz("discord_request", op="edit"):
+                await self.msg.edit(content=None, embed=embed)
+        except Exception as e:
+            print(f"⚠️ Błąd edycji podglądu: {e}")
+        self._ostatnia_edycja = time.monotonic()
+
+    async def zakoncz(self, tekst, stopka=None):
+        if self._zadanie is not None:
+            await self._zadanie
+        czesci = podziel_tekst(tekst, self.limit)
+        for i, czesc in enumerate(czesci):
+            tytul = self.tytul if len(czesci) == 1 else f"{self.tytul} ({i + 1}/{len(czesci)})"
+            embed = discord.Embed(title=tytul, description=self.formatuj(czesc), color=self.kolor)
+            if stopka and i == len(czesci) - 1:
+                embed.set_footer(text=stopka)
+            if i == 0:
+                await self.msg.edit(content=None, embed=embed)
+            else:
+                await self.msg.channel.send(embed=embed)
@@ -0,0 +1,104 @@
+import datetime
+import os
+import zoneinfo
+
+# Ile dni dziennych agregatów trzymamy (raport tygodniowy / miesięczny potrzebuje co najwyżej tylu)
+RETENCJA_DNI = int(os.environ.get("SALES_RETENTION_DAYS", "62"))
+STREFA = zoneinfo.ZoneInfo(os.environ.get("SALES_TIMEZONE", "Europe/Warsaw"))
+
+
+def dzien_zamowienia(czas_iso):
+    """Dzień (w polskiej strefie) z daty ISO z API (boughtAt / updatedAt); przy dziwnej dacie - dzisiaj."""
+    try:
+        czas = datetime.datetime.fromisoformat(czas_iso.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        czas = datetime.datetime.now(datetime.timezone.utc)
+    return czas.astimezone(STREFA).date()
+
+
+def dzisiaj():
+    return datetime.datetime.now(STREFA).date()
+
+
+class SalesAggregates:
+    """
+    Dzienne agregaty sprzedaży jednego konta aktualizowane przy każdym zamówieniu:
+    liczba zamówień, przychód i liczba zamówień per waluta, sztuki i sprzedaż per oferta.
+    Zamówienie trafia do dnia zakupu, a nie dnia, w którym bot je zobaczył - zaległości nadrobione
+    po przerwie nie zawyżają "dzisiaj".
+    Raport za N dni składa N gotowych kubełków - nie zależy od liczby zamówień w historii.
+    Kubełki zapisujemy przez `zapisz(klucz, wartosc)` (bufor bazy scala kolejne zapisy tego samego dnia),
+    a po restarcie wczytujemy przez `wczytaj(klucz)`.
+    """
+
+    def __init__(self, wczytaj, zapisz, retencja_dni=RETENCJA_DNI):
+        self._zapisz = zapisz
+        self.retencja_dni = retencja_dni
+        self._dni = {}
+        for dzien in wczytaj("sprzedaz_dni") or []:
+            kubelek = wczytaj(f"sprzedaz:{dzien}")
+            if kubelek: self._dni[dzien] = kubelek
+
+    def __len__(self):
+        return len(self._dni)
+
+    def dodaj(self, zamowienie, dzien=None, znak=1):
+        """`znak=-1` wycofuje wcześniej doliczone zamówienie (np. anulowane po opłaceniu) z tego samego kubełka."""
+        dzien = dzien or dzien_zamowienia(zamowienie.kupiono)
+        if dzien <= dzisiaj() - datetime.timedelta(days=self.retencja_dni):
+            return  # poza oknem raportów (np. bardzo stare zamówienie nadrobione po przerwie)
+        dzien = dzien.isoformat()
+        kubelek = self._dni.get(dzien)
+        if kubelek is None:
+            if znak < 0: return
+            kubelek = self._dni[dzien] = {"zamowienia": 0, "sztuki": 0, "waluty": {}, "produkty": {}}
+            self._przytnij(dzien)
+        kubelek["zamowienia"] += znak
+        waluta = kubelek["waluty"].setdefault(zamowienie.waluta, [0.0, 0])
+        waluta[0] = round(waluta[0] + znak * zamowienie.kwota, 2)
+        waluta[1] += znak
+        for pozycja in zamowienie.pozycje:
+            kubelek["sztuki"] += znak * pozycja.ilosc
+            # [nazwa, sztuki, przychód z pozycji, waluta] - bez ceny (starsze API) liczymy same sztuki
+            produkt = kubelek["produkty"].setdefault(pozycja.oferta_id or pozycja.nazwa,
+                                                     [pozycja.nazwa, 0, 0.0, pozycja.waluta or zamowienie.waluta])
+            produkt[1] += znak * pozycja.ilosc
+            produkt[2] = round(produkt[2] + znak * (pozycja.cena or 0.0) * pozycja.ilosc, 2)
+        self._zapisz(f"sprzedaz:{dzien}", kubelek)
+
+    def _przytnij(self, nowy_dzien):
+        granica = (datetime.date.fromisoformat(nowy_dzien) - datetime.timedelta(days=self.retencja_dni)).isoformat()
+        for dzien in [d for d in self._dni if d <= granica]:
+            del self._dni[dzien]
+            self._zapisz(f"sprzedaz:{dzien}", None)
+        self._zapisz("sprzedaz_dni", sorted(self._dni))
+
+    def podsumowanie(self, od, do, top=5):
+        """
+        Suma kubełków od `od` do `do` (daty, włącznie): zamówienia, sztuki, przychód i średni koszyk per waluta,
+        top oferty jako [id, nazwa, sztuki, przychód, waluta].
+        """
+        zamowienia, sztuki, waluty, produkty = 0, 0, {}, {}
+        dzien = od
+        while dzien <= do:
+            kubelek = self._dni.get(dzien.isoformat())
+            dzien += datetime.timedelta(days=1)
+            if kubelek is None: continue
+            zamowienia += kubelek["zamowienia"]
+            sztuki += kubelek["sztuki"]
+            for waluta, (kwota, ile) in kubelek["waluty"].items():
+                suma = waluty.setdefault(waluta, [0.0, 0])
+                suma[0] += kwota
+                suma[1] += ile
+            for oferta_id, (nazwa, ile, kwota, *waluta) in kubelek["produkty"].items():
+                suma = produkty.setdefault(oferta_id, [nazwa, 0, 0.0, waluta[0] if waluta else "PLN"])
+                suma[1] += ile
+                suma[2] += kwota
+        return {
+            "zamowienia": zamowienia,
+            "sztuki": sztuki,
+            "przychod": {w: round(kwota, 2) for w, (kwota, _) in waluty.items()},
+            "sredni_koszyk": {w: round(kwota / ile, 2) for w, (kwota, ile) in waluty.items() if ile},
+            "top": sorted(([oferta_id, *dane] for oferta_id, dane in produkty.items() if dane[1] > 0),
+                          key=lambda p: (-p[2], -p[3]))[:top],
+        }
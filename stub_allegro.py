@@ -0,0 +1,241 @@
+import asyncio
+import bisect
+import datetime
+import json
+import random
+import time
+import zlib
+
+from aiohttp import web
+
+
+def iso(ts):
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + "Z"
+
+
+class StubAllegro:
+    """
+    Lokalny zamiennik API Allegro do benchmarków: zamówienia (checkout-forms + dziennik zdarzeń),
+    wątki wiadomości i publiczny listing ofert, ze sztucznym opóźnieniem i losowymi 429.
+    Zapamiętuje, kiedy powstało każde zdarzenie, żeby liczyć opóźnienie end-to-end.
+    Z `etag=True` listy mają ETag i odpowiadają 304 na pasujący If-None-Match.
+    """
+
+    def __init__(self, opoznienie=0.05, rozrzut=0.02, proc_429=0.0, retry_after=0.5, strona_max=100, seed=1,
+                 etag=True):
+        self.opoznienie = opoznienie
+        self.rozrzut = rozrzut
+        self.proc_429 = proc_429
+        self.retry_after = retry_after
+        self.strona_max = strona_max
+        self.etag = etag
+        self.los = random.Random(seed)
+
+        self.zamowienia = []       # posortowane po updatedAt
+        self._czasy_zamowien = []  # updatedAt równolegle do `zamowienia` (do bisect)
+        self.zamowienia_id = {}
+        self.zdarzenia = []
+        self._pozycja_zdarzenia = {}  # ID zdarzenia -> indeks w liście
+        self.watki = {}
+        self.oferty = {}
+        self.utworzone = {}        # klucz zdarzenia -> time.time() powstania
+        self.sprzedaze = {}        # ID oferty -> [czasy sprzedaży jeszcze niezgłoszonych]
+        self.zapytania = 0
+        self.odrzucone_429 = 0
+        self.odpowiedzi_wyslane = 0
+        self.niezmienione_304 = 0
+
+        self._runner = None
+        self.port = None
+        self.app = web.Application()
+        self.app.router.add_post("/auth/oauth/token", self._token)
+        self.app.router.add_get("/order/checkout-forms", self._checkout_forms)
+        self.app.router.add_get("/order/checkout-forms/{id}", self._checkout_form)
+        self.app.router.add_get("/order/events", self._events)
+        self.app.router.add_get("/order/event-stats", self._event_stats)
+        self.app.router.add_get("/messaging/threads", self._threads)
+        self.app.router.add_post("/messaging/threads/{id}/messages", self._wyslij_wiadomosc)
+        self.app.router.add_put("/messaging/threads/{id}/read", self._przeczytane)
+        self.app.router.add_get("/offers/listing", self._listing)
+
+    # --- GENEROWANIE RUCHU ---
+    def dodaj_zamowienie(self, teraz=None):
+        teraz = time.time() if teraz is None else teraz
+        n = len(self.zamowienia) + 1
+        zamowienie = {
+            "id": f"zam-{n:08d}",
+            "updatedAt": iso(teraz),
+            "status": "READY_FOR_PROCESSING",
+            "buyer": {"login": f"kupujacy{n}"},
+            "summary": {"totalToPay": {"amount": f"{self.los.uniform(10, 500):.2f}", "currency": "PLN"}},
+            "lineItems": [{"quantity": self.los.randint(1, 3), "offer": {"id": str(10 ** 10 + n % 50), "name": f"Produkt testowy {n % 50}"},
+                           "price": {"amount": f"{self.los.uniform(5, 150):.2f}", "currency": "PLN"},
+                           "boughtAt": iso(teraz)}],
+        }
+        self.zamowienia.append(zamowienie)
+        self._czasy_zamowien.append(zamowienie["updatedAt"])
+        self.zamowienia_id[zamowienie["id"]] = zamowienie
+        zdarzenie_id = f"{len(self.zdarzenia) + 1:012d}"
+        self._pozycja_zdarzenia[zdarzenie_id] = len(self.zdarzenia)
+        self.zdarzenia.append({"id": zdarzenie_id, "type": "READY_FOR_PROCESSING",
+                               "order": {"checkoutForm": {"id": zamowienie["id"]}}})
+        self.utworzone[("zamowienie", zamowienie["id"])] = teraz
+
+    def dodaj_watek(self, teraz=None):
+        teraz = time.time() if teraz is None else teraz
+        n = len(self.watki) + 1
+        watek = {
+            "id": f"watek-{n:08d}",
+            "read": False,
+            "interlocutor": {"login": f"klient{n}"},
+            "lastMessageDateTime": iso(teraz),
+            "lastMessage": {"id": f"msg-{n:08d}", "text": "Kiedy wysyłka?", "createdAt": iso(teraz),
+                            "author": {"role": "BUYER"}},
+        }
+        self.watki[watek["id"]] = watek
+        self.utworzone[("watek", watek["interlocutor"]["login"])] = teraz
+
+    def dodaj_oferty(self, n):
+        for i in range(n):
+            oferta_id = str(2 * 10 ** 10 + len(self.oferty) + i)
+            self.oferty[oferta_id] = {"id": oferta_id, "name": f"Oferta konkurencji {oferta_id}",
+                                      "sellingMode": {"popularity": 0, "price": {"amount": "99.99", "currency": "PLN"}}}
+        return list(self.oferty)
+
+    def sprzedaj(self, teraz=None):
+        teraz = time.time() if teraz is None else teraz
+        oferta_id = self.los.choice(list(self.oferty))
+        self.oferty[oferta_id]["sellingMode"]["popularity"] += 1
+        self.sprzedaze.setdefault(oferta_id, []).append(teraz)
+
+    async def generuj(self, rodzaj, na_sekunde, czas):
+        """Równomierny strumień zdarzeń `rodzaj` ("zamowienie" / "watek" / "sprzedaz") przez `czas` sekund."""
+        funkcja = {"zamowienie": self.dodaj_zamowienie, "watek": self.dodaj_watek, "sprzedaz": self.sprzedaj}[rodzaj]
+        if na_sekunde <= 0:
+            return 0
+        start = time.monotonic()
+        ile = 0
+        while time.monotonic() - start < czas:
+            # Nadrabiamy zaległości partią, jeśli pętla nie nadąża z pojedynczymi krokami
+            cel = int((time.monotonic() - start) * na_sekunde)
+            while ile < cel:
+                funkcja()
+                ile += 1
+            await asyncio.sleep(min(0.05, 1 / na_sekunde))
+        return ile
+
+    # --- SERWER ---
+    async def start(self, host="127.0.0.1", port=0):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self.port = self._runner.addresses[0][1]
+        return f"http://{host}:{self.port}"
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _symuluj(self):
+        """Opóźnienie sieci + losowe 429. Zwraca odpowiedź 429 albo None."""
+        self.zapytania += 1
+        if self.opoznienie or self.rozrzut:
+            await asyncio.sleep(max(0.0, self.opoznienie + self.los.uniform(-self.rozrzut, self.rozrzut)))
+        if self.proc_429 and self.los.random() < self.proc_429:
+            self.odrzucone_429 += 1
+            return web.json_response({"errors": [{"code": "TooManyRequests"}]}, status=429,
+                                     headers={"Retry-After": str(self.retry_after)})
+        return None
+
+    def _json(self, request, dane):
+        if not self.etag:
+            return web.json_response(dane)
+        tresc = json.dumps(dane)
+        etag = f'"{zlib.crc32(tresc.encode()):08x}"'
+        if request.headers.get("If-None-Match") == etag:
+            self.niezmienione_304 += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=tresc, content_type="application/json", headers={"ETag": etag})
+
+    def _strona(self, request, domyslny):
+        limit = min(int(request.query.get("limit", domyslny)), self.strona_max)
+        return limit, int(request.query.get("offset", 0))
+
+    async def _token(self, request):
+        return web.json_response({"access_token": "stub-token", "refresh_token": "stub-refresh", "expires_in": 43200})
+
+    async def _checkout_forms(self, request):
+        blad = await self._symuluj()
+        if blad is not None:
+            return blad
+        limit, offset = self._strona(request, 100)
+        od = request.query.get("updatedAt.gte")
+        poczatek = bisect.bisect_left(self._czasy_zamowien, od) if od else 0
+        ile = len(self.zamowienia) - poczatek
+        # Allegro zwraca od najnowszych
+        koniec = len(self.zamowienia) - offset
+        strona = self.zamowienia[max(poczatek, koniec - limit):max(poczatek, koniec)][::-1]
+        return self._json(request, {"checkoutForms": strona, "count": len(strona), "totalCount": ile})
+
+    async def _checkout_form(self, request):
+        blad = await self._symuluj()
+        if blad is not None:
+            return blad
+        zamowienie = self.zamowienia_id.get(request.match_info["id"])
+        if zamowienie is None:
+            return web.json_response({"errors": []}, status=404)
+        return web.json_response(zamowienie)
+
+    async def _events(self, request):
+        blad = await self._symuluj()
+        if blad is not None:
+            return blad
+        limit = min(int(request.query.get("limit", 100)), 1000)
+        od = request.query.get("from")
+        start = self._pozycja_zdarzenia[od] + 1 if od in self._pozycja_zdarzenia else 0
+        return web.json_response({"events": self.zdarzenia[start:start + limit]})
+
+    async def _event_stats(self, request):
+        blad = await self._symuluj()
+        if blad is not None:
+            return blad
+        ostatnie = self.zdarzenia[-1] if self.zdarzenia else {"id": "000000000000"}
+        return web.json_response({"latestEvent": {"id": ostatnie["id"]}})
+
+    async def _threads(self, request):
+        blad = await self._symuluj()
+        if blad is not None:
+            return blad
+        limit, offset = self._strona(request, 20)
+        watki = sorted(self.watki.values(), key=lambda w: w["lastMessageDateTime"], reverse=True)
+        return self._json(request, {"threads": watki[offset:offset + limit], "count": len(watki), "offset": offset})
+
+    async def _wyslij_wiadomosc(self, request):
+        blad = await self._symuluj()
+        if blad is not None:
+            return blad
+        self.odpowiedzi_wyslane += 1
+        return web.json_response({"id": f"odp-{self.odpowiedzi_wyslane}"}, status=201)
+
+    async def _przeczytane(self, request):
+        blad = await self._symuluj()
+        if blad is not None:
+            return blad
+        watek = self.watki.get(request.match_info["id"])
+        if watek is not None:
+            watek["read"] = True
+        return web.json_response({})
+
+    async def _listing(self, request):
+        blad = await self._symuluj()
+        if blad is not None:
+            return blad
+        if "phrase" in request.query or "category.id" in request.query:
+            # Wyszukiwanie: fraza dopasowana do nazwy, stronicowanie jak w Allegro
+            limit, offset = self._strona(request, 60)
+            fraza = request.query.get("phrase", "").lower()
+            pasujace = [o for o in self.oferty.values() if fraza in o["name"].lower()]
+            return self._json(request, {"items": {"regular": pasujace[offset:offset + limit], "promoted": []},
+                                        "searchMeta": {"availableCount": len(pasujace), "totalCount": len(pasujace)}})
+        oferty = [self.oferty[i] for i in request.query.getall("offer.id", []) if i in self.oferty]
+        return self._json(request, {"items": {"regular": oferty, "promoted": []}})
@@ -0,0 +1,184 @@
+import array
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Po ilu dniach zagęszczamy próbki do jednej na godzinę / dzień i kiedy je usuwamy
+GODZINOWE_PO_DNIACH = int(os.environ.get("TS_HOURLY_AFTER_DAYS", "7"))
+DZIENNE_PO_DNIACH = int(os.environ.get("TS_DAILY_AFTER_DAYS", "30"))
+RETENCJA_DNI = int(os.environ.get("TS_RETENTION_DAYS", "365"))
+
+
+class TimeSeriesStore:
+    """
+    Historia (oferta, czas, popularity, cena) z trackera w układzie kolumnowym.
+    Dopisywanie trafia do zwartych tablic `array` (O(1), bez obiektów na próbkę),
+    a zapytania kopiują kolumny do numpy i liczą wszystko wektorowo.
+    """
+
+    def __init__(self, sciezka=None):
+        self.sciezka = sciezka
+        self.oferty = []        # indeks -> ID oferty
+        self.nazwy = {}         # ID oferty -> tytuł
+        self._indeks = {}       # ID oferty -> indeks
+        self._ts = array.array("d")
+        self._idx = array.array("i")
+        self._pop = array.array("i")
+        self._cena = array.array("f")
+        # Jeden wątek zapisu - okresowy zapis i zapis przy zamykaniu nie piszą naraz do tego samego pliku tymczasowego,
+        # a migawki trafiają na dysk w kolejności zlecenia (starsza nie nadpisze nowszej)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="szeregi")
+        self._wczytaj()
+
+    def __len__(self):
+        return len(self._ts)
+
+    # --- ZAPIS ---
+    def _indeks_oferty(self, oferta_id):
+        i = self._indeks.get(oferta_id)
+        if i is None:
+            i = self._indeks[oferta_id] = len(self.oferty)
+            self.oferty.append(oferta_id)
+        return i
+
+    def dodaj(self, oferta_id, popularity, cena=None, ts=None, nazwa=None):
+        self._ts.append(time.time() if ts is None else ts)
+        self._idx.append(self._indeks_oferty(oferta_id))
+        self._pop.append(int(popularity))
+        self._cena.append(float(cena) if cena is not None else float("nan"))
+        if nazwa:
+            self.nazwy[oferta_id] = nazwa
+
+    def _kolumny(self):
+        return (
+            np.frombuffer(self._ts, dtype=np.float64).copy(),
+            np.frombuffer(self._idx, dtype=np.int32).copy(),
+            np.frombuffer(self._pop, dtype=np.int32).copy(),
+            np.frombuffer(self._cena, dtype=np.float32).copy(),
+        )
+
+    def _ustaw_kolumny(self, ts, idx, pop, cena):
+        self._ts = array.array("d", ts.astype(np.float64).tobytes())
+        self._idx = array.array("i", idx.astype(np.int32).tobytes())
+        self._pop = array.array("i", pop.astype(np.int32).tobytes())
+        self._cena = array.array("f", cena.astype(np.float32).tobytes())
+
+    def kompaktuj(self, teraz=None):
+        """Zostawia ostatnią próbkę na godzinę (starsze niż tydzień) / dzień (starsze niż miesiąc)."""
+        teraz = time.time() if teraz is None else teraz
+        ts, idx, pop, cena = self._kolumny()
+        if not len(ts):
+            return 0
+
+        maska = ts >= teraz - RETENCJA_DNI * 86400
+        ts, idx, pop, cena = ts[maska], idx[maska], pop[maska], cena[maska]
+
+        kubelek = np.full(len(ts), -1, dtype=np.int64)
+        godzinowe = ts < teraz - GODZINOWE_PO_DNIACH * 86400
+        dzienne = ts < teraz - DZIENNE_PO_DNIACH * 86400
+        kubelek[godzinowe] = (ts[godzinowe] // 3600).astype(np.int64)
+        kubelek[dzienne] = (ts[dzienne] // 86400).astype(np.int64) * 100000  # osobna przestrzeń kluczy
+
+        stare = kubelek >= 0
+        if stare.any():
+            # Ostatnia próbka w każdym (oferta, kubełek): unique na odwróconej kolejności czasowej
+            stare_idx = np.flatnonzero(stare)
+            stare_idx = stare_idx[np.argsort(ts[stare_idx], kind="stable")[::-1]]
+            klucze = np.stack([idx[stare_idx].astype(np.int64), kubelek[stare_idx]], axis=1)
+            _, pierwsze = np.unique(klucze, axis=0, return_index=True)
+            zostaw = np.concatenate([stare_idx[pierwsze], np.flatnonzero(~stare)])
+        else:
+            zostaw = np.arange(len(ts))
+
+        zostaw = zostaw[np.argsort(ts[zostaw], kind="stable")]
+        przed = len(self._ts)
+        self._ustaw_kolumny(ts[zostaw], idx[zostaw], pop[zostaw], cena[zostaw])
+        return przed - len(self._ts)
+
+    # --- ZAPYTANIA ---
+    def tempo_sprzedazy(self, okno_h=24, teraz=None):
+        """Zwraca (indeksy ofert, sprzedaż/h, przyrost w oknie) dla wszystkich ofert naraz."""
+        teraz = time.time() if teraz is None else teraz
+        ts, idx, pop, _ = self._kolumny()
+        maska = ts >= teraz - okno_h * 3600
+        ts, idx, pop = ts[maska], idx[maska], pop[maska]
+        if not len(ts):
+            return np.array([], dtype=np.int32), np.array([]), np.array([])
+
+        kolejnosc = np.lexsort((ts, idx))
+        ts, idx, pop = ts[kolejnosc], idx[kolejnosc], pop[kolejnosc]
+        granice = np.flatnonzero(np.diff(idx)) + 1
+        pierwsze = np.r_[0, granice]
+        ostatnie = np.r_[granice - 1, len(idx) - 1]
+
+        przyrost = (pop[ostatnie] - pop[pierwsze]).astype(np.float64)
+        godziny = (ts[ostatnie] - ts[pierwsze]) / 3600
+        tempo = np.divide(przyrost, godziny, out=np.zeros_like(przyrost), where=godziny > 0)
+        return idx[pierwsze], tempo, przyrost
+
+    def top_movers(self, n=10, okno_h=24, teraz=None):
+        indeksy, tempo, przyrost = self.tempo_sprzedazy(okno_h, teraz)
+        if not len(indeksy):
+            return []
+        najlepsze = np.argsort(-tempo, kind="stable")[:n]
+        return [(self.oferty[indeksy[i]], float(tempo[i]), int(przyrost[i])) for i in najlepsze if tempo[i] > 0]
+
+    def historia(self, oferta_id, okno_h=24 * 30, teraz=None):
+        teraz = time.time() if teraz is None else teraz
+        i = self._indeks.get(oferta_id)
+        if i is None:
+            return np.array([]), np.array([]), np.array([])
+        ts, idx, pop, cena = self._kolumny()
+        maska = (idx == i) & (ts >= teraz - okno_h * 3600)
+        kolejnosc = np.argsort(ts[maska], kind="stable")
+        return ts[maska][kolejnosc], pop[maska][kolejnosc], cena[maska][kolejnosc]
+
+    def srednia_kroczaca(self, oferta_id, okno_h=24 * 7, okno_sredniej_h=24, teraz=None):
+        """Sprzedaż na godzinę w siatce godzinowej + średnia krocząca z `okno_sredniej_h` godzin."""
+        ts, pop, _ = self.historia(oferta_id, okno_h, teraz)
+        if len(ts) < 2:
+            return np.array([]), np.array([])
+        siatka = np.arange(ts[0], ts[-1] + 1, 3600.0)
+        # popularity rośnie monotonicznie, więc interpolacja liniowa między pomiarami jest bezpieczna
+        na_siatce = np.interp(siatka, ts, pop.astype(np.float64))
+        na_godzine = np.diff(na_siatce)
+        k = max(1, min(okno_sredniej_h, len(na_godzine)))
+        srednia = np.convolve(na_godzine, np.ones(k) / k, mode="valid")
+        return na_godzine, srednia
+
+    # --- TRWAŁOŚĆ ---
+    def _wczytaj(self):
+        if not self.sciezka or not os.path.exists(self.sciezka):
+            return
+        try:
+            with np.load(self.sciezka, allow_pickle=False) as dane:
+                self.oferty = [str(o) for o in dane["oferty"]]
+                self.nazwy = dict(zip((str(k) for k in dane["nazwy_id"]), (str(v) for v in dane["nazwy"])))
+                self._ustaw_kolumny(dane["ts"], dane["idx"], dane["pop"], dane["cena"])
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️ Nie udało się wczytać historii trackera: {e}")
+            self.oferty = []
+        self._indeks = {o: i for i, o in enumerate(self.oferty)}
+
+    def _zapisz(self, migawka):
+        tmp = self.sciezka + ".tmp.npz"
+        np.savez_compressed(tmp, **migawka)
+        os.replace(tmp, self.sciezka)
+
+    async def zapisz(self):
+        if not self.sciezka:
+            return
+        ts, idx, pop, cena = self._kolumny()
+        migawka = {
+            "ts": ts, "idx": idx, "pop": pop, "cena": cena,
+            "oferty": np.array(self.oferty, dtype=str),
+            "nazwy_id": np.array(list(self.nazwy.keys()), dtype=str),
+            "nazwy": np.array(list(self.nazwy.values()), dtype=str),
+        }
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._zapisz, migawka)
+
+    async def close(self):
+        self._executor.shutdown(wait=True)
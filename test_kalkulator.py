@@ -0,0 +1,151 @@
+import math
+import unittest
+
+import numpy as np
+
+import kalkulator
+
+
+def zysk_skalarnie(zakup_brutto, sprzedaz_brutto, prowizja_procent=0.0):
+    # Wzór z pierwotnej komendy `!marza` (VAT 23% + ryczałt 3%)
+    zakup_netto = zakup_brutto / 1.23
+    sprzedaz_netto = sprzedaz_brutto / 1.23
+    prowizja_kwota = sprzedaz_brutto * (prowizja_procent / 100)
+    ryczalt_kwota = sprzedaz_netto * 0.03
+    return sprzedaz_netto - zakup_netto - ryczalt_kwota - prowizja_kwota
+
+
+def cena_skalarnie(zakup_brutto, cel_zysku):
+    # Sugerowana cena z pierwotnej komendy `!marza [zakup]` (bez prowizji)
+    return ((cel_zysku + zakup_brutto / 1.23) / 0.97) * 1.23
+
+
+class TestOblicz(unittest.TestCase):
+    def test_zgodny_ze_wzorem_skalarnym(self):
+        for zakup, sprzedaz, prowizja in [(50, 100, 0), (50, 100, 10), (0, 10, 5.5), (120, 99.99, 12), (10, 0, 0)]:
+            wynik = kalkulator.oblicz(zakup, sprzedaz, prowizja)
+            self.assertAlmostEqual(float(wynik["zysk"]), zysk_skalarnie(zakup, sprzedaz, prowizja), places=9)
+            self.assertAlmostEqual(float(wynik["zakup_netto"]), zakup / 1.23, places=9)
+            self.assertAlmostEqual(float(wynik["prowizja_kwota"]), sprzedaz * prowizja / 100, places=9)
+
+    def test_tablice_jak_pojedyncze_wartosci(self):
+        zakupy = np.array([10.0, 50.0, 200.0])
+        sprzedaze = np.array([25.0, 49.0, 399.0])
+        prowizje = np.array([0.0, 8.0, 15.0])
+        wynik = kalkulator.oblicz(zakupy, sprzedaze, prowizje)
+        for i in range(3):
+            self.assertAlmostEqual(wynik["zysk"][i], zysk_skalarnie(zakupy[i], sprzedaze[i], prowizje[i]), places=9)
+            self.assertAlmostEqual(wynik["marza_proc"][i], wynik["zysk"][i] * 100 / sprzedaze[i], places=9)
+
+    def test_marza_przy_zerowej_cenie_to_nan(self):
+        wynik = kalkulator.oblicz(10, 0)
+        self.assertTrue(math.isnan(float(wynik["marza_proc"])))
+
+    def test_prog_rentownosci_daje_zerowy_zysk(self):
+        wynik = kalkulator.oblicz(80, 100, 10)
+        prog = float(wynik["prog_rentownosci"])
+        self.assertAlmostEqual(float(kalkulator.oblicz(80, prog, 10)["zysk"]), 0.0, places=9)
+
+    def test_prowizja_100_procent_i_wiecej(self):
+        for prowizja in (100, 150):
+            wynik = kalkulator.oblicz(10, 100, prowizja)
+            self.assertAlmostEqual(float(wynik["zysk"]), zysk_skalarnie(10, 100, prowizja), places=9)
+            self.assertLess(float(wynik["zysk"]), 0)
+            self.assertTrue(math.isnan(float(wynik["prog_rentownosci"])))
+
+
+class TestCenaDlaZysku(unittest.TestCase):
+    def test_zgodna_z_sugestiami_skalarnymi(self):
+        for zakup in (0, 19.99, 100):
+            for cel in (10, 20, 30, 50, 100):
+                self.assertAlmostEqual(float(kalkulator.cena_dla_zysku(zakup, cel)), cena_skalarnie(zakup, cel), places=9)
+
+    def test_cena_daje_zadany_zysk(self):
+        for prowizja in (0, 10, 50):
+            cena = float(kalkulator.cena_dla_zysku(40, 15, prowizja))
+            self.assertAlmostEqual(zysk_skalarnie(40, cena, prowizja), 15, places=9)
+
+    def test_zerowy_i_ujemny_zysk(self):
+        prog = float(kalkulator.cena_dla_zysku(40, 0))
+        self.assertAlmostEqual(zysk_skalarnie(40, prog), 0, places=9)
+        strata = float(kalkulator.cena_dla_zysku(40, -5))
+        self.assertLess(strata, prog)
+        self.assertAlmostEqual(zysk_skalarnie(40, strata), -5, places=9)
+
+    def test_prowizja_zjada_cala_cene(self):
+        # Współczynnik <= 0 - żadna cena nie da zysku
+        for prowizja in (78.87, 100, 120):
+            self.assertTrue(math.isnan(float(kalkulator.cena_dla_zysku(40, 10, prowizja))))
+
+    def test_tablice_z_mieszanymi_przypadkami(self):
+        ceny = kalkulator.cena_dla_zysku(np.array([10.0, 10.0]), 5, np.array([0.0, 100.0]))
+        self.assertAlmostEqual(ceny[0], cena_skalarnie(10, 5), places=9)
+        self.assertTrue(np.isnan(ceny[1]))
+
+
+class TestCenaDlaMarzy(unittest.TestCase):
+    def test_cena_daje_zadana_marze(self):
+        for marza in (5, 10, 20, 30):
+            for prowizja in (0, 10):
+                cena = float(kalkulator.cena_dla_marzy(50, marza, prowizja))
+                self.assertAlmostEqual(zysk_skalarnie(50, cena, prowizja) * 100 / cena, marza, places=9)
+
+    def test_zerowa_marza_to_prog_rentownosci(self):
+        self.assertAlmostEqual(float(kalkulator.cena_dla_marzy(50, 0, 10)), float(kalkulator.cena_dla_zysku(50, 0, 10)), places=9)
+
+    def test_ujemna_marza(self):
+        cena = float(kalkulator.cena_dla_marzy(50, -10))
+        self.assertLess(cena, float(kalkulator.cena_dla_zysku(50, 0)))
+        self.assertAlmostEqual(zysk_skalarnie(50, cena) * 100 / cena, -10, places=9)
+
+    def test_nieosiagalna_marza_i_prowizja_100_procent(self):
+        self.assertTrue(math.isnan(float(kalkulator.cena_dla_marzy(50, 80))))
+        self.assertTrue(math.isnan(float(kalkulator.cena_dla_marzy(50, 10, 100))))
+
+    def test_siatka_cen(self):
+        ceny = kalkulator.cena_dla_marzy(np.array([10.0, 20.0])[:, None], np.array([10.0, 20.0, 30.0])[None, :])
+        self.assertEqual(ceny.shape, (2, 3))
+        self.assertAlmostEqual(ceny[1, 2], float(kalkulator.cena_dla_marzy(20, 30)), places=9)
+
+
+class TestWczytajCsv(unittest.TestCase):
+    def test_srednik_przecinek_dziesietny_i_aliasy(self):
+        sku, kolumny = kalkulator.wczytaj_csv("Nazwa;Cena_zakupu;Cena;Prowizja\nKubek;10,50;29,99 zł;10%\nTalerz;5;15;\n")
+        self.assertEqual(sku, ["Kubek", "Talerz"])
+        np.testing.assert_allclose(kolumny["zakup"], [10.5, 5])
+        np.testing.assert_allclose(kolumny["sprzedaz"], [29.99, 15])
+        np.testing.assert_allclose(kolumny["prowizja"], [10, 0])
+        np.testing.assert_allclose(kolumny["vat"], [kalkulator.VAT_DOMYSLNY] * 2)
+        np.testing.assert_allclose(kolumny["ryczalt"], [kalkulator.RYCZALT_DOMYSLNY] * 2)
+
+    def test_pusty_plik(self):
+        for tekst in ("", "\n\n", " ;  \n"):
+            with self.assertRaises(ValueError):
+                kalkulator.wczytaj_csv(tekst)
+
+    def test_brak_wymaganych_kolumn(self):
+        with self.assertRaises(ValueError):
+            kalkulator.wczytaj_csv("sku,zakup\nA,10\n")
+
+    def test_bledne_i_krotkie_wiersze(self):
+        tekst = "sku,zakup,sprzedaz\nA,10,30\nB,abc,30\n\nC,10\nD,,20\n,5,12\n"
+        sku, kolumny = kalkulator.wczytaj_csv(tekst)
+        # Pusty wiersz pomijamy, brak SKU zostaje pustym napisem
+        self.assertEqual(sku, ["A", "B", "C", "D", ""])
+        self.assertTrue(np.isnan(kolumny["zakup"][1]))
+        self.assertTrue(np.isnan(kolumny["sprzedaz"][2]))
+        self.assertTrue(np.isnan(kolumny["zakup"][3]))
+
+        wynik = kalkulator.oblicz_tabele(kolumny)
+        self.assertAlmostEqual(wynik["zysk"][0], zysk_skalarnie(10, 30), places=9)
+        self.assertAlmostEqual(wynik["zysk"][4], zysk_skalarnie(5, 12), places=9)
+        st = kalkulator.podsumowanie(wynik)
+        self.assertEqual((st["pozycje"], st["bledne"]), (5, 3))
+
+    def test_sku_z_numeru_wiersza(self):
+        sku, _ = kalkulator.wczytaj_csv("zakup\tsprzedaz\n1\t2\n3\t4\n")
+        self.assertEqual(sku, ["1", "2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
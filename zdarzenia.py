@@ -0,0 +1,191 @@
+import asyncio
+import hmac
+import inspect
+import os
+
+from aiohttp import web
+
+from metryki import metryki
+from modele import Zamowienie, Watek
+
+# Ile przy zamykaniu bota czekamy, aż subskrybenci obsłużą zdarzenia, które już są w kolejkach
+LIMIT_ZAMKNIECIA = float(os.environ.get("EVENTS_DRAIN_TIMEOUT", "10"))
+
+class OrderCreated:
+    """Nowe (albo zmienione) zamówienie - `order` to Zamowienie (albo checkout-form z API), `konto` to nazwa konta sprzedawcy."""
+    __slots__ = ("order", "konto")
+
+    def __init__(self, order, konto=None):
+        self.order = order if isinstance(order, Zamowienie) else Zamowienie.z_api(order)
+        self.konto = konto
+
+    @property
+    def id(self):
+        return self.order.id
+
+    def to_dict(self):
+        return {"order": self.order.to_dict(), "konto": self.konto}
+
+
+class BuyerMessage:
+    """Wątek, w którym ostatnią wiadomość napisał kupujący. `nowa` ustawia bramka deduplikacji."""
+    __slots__ = ("thread", "nowa", "konto")
+
+    def __init__(self, thread, nowa=True, konto=None):
+        self.thread = thread if isinstance(thread, Watek) else Watek.z_api(thread)
+        self.nowa = nowa
+        self.konto = konto
+
+    @property
+    def msg_id(self):
+        return self.thread.msg_id
+
+    def to_dict(self):
+        return {"thread": self.thread.to_dict(), "konto": self.konto}
+
+
+class OfferSalesIncreased:
+    __slots__ = ("oferta_id", "tytul", "wzrost", "lacznie")
+
+    def __init__(self, oferta_id, tytul, wzrost, lacznie):
+        self.oferta_id = str(oferta_id)
+        self.tytul = tytul
+        self.wzrost = int(wzrost)
+        self.lacznie = int(lacznie)
+
+    def to_dict(self):
+        return {"oferta_id": self.oferta_id, "tytul": self.tytul, "wzrost": self.wzrost, "lacznie": self.lacznie}
+
+
+TYPY_ZDARZEN = {typ.__name__: typ for typ in (OrderCreated, BuyerMessage, OfferSalesIncreased)}
+
+
+def z_json(dane):
+    """{"type": "OrderCreated", "data": {...}} -> obiekt zdarzenia. ValueError przy złym formacie."""
+    if not isinstance(dane, dict):
+        raise ValueError("zdarzenie musi być obiektem JSON")
+    typ = TYPY_ZDARZEN.get(dane.get("type"))
+    if typ is None:
+        raise ValueError(f"nieznany typ zdarzenia: {dane.get('type')!r} (dozwolone: {', '.join(TYPY_ZDARZEN)})")
+    try:
+        # Modele same sprawdzają pola wymagane przez bramkę deduplikacji (ID, daty)
+        zdarzenie = typ(**(dane.get("data") or {}))
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError(f"niepoprawne dane dla {typ.__name__}: {e}")
+    return zdarzenie
+
+
+class _Subskrypcja:
+    __slots__ = ("nazwa", "handler", "partiami", "workers", "kolejka", "zadania", "obsluzone", "bledy")
+
+    def __init__(self, nazwa, handler, partiami, workers):
+        self.nazwa = nazwa
+        self.handler = handler
+        self.partiami = partiami
+        self.workers = workers
+        self.kolejka = asyncio.Queue()
+        self.zadania = []
+        self.obsluzone = 0
+        self.bledy = 0
+
+
+class EventBus:
+    """
+    Wewnętrzna magistrala zdarzeń. Pollery i endpoint /events tylko publikują,
+    a każdy subskrybent ma własną kolejkę i workera - wolny konsument (np. wysyłka
+    odpowiedzi) nie wstrzymuje pozostałych ani producenta.
+    Subskrybent `partiami=True` dostaje listę wszystkiego, co czekało w kolejce,
+    a `workers=N` obsługuje do N zdarzeń naraz.
+    """
+
+    def __init__(self):
+        self._subskrypcje = {}
+        self.opublikowane = 0
+
+    def subscribe(self, typ, handler, nazwa=None, partiami=False, workers=1):
+        sub = _Subskrypcja(nazwa or handler.__name__, handler, partiami, max(1, workers))
+        self._subskrypcje.setdefault(typ, []).append(sub)
+        return sub
+
+    def publish(self, zdarzenie):
+        subskrypcje = self._subskrypcje.get(type(zdarzenie), [])
+        for sub in subskrypcje:
+            if not sub.zadania:
+                petla = asyncio.get_running_loop()
+                sub.zadania = [petla.create_task(self._worker(sub)) for _ in range(sub.workers)]
+            sub.kolejka.put_nowait(zdarzenie)
+        self.opublikowane += 1
+        metryki.inc("events_published_total", type=type(zdarzenie).__name__)
+        return len(subskrypcje)
+
+    async def _worker(self, sub):
+        while True:
+            partia = [await sub.kolejka.get()]
+            if sub.partiami:
+                while not sub.kolejka.empty():
+                    partia.append(sub.kolejka.get_nowait())
+            argumenty = [partia] if sub.partiami else partia
+            for argument in argumenty:
+                try:
+                    with metryki.mierz("event_handler", subscriber=sub.nazwa):
+                        wynik = sub.handler(argument)
+                        if inspect.isawaitable(wynik):
+                            await wynik
+                    sub.obsluzone += len(argument) if sub.partiami else 1
+                except Exception as e:
+                    sub.bledy += 1
+                    print(f"❌ Błąd subskrybenta {sub.nazwa}: {e}")
+            for _ in partia:
+                sub.kolejka.task_done()
+
+    def glebokosc(self):
+        return sum(sub.kolejka.qsize() for subs in self._subskrypcje.values() for sub in subs)
+
+    def stats(self):
+        return {
+            "published": self.opublikowane,
+            "subscribers": {
+                sub.nazwa: {"queued": sub.kolejka.qsize(), "handled": sub.obsluzone, "errors": sub.bledy}
+                for subs in self._subskrypcje.values() for sub in subs
+            },
+        }
+
+    async def close(self, limit=LIMIT_ZAMKNIECIA):
+        # Zdarzenia w kolejkach przeszły już bramkę deduplikacji (ID zapisane jako przetworzone),
+        # więc porzucone nie wróciłyby po restarcie - najpierw dajemy subskrybentom je obsłużyć
+        kolejki = [sub.kolejka for subs in self._subskrypcje.values() for sub in subs if sub.zadania]
+        if kolejki:
+            try:
+                await asyncio.wait_for(asyncio.gather(*(k.join() for k in kolejki)), timeout=limit)
+            except asyncio.TimeoutError:
+                print(f"⚠️ Zamykanie: nie obsłużono {self.glebokosc()} zdarzeń w {limit:g}s")
+        for subs in self._subskrypcje.values():
+            for sub in subs:
+                for zadanie in sub.zadania:
+                    zadanie.cancel()
+                sub.zadania = []
+
+
+def obsluga_ingestii(przyjmij, token):
+    """
+    Handler aiohttp dla POST /events: przyjmuje jedno zdarzenie albo listę zdarzeń
+    i przepuszcza każde przez `przyjmij(zdarzenie) -> bool` (ta sama bramka co pollery).
+    Bez ustawionego tokena endpoint jest wyłączony.
+    """
+    async def handler(request):
+        if not token:
+            return web.json_response({"error": "ingestion disabled"}, status=404)
+        naglowek = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(naglowek.encode(), f"Bearer {token}".encode()):
+            return web.json_response({"error": "unauthorized"}, status=401)
+        try:
+            dane = await request.json()
+            zdarzenia = [z_json(d) for d in (dane if isinstance(dane, list) else [dane])]
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+
+        przyjete = sum(1 for z in zdarzenia if przyjmij(z))
+        metryki.inc("events_ingested_total", len(zdarzenia))
+        return web.json_response({"accepted": przyjete, "duplicates": len(zdarzenia) - przyjete})
+
+    return handler